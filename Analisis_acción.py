@@ -2,7 +2,11 @@ import streamlit as st
 import plotly.graph_objects as go
 import numpy as np
 import pandas as pd
+import io
 import json
+import os
+import tempfile
+import datetime
 from reportlab.lib.pagesizes import letter
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -10,6 +14,33 @@ from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
 from reportlab.lib.units import inch
 from reportlab.lib import colors
 
+from motor_valuacion import (
+    ESCENARIOS_PREDETERMINADOS, datos_iniciales, calcular_multiplos, valuar_multiplos, valuar_dcf,
+    valuar_multiplo_terminal, valuar_escenarios, grilla_sensibilidad, analisis_tornado, calcular_precio_justo,
+    calcular_precio_maximo, tabla_escenarios_predeterminada, valuar_tabla_escenarios, valuar_ddm_escenarios,
+    grilla_sensibilidad_ddm,
+)
+from simulacion import (
+    VARIABLES_SIMULABLES, TIPOS_DISTRIBUCION, Distribucion, distribucion_predeterminada, simular_valuacion,
+    simular_valuacion_en_bloques, MUESTREADORES, simular_hasta_convergencia,
+)
+from costo_capital import VENTANA_BETA, wacc_capm, cargar_precios, estimar_betas
+from universo import (
+    COLUMNA_TICKER, COLUMNA_VALIDA, SUBVALUADA, NEUTRAL, SOBREVALUADA, ENTRADA_INVALIDA, leer_tabla, valuar_universo,
+    resumir_universo, columnas_desde_tabla,
+)
+from ejecucion_paralela import procesos_disponibles, simular_universo
+from cubo_resultados import ETIQUETAS_METODOS, escenarios_en_grilla, cubo_desde_universo
+from screener import COLUMNAS_VISTA, K_PREDETERMINADO, Condicion, screener_universo
+from reglas_multiplos import TIPO_ESPERADO, TIPO_TENDENCIA, evaluar_reglas, mensajes_fila
+from validacion import ESQUEMA_ANALISIS, ESQUEMA_LOTE, validar_datos, validar_tabla, resumen_validacion, mensajes_fila as mensajes_validacion
+from comparables import (
+    MULTIPLOS_PARES, CAMPOS_ESPERADOS, ETIQUETAS_MULTIPLOS, ESTADISTICOS, ETIQUETAS_ESTADISTICOS, MEDIA_RECORTADA,
+    RECORTE_PREDETERMINADO, leer_pares, multiplos_actuales, aplicar_comparables, percentiles_universo,
+)
+from almacenamiento import PARQUET_DISPONIBLE, guardar_inputs, cargar_inputs, exportar_json, importar_json, guardar_tabla_columnar
+from valuacion_inversa import SOLUCION_ENCONTRADA, DESCRIPCION_ESTADOS, crecimiento_implicito, tasa_descuento_implicita
+
 # ===================== CONFIGURACIÓN INICIAL DE LA APLICACIÓN =====================
 # Configura la página de Streamlit para una experiencia de usuario óptima.
 # Establece el título de la pestaña del navegador, el ícono, el diseño y el estado inicial de la barra lateral.
@@ -165,304 +196,1376 @@ st.markdown(
 # Inicialización de `st.session_state` para persistir los datos de entrada del usuario
 # a través de las recargas de la aplicación. Esto es crucial para mantener el estado.
 if 'data_inputs' not in st.session_state:
-    st.session_state.data_inputs = {
-        'precio_actual': 0.0,
-        'eps_actual': 0.0,
-        'eps_proyectado': 0.0,
-        'revenue_actual': 0.0,
-        'revenue_pesimista': 0.0,
-        'revenue_base': 0.0,
-        'revenue_optimista': 0.0,
-        'net_income_estimado': 0.0,
-        'acciones_circulacion': 0.0,
-        'dividendos_anuales': 0.0,
-        'book_value_per_share': 0.0,
-        'equity_proyectado': 0.0,
-        'tasa_crecimiento_esperada': 0.0,
-        'wacc': 0.0,
-        'per_esperado': 0.0,
-        'ps_esperado': 0.0,
-        'pb_esperado': 0.0,
-        'margen_seguridad_deseado': 0.0,
-        'años_proyeccion_dcf': 5, # Número de años por defecto para la proyección DCF.
-        'tasa_crecimiento_perpetuo': 2.0, # Tasa de crecimiento perpetuo por defecto (en porcentaje).
-        # Datos históricos para la comparación de múltiplos.
-        'per_historico_1': 0.0,
-        'per_historico_2': 0.0,
-        'per_historico_3': 0.0,
-        'ps_historico_1': 0.0,
-        'ps_historico_2': 0.0,
-        'ps_historico_3': 0.0,
-        'pb_historico_1': 0.0,
-        'pb_historico_2': 0.0,
-        'pb_historico_3': 0.0,
-    }
-
-# ===================== FUNCIONES AUXILIARES Y DE CÁLCULO FINANCIERO =====================
+    st.session_state.data_inputs = datos_iniciales()
 
-# --- Validación de Inputs ---
-def validar_input(valor, nombre_campo):
-    """
-    Valida que un valor de entrada sea un número y no sea negativo.
-    Muestra un mensaje de error en Streamlit si la validación falla.
-    """
-    if not isinstance(valor, (int, float)):
-        st.error(f"Error: '{nombre_campo}' debe ser un valor numérico.")
-        return False
-    if valor < 0:
-        st.error(f"Error: '{nombre_campo}' debe ser un número positivo o cero.")
-        return False
-    return True
-
-# --- Cálculos de Múltiplos ---
-def calcular_pe(precio, eps):
-    """
-    Calcula el Ratio Precio/Beneficio (P/E).
-    Retorna 0.0 si EPS es cero para evitar divisiones por cero.
-    """
-    if eps > 0:
-        return precio / eps
-    return 0.0
+# Indica si el análisis ya se ejecutó, para que los controles interactivos de los resultados
+# (sliders, pestañas, botón de PDF) no oculten el análisis al provocar una recarga.
+if 'analisis_ejecutado' not in st.session_state:
+    st.session_state.analisis_ejecutado = False
 
-def calcular_ps(precio, revenue_per_share):
-    """
-    Calcula el Ratio Precio/Ventas (P/S).
-    Retorna 0.0 si Revenue por Acción es cero.
-    """
-    if revenue_per_share > 0:
-        return precio / revenue_per_share
-    return 0.0
+# ===================== FUNCIONES AUXILIARES Y DE CÁLCULO FINANCIERO =====================
 
-def calcular_pb(precio, book_value_per_share):
-    """
-    Calcula el Ratio Precio/Valor Contable (P/B).
-    Retorna 0.0 si Book Value por Acción es cero.
-    """
-    if book_value_per_share > 0:
-        return precio / book_value_per_share
-    return 0.0
+# --- Calendario de Descuento ---
+MESES = [
+    "Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
+    "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre",
+]
+
+def descripcion_calendario(data):
+    """Texto breve de la convención de descuento elegida (para la app, el resumen y el PDF)."""
+    if not data['fecha_valuacion']:
+        return "Años enteros" + (", mitad de año" if data['flujos_medio_año'] else "")
+    opciones = [f"Al {data['fecha_valuacion']}", f"cierre fiscal en {MESES[int(data['mes_cierre_fiscal']) - 1]}"]
+    if data['flujos_medio_año']:
+        opciones.append("mitad de año")
+    if data['periodo_parcial']:
+        opciones.append("período parcial")
+    return ", ".join(opciones)
+
+def descripcion_wacc(data):
+    """Origen del WACC usado: ingresado a mano o armado por CAPM (para el resumen y el PDF)."""
+    if not data['wacc_desde_capm']:
+        return "Ingresado manualmente"
+    return (
+        f"CAPM (rf {data['tasa_libre_riesgo']:.2f}%, β {data['beta']:.2f}, prima {data['prima_riesgo_mercado']:.2f}%, "
+        f"Kd {data['costo_deuda']:.2f}%, t {data['tasa_impuestos']:.2f}%, D/V {data['proporcion_deuda']:.2f}%)"
+    )
 
 # ===================== SECCIÓN: Valuación por Múltiplos =====================
 def valuacion_por_multiplos(data):
     """
-    Realiza la valuación de la acción utilizando el método de múltiplos.
-    Calcula el precio objetivo basado en los múltiplos P/E, P/S y P/B esperados.
+    Muestra la valuación de la acción utilizando el método de múltiplos.
+    El cálculo de los precios objetivo P/E, P/S y P/B lo realiza `motor_valuacion.valuar_multiplos`.
     """
     st.subheader("Valuación por Múltiplos")
     st.markdown("Este método estima el valor de la acción comparándola con empresas similares o con sus propios múltiplos históricos/esperados.")
 
-    precio_objetivo_pe = 0.0
-    precio_objetivo_ps = 0.0
-    precio_objetivo_pb = 0.0
+    resultado = valuar_multiplos(data)
 
-    # Cálculo del Precio Objetivo basado en P/E Proyectado
+    # Precio Objetivo basado en P/E Proyectado
     st.markdown("---")
     st.markdown("#### Precio Objetivo basado en P/E Proyectado")
-    if data['eps_proyectado'] > 0 and data['per_esperado'] > 0:
-        precio_objetivo_pe = data['eps_proyectado'] * data['per_esperado']
+    if resultado.precio_objetivo_pe > 0:
         st.write(f"**EPS Proyectado:** ${data['eps_proyectado']:,.2f}")
         st.write(f"**PER Esperado:** {data['per_esperado']:,.2f}x")
-        st.success(f"**Precio Objetivo (P/E Proyectado):** ${precio_objetivo_pe:,.2f}")
+        st.success(f"**Precio Objetivo (P/E Proyectado):** ${resultado.precio_objetivo_pe:,.2f}")
     else:
         st.warning("No se puede calcular el Precio Objetivo (P/E Proyectado). Asegúrate de ingresar EPS Proyectado y PER Esperado > 0.")
 
-    # Cálculo del Precio Objetivo basado en P/S Proyectado
+    # Precio Objetivo basado en P/S Proyectado
     st.markdown("---")
     st.markdown("#### Precio Objetivo basado en P/S Proyectado")
-    revenue_proyectado_base = data['revenue_base']
-    if data['acciones_circulacion'] > 0 and revenue_proyectado_base > 0 and data['ps_esperado'] > 0:
-        revenue_per_share_proyectado = revenue_proyectado_base / data['acciones_circulacion']
-        precio_objetivo_ps = revenue_per_share_proyectado * data['ps_esperado']
-        st.write(f"**Revenue Proyectado (Base):** ${revenue_proyectado_base:,.2f}")
+    if resultado.precio_objetivo_ps > 0:
+        st.write(f"**Revenue Proyectado (Base):** ${data['revenue_base']:,.2f}")
         st.write(f"**Acciones en Circulación:** {data['acciones_circulacion']:,.0f}")
-        st.write(f"**Revenue por Acción Proyectado:** ${revenue_per_share_proyectado:,.2f}")
+        st.write(f"**Revenue por Acción Proyectado:** ${resultado.revenue_per_share_proyectado:,.2f}")
         st.write(f"**P/S Esperado:** {data['ps_esperado']:,.2f}x")
-        st.success(f"**Precio Objetivo (P/S Proyectado):** ${precio_objetivo_ps:,.2f}")
+        st.success(f"**Precio Objetivo (P/S Proyectado):** ${resultado.precio_objetivo_ps:,.2f}")
     else:
         st.warning("No se puede calcular el Precio Objetivo (P/S Proyectado). Asegúrate de ingresar Revenue Base, Acciones en Circulación y P/S Esperado > 0.")
 
-    # Cálculo del Precio Objetivo basado en P/B Proyectado
+    # Precio Objetivo basado en P/B Proyectado
     st.markdown("---")
     st.markdown("#### Precio Objetivo basado en P/B Proyectado")
-    if data['equity_proyectado'] > 0 and data['acciones_circulacion'] > 0 and data['pb_esperado'] > 0:
-        book_value_per_share_proyectado = data['equity_proyectado'] / data['acciones_circulacion']
-        precio_objetivo_pb = book_value_per_share_proyectado * data['pb_esperado']
+    if resultado.precio_objetivo_pb > 0:
         st.write(f"**Equity Proyectado:** ${data['equity_proyectado']:,.2f}")
         st.write(f"**Acciones en Circulación:** {data['acciones_circulacion']:,.0f}")
-        st.write(f"**Book Value por Acción Proyectado:** ${book_value_per_share_proyectado:,.2f}")
+        st.write(f"**Book Value por Acción Proyectado:** ${resultado.book_value_per_share_proyectado:,.2f}")
         st.write(f"**P/B Esperado:** {data['pb_esperado']:,.2f}x")
-        st.success(f"**Precio Objetivo (P/B Proyectado):** ${precio_objetivo_pb:,.2f}")
+        st.success(f"**Precio Objetivo (P/B Proyectado):** ${resultado.precio_objetivo_pb:,.2f}")
     else:
         st.warning("No se puede calcular el Precio Objetivo (P/B Proyectado). Asegúrate de ingresar Equity Proyectado, Acciones en Circulación y P/B Esperado > 0.")
 
     # Promedio simple de precios objetivo por múltiplos válidos
     st.markdown("---")
-    precios_validos = [p for p in [precio_objetivo_pe, precio_objetivo_ps, precio_objetivo_pb] if p > 0]
-    if precios_validos:
-        precio_promedio_multiplos = np.mean(precios_validos)
-        st.success(f"**Precio Objetivo Promedio por Múltiplos:** ${precio_promedio_multiplos:,.2f}")
-        return precio_promedio_multiplos
+    if resultado.precio_promedio > 0:
+        st.success(f"**Precio Objetivo Promedio por Múltiplos:** ${resultado.precio_promedio:,.2f}")
     else:
         st.info("No se pudo calcular un precio objetivo promedio por múltiplos. Se necesitan más datos válidos.")
-        return 0.0
+    return resultado.precio_promedio
 
 # ===================== SECCIÓN: Descuento de Flujos de Caja (DCF) =====================
 def valuacion_dcf(data, nombre_escenario="Base", factor_crecimiento=1.0, factor_wacc=1.0):
     """
-    Realiza la valuación de la acción utilizando el método de Descuento de Flujos de Caja (DCF).
-    Proyecta el Flujo de Caja Libre (FCF) y lo descuenta al presente.
-    Ajusta la tasa de crecimiento y WACC según el factor del escenario.
+    Muestra la valuación de la acción utilizando el método de Descuento de Flujos de Caja (DCF).
+    El cálculo lo realiza `motor_valuacion.valuar_dcf`; aquí solo se presentan sus resultados.
+    Retorna el precio objetivo y la lista de FCF proyectados.
     """
     st.subheader(f"Valuación DCF - Escenario {nombre_escenario}")
     st.markdown("El DCF estima el valor intrínseco de una empresa basándose en sus flujos de caja futuros proyectados, descontados a su valor presente.")
 
-    # Parámetros clave para DCF, ajustados por el factor del escenario
-    net_income_estimado = data['net_income_estimado']
-    acciones_circulacion = data['acciones_circulacion']
-    wacc = (data['wacc'] / 100) * factor_wacc # Ajuste del WACC por escenario
-    tasa_crecimiento_esperada = (data['tasa_crecimiento_esperada'] / 100) * factor_crecimiento # Ajuste de tasa de crecimiento
-    años_proyeccion = int(data['años_proyeccion_dcf'])
-    tasa_crecimiento_perpetuo = (data['tasa_crecimiento_perpetuo'] / 100) # La tasa perpetua no se ajusta por escenario
+    resultado = valuar_dcf(data, nombre_escenario, factor_crecimiento, factor_wacc)
 
-    # Validación de parámetros mínimos
-    if not all([net_income_estimado > 0, acciones_circulacion > 0, wacc > 0, tasa_crecimiento_esperada >= 0, años_proyeccion > 0]):
+    if not resultado.valido:
         st.warning(f"No se puede realizar la valuación DCF para el escenario {nombre_escenario}. Faltan datos clave (Net Income Estimado, Acciones en Circulación, WACC, Tasa de Crecimiento Esperada, Años de Proyección).")
         return 0.0, []
 
+    horizonte = resultado.horizonte
     st.write(f"**Parámetros DCF para {nombre_escenario}:**")
-    st.write(f"- Años de Proyección Explícita: {años_proyeccion}")
-    st.write(f"- WACC (Tasa de Descuento Ajustada): {wacc*100:.2f}%")
-    st.write(f"- Tasa de Crecimiento Esperada (Fase 1 Ajustada): {tasa_crecimiento_esperada*100:.2f}%")
-    st.write(f"- Tasa de Crecimiento Perpetuo (Fase 2): {tasa_crecimiento_perpetuo*100:.2f}%")
-    st.write(f"- Net Income Estimado Inicial: ${net_income_estimado:,.2f}")
+    st.write(f"- Años de Proyección Explícita: {resultado.años_proyeccion}")
+    if resultado.años_transicion > 0:
+        st.write(f"- Años de Transición (Fase 2): {resultado.años_transicion} (horizonte total: {horizonte} años)")
+    st.write(f"- WACC (Tasa de Descuento Ajustada): {resultado.wacc*100:.2f}%")
+    st.write(f"- Tasa de Crecimiento Esperada (Fase 1 Ajustada): {resultado.tasa_crecimiento_esperada*100:.2f}%")
+    st.write(f"- Tasa de Crecimiento Perpetuo ({'Fase 3' if resultado.años_transicion > 0 else 'Fase 2'}): {resultado.tasa_crecimiento_perpetuo*100:.2f}%")
+    st.write(f"- Net Income Estimado Inicial: ${resultado.net_income_estimado:,.2f}")
+    st.write(f"- Tasa de Reinversión: {resultado.tasa_reinversion*100:.2f}% del Net Income")
+    descuento_fechado = resultado.momento_valor_terminal != horizonte or bool(data['flujos_medio_año'])
+    if descuento_fechado:
+        st.write(f"- Convención de descuento: {descripcion_calendario(data)}")
 
     # Proyección de Flujos de Caja Libres (FCF)
-    # Simplificación: Asumimos FCF = Net Income para este modelo sin APIs.
-    # En un modelo real, el FCF se calcularía con más detalle.
-    fcf_proyectados = []
-    valor_presente_fcf = 0.0
-    
     st.markdown("---")
     st.write("**Proyección de Flujos de Caja Libres (FCF) y su Valor Presente:**")
-    st.write("*(Asumiendo FCF = Net Income para simplificación)*")
-
-    current_fcf = net_income_estimado # FCF del Año 0 (base para la proyección)
-    
-    # Tabla para mostrar la proyección de FCF
-    fcf_table_data = [["Año", "FCF Proyectado", "Factor de Descuento", "Valor Presente FCF"]]
-
-    for i in range(1, años_proyeccion + 1):
-        # El FCF crece a la tasa de crecimiento esperada
-        current_fcf *= (1 + tasa_crecimiento_esperada)
-        fcf_proyectados.append(current_fcf)
-        
-        # Descontamos el FCF al valor presente usando el WACC
-        factor_descuento = (1 + wacc)**i
-        vp_fcf_año = current_fcf / factor_descuento
-        valor_presente_fcf += vp_fcf_año
-        fcf_table_data.append([f"{i}", f"${current_fcf:,.2f}", f"1/({factor_descuento:,.2f})", f"${vp_fcf_año:,.2f}"])
-    
-    st.table(pd.DataFrame(fcf_table_data[1:], columns=fcf_table_data[0]))
-    st.write(f"**Suma Total de Valores Presentes de FCF (Fase 1 - Período Explícito):** ${valor_presente_fcf:,.2f}")
+    con_revenue = data['revenue_base'] > 0
+    if con_revenue:
+        st.write("*(Revenue del escenario × margen neto implícito = Net Income; FCF = Net Income − Reinversión)*")
+    else:
+        st.write("*(Sin Revenue Base se proyecta el Net Income directamente; FCF = Net Income − Reinversión)*")
+
+    # Tabla numérica con formato por columna: st.dataframe la pagina y virtualiza, así que
+    # horizontes largos no generan miles de filas HTML.
+    columnas_tabla = {"Año": np.arange(1, horizonte + 1), "Crecimiento": np.asarray(resultado.tasas_crecimiento) * 100}
+    if con_revenue:
+        columnas_tabla["Revenue"] = resultado.revenue_proyectados
+        columnas_tabla["Margen Neto"] = np.asarray(resultado.margenes_netos) * 100
+    columnas_tabla["Net Income"] = resultado.net_income_proyectados
+    columnas_tabla["Reinversión"] = resultado.reinversiones
+    columnas_tabla["FCF Proyectado"] = resultado.fcf_proyectados
+    if descuento_fechado:
+        columnas_tabla["Momento (años)"] = resultado.momentos_flujos
+    columnas_tabla["Factor de Descuento"] = resultado.factores_descuento
+    columnas_tabla["Valor Presente FCF"] = resultado.valores_presentes_fcf
+    fcf_table = pd.DataFrame(columnas_tabla)
+    st.dataframe(
+        fcf_table,
+        hide_index=True,
+        use_container_width=True,
+        height=min(38 + 35 * horizonte, 390),
+        column_config={
+            "Crecimiento": st.column_config.NumberColumn(format="%.2f%%"),
+            "Revenue": st.column_config.NumberColumn(format="dollar"),
+            "Margen Neto": st.column_config.NumberColumn(format="%.2f%%"),
+            "Net Income": st.column_config.NumberColumn(format="dollar"),
+            "Reinversión": st.column_config.NumberColumn(format="dollar"),
+            "FCF Proyectado": st.column_config.NumberColumn(format="dollar"),
+            "Momento (años)": st.column_config.NumberColumn(format="%.4f"),
+            "Factor de Descuento": st.column_config.NumberColumn(format="1/(%.4f)"),
+            "Valor Presente FCF": st.column_config.NumberColumn(format="dollar"),
+        },
+    )
+    st.write(f"**Suma Total de Valores Presentes de FCF (Período Explícito):** ${resultado.valor_presente_fcf:,.2f}")
 
     # ===================== Método de Crecimiento Perpetuo (parte del DCF) =====================
     st.markdown("---")
     st.write("**Cálculo de Valor Terminal (Método de Crecimiento Perpetuo):**")
     st.markdown("El Valor Terminal representa el valor de todos los flujos de caja futuros de la empresa más allá del período de proyección explícita.")
-    
-    valor_terminal = 0.0
-    if wacc > tasa_crecimiento_perpetuo:
-        # El FCF del último año proyectado es la base para el cálculo del valor terminal.
-        fcf_ultimo_año_proyeccion = fcf_proyectados[-1] if fcf_proyectados else net_income_estimado
-        # El FCF para el primer año de la perpetuidad (Año N+1)
-        fcf_siguiente_periodo = fcf_ultimo_año_proyeccion * (1 + tasa_crecimiento_perpetuo)
-        
-        # Fórmula de crecimiento perpetuo (Gordon Growth Model)
-        valor_terminal = fcf_siguiente_periodo / (wacc - tasa_crecimiento_perpetuo)
-        
-        st.write(f"FCF del Último Año Proyectado (Año {años_proyeccion}): ${fcf_ultimo_año_proyeccion:,.2f}")
-        st.write(f"FCF del Siguiente Periodo (Año {años_proyeccion + 1} para Perpetuidad): ${fcf_siguiente_periodo:,.2f}")
-        st.write(f"**Valor Terminal (al final del Año {años_proyeccion}):** ${valor_terminal:,.2f}")
+
+    if resultado.valor_terminal_calculable:
+        st.write(f"FCF del Último Año Proyectado (Año {horizonte}): ${resultado.fcf_proyectados[-1]:,.2f}")
+        st.write(f"FCF del Siguiente Periodo (Año {horizonte + 1} para Perpetuidad): ${resultado.fcf_siguiente_periodo:,.2f}")
+        st.write(f"**Valor Terminal (al final del Año {horizonte}, descontado a {resultado.momento_valor_terminal:.4f} años):** ${resultado.valor_terminal:,.2f}")
     else:
         st.warning("Advertencia: Para calcular el Valor Terminal por crecimiento perpetuo, el WACC debe ser mayor que la Tasa de Crecimiento Perpetuo.")
 
-    # Valor Presente del Valor Terminal
-    valor_presente_valor_terminal = valor_terminal / ((1 + wacc)**años_proyeccion)
-    st.write(f"**Valor Presente del Valor Terminal:** ${valor_presente_valor_terminal:,.2f}")
-
-    # Valor de la Empresa (Enterprise Value)
-    valor_empresa = valor_presente_fcf + valor_presente_valor_terminal
-    st.write(f"**Valor Total de la Empresa (Suma de FCF Descontados + Valor Terminal Descontado):** ${valor_empresa:,.2f}")
-
-    # Valor de la Equidad (Equity Value)
-    # Para este modelo simplificado, asumimos que el Valor de la Equidad es igual al Valor de la Empresa.
-    # En un análisis real, se ajustaría por la deuda neta y el efectivo.
-    valor_equidad = valor_empresa 
-    st.write(f"**Valor de la Equidad (Implícito):** ${valor_equidad:,.2f}")
-
-    # Precio Objetivo por Acción
-    precio_objetivo_dcf = 0.0
-    if acciones_circulacion > 0:
-        precio_objetivo_dcf = valor_equidad / acciones_circulacion
-        st.success(f"**Precio Objetivo por Acción (DCF - {nombre_escenario}):** ${precio_objetivo_dcf:,.2f}")
-    else:
-        st.warning("No se puede calcular el Precio Objetivo por Acción. El número de acciones en circulación es cero.")
-    
-    return precio_objetivo_dcf, fcf_proyectados
+    st.write(f"**Valor Presente del Valor Terminal:** ${resultado.valor_presente_valor_terminal:,.2f}")
+    st.write(f"**Valor Total de la Empresa (Suma de FCF Descontados + Valor Terminal Descontado):** ${resultado.valor_empresa:,.2f}")
+    # Para este modelo simplificado, el Valor de la Equidad es igual al Valor de la Empresa.
+    st.write(f"**Valor de la Equidad (Implícito):** ${resultado.valor_equidad:,.2f}")
+    st.success(f"**Precio Objetivo por Acción (DCF - {nombre_escenario}):** ${resultado.precio_objetivo:,.2f}")
+
+    return resultado.precio_objetivo, resultado.fcf_proyectados
 
 # ===================== Método de Múltiplo Terminal (Exit Multiple) =====================
 def valuacion_multiplo_terminal(data, nombre_escenario="Base", factor_crecimiento=1.0, factor_wacc=1.0):
     """
-    Realiza la valuación utilizando el método de Múltiplo Terminal (Exit Multiple).
-    Calcula el valor terminal aplicando un múltiplo (ej. P/E) a una métrica financiera proyectada
-    al final del período de proyección.
+    Muestra la valuación utilizando el método de Múltiplo Terminal (Exit Multiple).
+    El cálculo lo realiza `motor_valuacion.valuar_multiplo_terminal`.
     """
     st.subheader(f"Valuación por Múltiplo Terminal - Escenario {nombre_escenario}")
     st.markdown("Este método estima el valor de la empresa al final del período de proyección explícita, aplicando un múltiplo de valoración a una métrica financiera clave.")
 
-    # Parámetros clave, ajustados por el factor del escenario
-    net_income_estimado = data['net_income_estimado']
-    acciones_circulacion = data['acciones_circulacion']
-    wacc = (data['wacc'] / 100) * factor_wacc
-    tasa_crecimiento_esperada = (data['tasa_crecimiento_esperada'] / 100) * factor_crecimiento
-    años_proyeccion = int(data['años_proyeccion_dcf'])
-    per_terminal_esperado = data['per_esperado'] # Usamos el PER esperado como múltiplo terminal
+    resultado = valuar_multiplo_terminal(data, nombre_escenario, factor_crecimiento, factor_wacc)
 
-    # Validación de parámetros mínimos
-    if not all([net_income_estimado > 0, acciones_circulacion > 0, wacc > 0, tasa_crecimiento_esperada >= 0, años_proyeccion > 0, per_terminal_esperado > 0]):
+    if not resultado.valido:
         st.warning(f"No se puede realizar la valuación por Múltiplo Terminal para el escenario {nombre_escenario}. Faltan datos clave (Net Income Estimado, Acciones en Circulación, WACC, Tasa de Crecimiento Esperada, Años de Proyección, PER Esperado).")
         return 0.0
 
+    horizonte = resultado.horizonte
     st.write(f"**Parámetros Múltiplo Terminal para {nombre_escenario}:**")
-    st.write(f"- Años de Proyección Explícita: {años_proyeccion}")
-    st.write(f"- WACC (Tasa de Descuento Ajustada): {wacc*100:.2f}%")
-    st.write(f"- Tasa de Crecimiento Esperada (Ajustada): {tasa_crecimiento_esperada*100:.2f}%")
-    st.write(f"- PER Terminal Esperado: {per_terminal_esperado:.2f}x")
-
-    # Proyección de Net Income hasta el último año del período explícito
-    net_income_proyectado_final = net_income_estimado
-    for i in range(años_proyeccion):
-        net_income_proyectado_final *= (1 + tasa_crecimiento_esperada)
-    
-    st.write(f"Net Income Proyectado al final del Año {años_proyeccion}: ${net_income_proyectado_final:,.2f}")
+    st.write(f"- Años de Proyección Explícita: {resultado.años_proyeccion}")
+    if resultado.años_transicion > 0:
+        st.write(f"- Años de Transición: {resultado.años_transicion} (horizonte total: {horizonte} años)")
+    st.write(f"- WACC (Tasa de Descuento Ajustada): {resultado.wacc*100:.2f}%")
+    st.write(f"- Tasa de Crecimiento Esperada (Ajustada): {resultado.tasa_crecimiento_esperada*100:.2f}%")
+    st.write(f"- PER Terminal Esperado: {resultado.per_terminal:.2f}x")
+    st.write(f"Net Income Proyectado al final del Año {horizonte}: ${resultado.net_income_proyectado_final:,.2f}")
+    st.write(f"**Valor Terminal (al final del Año {horizonte}, descontado a {resultado.momento_valor_terminal:.4f} años):** ${resultado.valor_terminal:,.2f}")
+    st.write(f"**Valor Presente del Valor Terminal:** ${resultado.valor_presente_valor_terminal:,.2f}")
+    st.success(f"**Precio Objetivo por Acción (Múltiplo Terminal - {nombre_escenario}):** ${resultado.precio_objetivo:,.2f}")
+
+    return resultado.precio_objetivo
+
+# ===================== SECCIÓN: Modelo de Descuento de Dividendos (DDM) =====================
+def valuacion_ddm(data):
+    """
+    Muestra la valuación por descuento de dividendos (Gordon y multietapa) para los escenarios
+    predeterminados. El cálculo lo realiza `motor_valuacion.valuar_ddm_escenarios` en una sola
+    llamada vectorizada. Retorna el resultado para guardar los precios en el reporte.
+    """
+    st.markdown("### Modelo de Descuento de Dividendos (DDM)")
+    st.markdown("Valúa la acción como el valor presente de los dividendos por acción futuros. El modelo de **Gordon** asume que el dividendo crece a la tasa perpetua desde el primer año; el **multietapa** recorre las mismas etapas que el DCF (crecimiento esperado, transición y perpetuidad) antes del valor terminal.")
+
+    resultado = valuar_ddm_escenarios(
+        data,
+        factores_crecimiento=[fc for _, fc, _ in ESCENARIOS_PREDETERMINADOS],
+        factores_wacc=[fw for _, _, fw in ESCENARIOS_PREDETERMINADOS],
+    )
+    if data['dividendos_anuales'] <= 0:
+        st.info("La empresa no tiene dividendos anuales esperados: el DDM no es aplicable.")
+        return resultado
+
+    st.write(f"- Dividendo Anual por Acción: ${data['dividendos_anuales']:,.2f}")
+    st.write(f"- Tasa de Descuento: WACC de cada escenario; Crecimiento Perpetuo: {data['tasa_crecimiento_perpetuo']:.2f}%")
+    ddm_df = pd.DataFrame({
+        "Escenario": [nombre for nombre, _, _ in ESCENARIOS_PREDETERMINADOS],
+        "Tasa de Descuento (%)": [data['wacc'] * fw for _, _, fw in ESCENARIOS_PREDETERMINADOS],
+        "Precio DDM Gordon": resultado.precio_gordon,
+        "Precio DDM Multietapa": resultado.precio_multietapa,
+    })
+    st.dataframe(
+        ddm_df,
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            "Tasa de Descuento (%)": st.column_config.NumberColumn(format="%.2f%%"),
+            "Precio DDM Gordon": st.column_config.NumberColumn(format="dollar"),
+            "Precio DDM Multietapa": st.column_config.NumberColumn(format="dollar"),
+        },
+    )
+    if not resultado.valido_multietapa.all():
+        st.warning("En algunos escenarios el DDM no está definido: la tasa de descuento debe ser mayor que la Tasa de Crecimiento Perpetuo y la tasa de crecimiento no puede ser negativa.")
+    return resultado
+
+# ===================== SECCIÓN: Costo de Capital (CAPM → WACC) =====================
+@st.cache_data(show_spinner=False, max_entries=8)
+def cargar_precios_subidos(archivos):
+    """Alinea por fecha los archivos de precios subidos, dados como tuplas (nombre, contenido)."""
+    fuentes = []
+    for nombre, contenido in archivos:
+        fuente = io.BytesIO(contenido)
+        fuente.name = nombre # La extensión decide si se lee como CSV o Parquet.
+        fuentes.append(fuente)
+    return cargar_precios(fuentes)
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def calcular_betas_subidas(archivos, indice, ventana, ajuste_blume):
+    """Betas móviles de todos los tickers de los archivos subidos contra `indice` (en caché)."""
+    return estimar_betas(cargar_precios_subidos(archivos), indice, ventana, ajuste_blume=ajuste_blume)
+
+def constructor_wacc(data):
+    """
+    Arma el WACC con CAPM (tasa libre de riesgo, beta y prima de riesgo de mercado) y la
+    estructura de capital, y lo escribe en `data['wacc']`. La beta puede ingresarse o
+    estimarse con archivos locales de precios diarios contra un índice.
+    """
+    col1, col2 = st.columns(2)
+    with col1:
+        data['tasa_libre_riesgo'] = st.number_input(
+            "Tasa Libre de Riesgo (%)", min_value=0.0, max_value=30.0, value=float(data['tasa_libre_riesgo']), format="%.2f",
+            help="Rendimiento de un bono soberano de largo plazo en la moneda de los flujos."
+        )
+        data['prima_riesgo_mercado'] = st.number_input(
+            "Prima de Riesgo de Mercado (%)", min_value=0.0, max_value=30.0, value=float(data['prima_riesgo_mercado']), format="%.2f",
+            help="Rendimiento adicional que exige el mercado accionario sobre la tasa libre de riesgo."
+        )
+    with col2:
+        data['costo_deuda'] = st.number_input(
+            "Costo de la Deuda (%)", min_value=0.0, max_value=50.0, value=float(data['costo_deuda']), format="%.2f",
+            help="Tasa antes de impuestos a la que la empresa puede endeudarse hoy."
+        )
+        data['tasa_impuestos'] = st.number_input(
+            "Tasa de Impuestos (%)", min_value=0.0, max_value=100.0, value=float(data['tasa_impuestos']), format="%.2f",
+            help="Tasa impositiva efectiva: los intereses de la deuda son deducibles."
+        )
+        data['proporcion_deuda'] = st.number_input(
+            "Deuda / (Deuda + Capital Propio) (%)", min_value=0.0, max_value=100.0, value=float(data['proporcion_deuda']), format="%.2f",
+            help="Peso de la deuda en la estructura de capital, a valor de mercado."
+        )
+
+    # Beta estimada con precios históricos (opcional).
+    tipos = ["csv", "parquet"] if PARQUET_DISPONIBLE else ["csv"]
+    subidos = st.file_uploader(
+        "Precios diarios para estimar la beta (CSV o Parquet)", type=tipos, accept_multiple_files=True, key="capm_archivos",
+        help="Formato ancho (columna 'fecha' y una columna de cierre por ticker, incluido el índice) o largo (columnas 'fecha', 'ticker' y 'cierre')."
+    )
+    usar_beta_estimada = False
+    if subidos:
+        archivos = tuple((archivo.name, archivo.getvalue()) for archivo in subidos)
+        try:
+            series = cargar_precios_subidos(archivos)
+        except (ValueError, KeyError) as e:
+            st.error(f"No se pudieron leer los precios: {e}")
+            series = None
+        if series is not None and len(series.tickers) >= 2 and series.precios.shape[0] > 3:
+            col1, col2 = st.columns(2)
+            with col1:
+                indice = st.selectbox("Índice de Referencia", series.tickers, key="capm_indice")
+                ticker = st.selectbox("Ticker a Valuar", [t for t in series.tickers if t != indice], key="capm_ticker")
+            with col2:
+                maxima = series.precios.shape[0] - 1
+                ventana = st.slider(
+                    "Ventana de la Beta (días)", min_value=2, max_value=maxima, value=min(VENTANA_BETA, maxima), key="capm_ventana",
+                    help="Rendimientos diarios de cada ventana móvil (252 ≈ un año bursátil)."
+                )
+                ajuste_blume = st.checkbox(
+                    "Ajuste de Blume", value=False, key="capm_blume",
+                    help="Acerca la beta estimada a 1 (2/3 × beta + 1/3), como hacen los proveedores de datos."
+                )
+            betas = calcular_betas_subidas(archivos, indice, ventana, ajuste_blume)
+            columna = betas.tickers.index(ticker)
+            beta_estimada = float(betas.beta_actual[columna])
+            if np.isfinite(beta_estimada):
+                st.info(f"Beta estimada de {ticker} contra {indice}: **{beta_estimada:.2f}** ({int(betas.observaciones[-1, columna])} días en la última ventana).")
+                usar_beta_estimada = st.checkbox("Usar la beta estimada", value=True, key="capm_usar_beta")
+                if usar_beta_estimada:
+                    data['beta'] = beta_estimada
+                fig_beta = go.Figure(go.Scatter(x=betas.fechas, y=betas.betas[:, columna], mode='lines', line=dict(color='#00FFC0')))
+                fig_beta.update_layout(
+                    title_text=f'Beta Móvil de {ticker} ({ventana} días)', xaxis_title='Fecha', yaxis_title='Beta',
+                    plot_bgcolor='#0A0A1A', paper_bgcolor='#0A0A1A', font_color='#F8F8F8', height=300,
+                )
+                st.plotly_chart(fig_beta, use_container_width=True)
+            else:
+                st.warning(f"No hay suficientes días con datos de {ticker} y {indice} en la última ventana para estimar la beta.")
+
+    data['beta'] = st.number_input(
+        "Beta", min_value=-5.0, max_value=10.0, value=float(np.clip(data['beta'], -5.0, 10.0)), format="%.2f",
+        disabled=usar_beta_estimada,
+        help="Sensibilidad del rendimiento de la acción al del mercado."
+    )
+
+    resultado = wacc_capm(
+        data['tasa_libre_riesgo'], data['beta'], data['prima_riesgo_mercado'],
+        data['costo_deuda'], data['tasa_impuestos'], data['proporcion_deuda'],
+    )
+    wacc = float(resultado.wacc)
+    if not 0.0 <= wacc <= 100.0:
+        st.error(f"El WACC calculado ({wacc:.2f}%) está fuera del rango admitido (0% - 100%); se mantiene el WACC anterior.")
+        return
+    data['wacc'] = wacc
+    st.info(
+        f"Costo del Capital Propio = {data['tasa_libre_riesgo']:.2f}% + {data['beta']:.2f} × {data['prima_riesgo_mercado']:.2f}% = "
+        f"**{float(resultado.costo_capital_propio):.2f}%** · Costo de la Deuda después de Impuestos = "
+        f"**{float(resultado.costo_deuda_despues_impuestos):.2f}%** · WACC = {float(resultado.peso_capital_propio):.0%} × Ke + "
+        f"{float(resultado.peso_deuda):.0%} × Kd = **{wacc:.2f}%**"
+    )
 
-    # Cálculo del Valor Terminal aplicando el múltiplo PER al Net Income proyectado
-    valor_terminal_multiplo = net_income_proyectado_final * per_terminal_esperado
-    st.write(f"**Valor Terminal (al final del Año {años_proyeccion}):** ${valor_terminal_multiplo:,.2f}")
+# ===================== SECCIÓN: Comparables del Sector =====================
+@st.cache_resource(show_spinner=False, max_entries=4)
+def pares_subidos(nombre, contenido):
+    """Tabla de pares subida, leída e indexada una sola vez (en caché según el contenido)."""
+    fuente = io.BytesIO(contenido)
+    fuente.name = nombre # La extensión decide si se lee como CSV, Parquet o Arrow.
+    return leer_pares(fuente)
 
-    # Descontar el Valor Terminal al presente
-    valor_presente_multiplo_terminal = valor_terminal_multiplo / ((1 + wacc)**años_proyeccion)
-    st.write(f"**Valor Presente del Valor Terminal:** ${valor_presente_multiplo_terminal:,.2f}")
+def opciones_comparables(prefijo):
+    """
+    Carga de la tabla de pares y elección del estadístico del sector. Retorna (nombre,
+    contenido, pares indexados, estadístico, recorte) o None si no hay una tabla válida.
+    """
+    tipos = ["csv", "parquet", "arrow", "feather"] if PARQUET_DISPONIBLE else ["csv"]
+    archivo = st.file_uploader(
+        "Tabla de Pares (CSV, Parquet o Arrow)", type=tipos, key=f"{prefijo}_pares_archivo",
+        help="Una fila por empresa comparable con las columnas 'sector', 'per', 'ps' y 'pb'. Los múltiplos no positivos se ignoran."
+    )
+    if archivo is None:
+        return None
+    try:
+        pares = pares_subidos(archivo.name, archivo.getvalue())
+    except (ValueError, KeyError) as e:
+        st.error(f"No se pudo leer la tabla de pares: {e}")
+        return None
+    col1, col2 = st.columns(2)
+    with col1:
+        estadistico = st.radio(
+            "Múltiplo Esperado del Sector", ESTADISTICOS, format_func=ETIQUETAS_ESTADISTICOS.get, horizontal=True,
+            key=f"{prefijo}_pares_estadistico",
+            help="La media recortada descarta los pares más extremos de cada lado antes de promediar."
+        )
+    recorte = RECORTE_PREDETERMINADO
+    if estadistico == MEDIA_RECORTADA:
+        with col2:
+            recorte = st.slider(
+                "Recorte por Extremo (%)", min_value=0, max_value=40, value=int(RECORTE_PREDETERMINADO * 100), step=5,
+                key=f"{prefijo}_pares_recorte"
+            ) / 100
+    return archivo.name, archivo.getvalue(), pares, estadistico, recorte
+
+def seccion_comparables(data):
+    """
+    Múltiplos esperados desde una tabla local de pares: la mediana o la media recortada del
+    sector elegido reemplaza al P/E, P/S y P/B esperados, y se muestra el percentil de los
+    múltiplos actuales de la empresa entre sus pares. Retorna los campos reemplazados.
+    """
+    if not st.checkbox(
+        "Derivar de comparables del sector", value=False, key="pares_usar",
+        help="Toma los múltiplos esperados de una tabla local de empresas comparables en lugar de ingresarlos."
+    ):
+        return set()
+    opciones = opciones_comparables("empresa")
+    if opciones is None:
+        return set()
+    _, _, pares, estadistico, recorte = opciones
+    if pares.sectores.empty:
+        st.warning("La tabla de pares no tiene ningún sector.")
+        return set()
+    sector = st.selectbox("Sector de la Empresa", pares.sectores, key="pares_sector")
+    por_sector = pares.tabla_sectores(estadistico, recorte).loc[sector]
+    actuales = multiplos_actuales(data)
+    reemplazados, filas = set(), []
+    for multiplo in MULTIPLOS_PARES:
+        esperado = float(por_sector[multiplo])
+        if np.isfinite(esperado):
+            data[CAMPOS_ESPERADOS[multiplo]] = esperado
+            reemplazados.add(CAMPOS_ESPERADOS[multiplo])
+        filas.append({
+            'Múltiplo': ETIQUETAS_MULTIPLOS[multiplo],
+            'Pares': int(por_sector[f'n_{multiplo}']),
+            'Esperado': esperado,
+            'Actual': float(actuales[multiplo]),
+            'Percentil': float(pares.percentil(multiplo, [sector], [actuales[multiplo]])[0]),
+        })
+    st.dataframe(
+        pd.DataFrame(filas),
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            'Esperado': st.column_config.NumberColumn(f"{ETIQUETAS_ESTADISTICOS[estadistico]} del Sector", format="%.2fx"),
+            'Actual': st.column_config.NumberColumn("Actual de la Empresa", format="%.2fx"),
+            'Percentil': st.column_config.NumberColumn("Percentil en el Sector", format="%.0f"),
+        },
+    )
+    if len(reemplazados) < len(MULTIPLOS_PARES):
+        st.caption("Los múltiplos sin pares suficientes en el sector se mantienen como se ingresaron.")
+    return reemplazados
+
+# ===================== SECCIÓN: Mapa de Sensibilidad WACC × Crecimiento =====================
+@st.cache_data(show_spinner=False, max_entries=32)
+def calcular_grilla_sensibilidad(net_income_estimado, acciones_circulacion, tasa_crecimiento_perpetuo,
+                                 años_proyeccion_dcf, años_transicion_dcf, per_esperado, tasa_reinversion,
+                                 dividendos_anuales, fecha_valuacion, mes_cierre_fiscal, flujos_medio_año, periodo_parcial,
+                                 rango_wacc, rango_crecimiento, resolucion):
+    """
+    Calcula (y guarda en caché según los inputs) los precios por acción DCF, por Múltiplo
+    Terminal y por DDM multietapa sobre una grilla densa WACC × crecimiento, en una sola
+    pasada vectorizada por método.
+    Solo recibe los inputs que afectan a la grilla para no invalidar la caché innecesariamente.
+    """
+    waccs = np.linspace(rango_wacc[0], rango_wacc[1], resolucion)
+    tasas_crecimiento = np.linspace(rango_crecimiento[0], rango_crecimiento[1], resolucion)
+    data_grilla = {
+        'net_income_estimado': net_income_estimado,
+        'acciones_circulacion': acciones_circulacion,
+        'tasa_crecimiento_perpetuo': tasa_crecimiento_perpetuo,
+        'años_proyeccion_dcf': años_proyeccion_dcf,
+        'años_transicion_dcf': años_transicion_dcf,
+        'per_esperado': per_esperado,
+        'tasa_reinversion': tasa_reinversion,
+        'dividendos_anuales': dividendos_anuales,
+        'fecha_valuacion': fecha_valuacion,
+        'mes_cierre_fiscal': mes_cierre_fiscal,
+        'flujos_medio_año': flujos_medio_año,
+        'periodo_parcial': periodo_parcial,
+    }
+    resultado = grilla_sensibilidad(data_grilla, waccs, tasas_crecimiento)
+    precios_ddm = grilla_sensibilidad_ddm(data_grilla, waccs, tasas_crecimiento)
+    return waccs, tasas_crecimiento, resultado.precio_dcf, resultado.precio_multiplo_terminal, precios_ddm
+
+def rango_inicial_slider(valor, minimo, maximo, paso=0.1):
+    """
+    Rango inicial (bajo, alto) de un slider de rango alrededor de `valor` (del 50% al 150%),
+    recortado a [minimo, maximo] y con bajo < alto aunque el valor caiga fuera del slider.
+    """
+    alto = min(maximo, max(valor * 1.5, minimo + paso, 1.0))
+    bajo = max(minimo, min(valor * 0.5, alto - paso))
+    return float(round(bajo, 10)), float(round(alto, 10))
+
+def mapa_sensibilidad(data):
+    """
+    Muestra un mapa de calor del precio por acción sobre la grilla WACC × crecimiento,
+    con el precio actual de mercado como curva de nivel.
+    """
+    st.markdown("### Mapa de Sensibilidad WACC × Crecimiento")
+    st.markdown("Cada celda es el precio por acción estimado para una combinación de WACC y tasa de crecimiento. La línea punteada marca el precio actual: a la izquierda/abajo de ella el modelo justifica un precio mayor al de mercado.")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        metodo = st.selectbox("Método de Valuación", ["DCF (Crecimiento Perpetuo)", "Múltiplo Terminal", "DDM (Multietapa)"], key="sensibilidad_metodo")
+        rango_wacc = st.slider(
+            "Rango de WACC (%)", min_value=0.5, max_value=30.0,
+            value=rango_inicial_slider(data['wacc'], 0.5, 30.0), step=0.1,
+            key="sensibilidad_rango_wacc", help="Rango del eje vertical del mapa de calor."
+        )
+    with col2:
+        resolucion = st.slider(
+            "Resolución de la Grilla", min_value=20, max_value=400, value=200, step=10,
+            key="sensibilidad_resolucion", help="Número de puntos por eje (200 = 40.000 valuaciones)."
+        )
+        rango_crecimiento = st.slider(
+            "Rango de Tasa de Crecimiento (%)", min_value=0.0, max_value=60.0,
+            value=rango_inicial_slider(data['tasa_crecimiento_esperada'], 0.0, 60.0), step=0.1,
+            key="sensibilidad_rango_crecimiento", help="Rango del eje horizontal del mapa de calor."
+        )
+
+    waccs, tasas_crecimiento, precios_dcf, precios_multiplo_terminal, precios_ddm = calcular_grilla_sensibilidad(
+        data['net_income_estimado'], data['acciones_circulacion'], data['tasa_crecimiento_perpetuo'],
+        int(data['años_proyeccion_dcf']), int(data['años_transicion_dcf']), data['per_esperado'], data['tasa_reinversion'],
+        data['dividendos_anuales'], data['fecha_valuacion'], int(data['mes_cierre_fiscal']), data['flujos_medio_año'],
+        data['periodo_parcial'], rango_wacc, rango_crecimiento, resolucion
+    )
+    precios = {
+        "DCF (Crecimiento Perpetuo)": precios_dcf,
+        "Múltiplo Terminal": precios_multiplo_terminal,
+        "DDM (Multietapa)": precios_ddm,
+    }[metodo]
+
+    fig_sensibilidad = go.Figure()
+    fig_sensibilidad.add_trace(go.Heatmap(
+        x=tasas_crecimiento, y=waccs, z=precios,
+        colorscale='Viridis',
+        colorbar=dict(title='Precio ($)'),
+        hovertemplate='Crecimiento: %{x:.2f}%<br>WACC: %{y:.2f}%<br>Precio: $%{z:,.2f}<extra></extra>'
+    ))
+    fig_sensibilidad.add_trace(go.Contour(
+        x=tasas_crecimiento, y=waccs, z=precios,
+        contours=dict(start=data['precio_actual'], end=data['precio_actual'], size=1, coloring='none', showlabels=True),
+        line=dict(color='#FF6347', width=3, dash='dash'),
+        showscale=False, hoverinfo='skip',
+        name=f"Precio Actual (${data['precio_actual']:,.2f})"
+    ))
+    fig_sensibilidad.add_trace(go.Scatter(
+        x=[data['tasa_crecimiento_esperada']], y=[data['wacc']],
+        mode='markers', marker=dict(size=12, color='#00FFC0', symbol='x'),
+        name='Supuestos Actuales'
+    ))
+    fig_sensibilidad.update_layout(
+        title_text=f'Precio por Acción: {metodo}',
+        xaxis_title='Tasa de Crecimiento Esperada (%)',
+        yaxis_title='WACC (%)',
+        plot_bgcolor='#0A0A1A',
+        paper_bgcolor='#0A0A1A',
+        font_color='#F8F8F8',
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+    st.plotly_chart(fig_sensibilidad, use_container_width=True)
+
+# ===================== SECCIÓN: Análisis de Sensibilidad (Tornado) =====================
+def grafico_tornado(data):
+    """
+    Muestra un gráfico tornado con el efecto de mover cada input hacia abajo y hacia arriba
+    sobre el Precio Justo Final. Todas las perturbaciones se evalúan en un solo lote.
+    """
+    st.subheader("Análisis de Sensibilidad (Tornado)")
+    st.markdown("Cada barra muestra el rango del Precio Justo Final al variar un único input, manteniendo el resto constante. Los inputs de arriba son los que más mueven la valuación.")
+
+    variacion = st.slider(
+        "Variación de cada Input (%)", min_value=1, max_value=50, value=10,
+        key="tornado_variacion", help="Porcentaje que se resta y se suma a cada input para medir su impacto."
+    )
+    tornado = analisis_tornado(data, variacion)
+    con_impacto = tornado.impacto > 1e-9
+    if not con_impacto.any():
+        st.info("Ningún input modifica el Precio Justo Final con los datos actuales.")
+        return
+
+    # Orden inverso para que el input de mayor impacto quede arriba en el gráfico.
+    etiquetas = [c.replace('_', ' ').title() for c in np.array(tornado.campos)[con_impacto]][::-1]
+    bajos = tornado.precios_bajos[con_impacto][::-1] - tornado.precio_base
+    altos = tornado.precios_altos[con_impacto][::-1] - tornado.precio_base
+
+    fig_tornado = go.Figure()
+    fig_tornado.add_trace(go.Bar(
+        name=f'Input -{variacion}%',
+        y=etiquetas, x=bajos, base=tornado.precio_base, orientation='h',
+        marker_color='#FF6347',
+        hovertemplate='%{y}: $%{x:+,.2f}<extra></extra>'
+    ))
+    fig_tornado.add_trace(go.Bar(
+        name=f'Input +{variacion}%',
+        y=etiquetas, x=altos, base=tornado.precio_base, orientation='h',
+        marker_color='#00FFC0',
+        hovertemplate='%{y}: $%{x:+,.2f}<extra></extra>'
+    ))
+    fig_tornado.update_layout(
+        title_text=f'Sensibilidad del Precio Justo Final (Base ${tornado.precio_base:,.2f})',
+        xaxis_title='Precio Justo Final ($)',
+        barmode='overlay',
+        plot_bgcolor='#0A0A1A',
+        paper_bgcolor='#0A0A1A',
+        font_color='#F8F8F8',
+        height=max(400, 30 * len(etiquetas)),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+    st.plotly_chart(fig_tornado, use_container_width=True)
+
+# ===================== SECCIÓN: Simulación Monte Carlo =====================
+ETIQUETAS_VARIABLES_SIMULABLES = {
+    'tasa_crecimiento_esperada': "Tasa de Crecimiento Esperada (%)",
+    'wacc': "WACC / Tasa de Descuento (%)",
+    'tasa_crecimiento_perpetuo': "Tasa de Crecimiento Perpetuo (%)",
+    'per_esperado': "PER Esperado / Múltiplo de Salida (x)",
+    'dividendos_anuales': "Dividendos Anuales por Acción ($)",
+}
+ETIQUETAS_PARAMETROS_DISTRIBUCION = {
+    'fija': ("Valor",),
+    'normal': ("Media", "Desviación"),
+    'triangular': ("Mínimo", "Moda", "Máximo"),
+    'uniforme': ("Mínimo", "Máximo"),
+}
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def ejecutar_montecarlo(data_items, especificaciones, n_simulaciones, semilla):
+    """
+    Ejecuta (y guarda en caché) la simulación Monte Carlo para unos inputs y distribuciones dados.
+    Se usa `cache_resource` porque el resultado no se modifica y así se evita copiar
+    millones de muestras en cada recarga de la página.
+    """
+    distribuciones = {campo: Distribucion(tipo, parametros) for campo, tipo, parametros in especificaciones}
+    return simular_valuacion(dict(data_items), distribuciones, n_simulaciones, semilla)
+
+def seccion_montecarlo(data):
+    """
+    Muestra los controles de la simulación Monte Carlo y sus resultados: histograma del
+    precio justo final, percentiles y probabilidad de que la acción esté subvaluada.
+    """
+    st.markdown("### Simulación Monte Carlo")
+    st.markdown("En lugar de tres escenarios fijos, se muestrean los supuestos más inciertos desde distribuciones y se valúa cada simulación con el mismo modelo (DCF, Múltiplo Terminal y Múltiplos).")
+
+    especificaciones = []
+    columnas_ui = st.columns(2)
+    for i, campo in enumerate(VARIABLES_SIMULABLES):
+        with columnas_ui[i % 2]:
+            st.markdown(f"**{ETIQUETAS_VARIABLES_SIMULABLES[campo]}**")
+            tipo = st.selectbox(
+                "Distribución", TIPOS_DISTRIBUCION, index=TIPOS_DISTRIBUCION.index('normal'),
+                key=f"mc_tipo_{campo}"
+            )
+            por_defecto = distribucion_predeterminada(tipo, float(data[campo]))
+            columnas_parametros = st.columns(len(por_defecto.parametros))
+            parametros = []
+            for j, (etiqueta, valor) in enumerate(zip(ETIQUETAS_PARAMETROS_DISTRIBUCION[tipo], por_defecto.parametros)):
+                with columnas_parametros[j]:
+                    parametros.append(st.number_input(etiqueta, value=float(valor), format="%.2f", key=f"mc_{campo}_{tipo}_{j}"))
+            especificaciones.append((campo, tipo, tuple(parametros)))
+
+    modo = st.radio(
+        "Modo de Ejecución", ["En memoria", "En bloques (memoria acotada)", "Cuasi Monte Carlo (convergencia)"], horizontal=True, key="mc_modo",
+        help="En memoria conserva todas las simulaciones y muestra el histograma. En bloques procesa corridas muy largas con memoria constante y reporta percentiles con su margen de error. Cuasi Monte Carlo usa secuencias de baja discrepancia y se detiene al alcanzar la precisión pedida."
+    )
+    if modo == "En bloques (memoria acotada)":
+        seccion_montecarlo_en_bloques(data, especificaciones)
+        return
+    if modo == "Cuasi Monte Carlo (convergencia)":
+        seccion_montecarlo_convergencia(data, especificaciones)
+        return
+
+    col1, col2 = st.columns(2)
+    with col1:
+        n_simulaciones = st.selectbox(
+            "Número de Simulaciones", [10_000, 100_000, 1_000_000, 5_000_000], index=2,
+            format_func=lambda n: f"{n:,}", key="mc_n_simulaciones"
+        )
+    with col2:
+        semilla = st.number_input("Semilla Aleatoria", min_value=0, value=42, step=1, key="mc_semilla", help="Fija la semilla para obtener resultados reproducibles.")
+
+    if st.button("🎲 Ejecutar Simulación", key="mc_ejecutar"):
+        st.session_state.montecarlo_activo = True
+    if not st.session_state.get('montecarlo_activo'):
+        return
+
+    try:
+        resultado = ejecutar_montecarlo(tuple(data.items()), tuple(especificaciones), n_simulaciones, int(semilla))
+    except ValueError as e:
+        st.error(f"Error en la configuración de la simulación: {e}")
+        return
+
+    if resultado.n_validas == 0:
+        st.warning("Ninguna simulación produjo un precio justo válido. Revisa las distribuciones (por ejemplo, crecimiento o WACC negativos).")
+        return
+    if resultado.n_validas < resultado.n_simulaciones:
+        st.info(f"{resultado.n_simulaciones - resultado.n_validas:,} simulaciones se descartaron por supuestos inválidos (crecimiento negativo o WACC no positivo).")
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Precio Justo Medio", f"${resultado.media:,.2f}", help=f"Desviación estándar: ${resultado.desviacion:,.2f}")
+    col2.metric("Precio Justo Mediano", f"${resultado.percentiles[50]:,.2f}")
+    col3.metric("Probabilidad de Subvaluación", f"{resultado.probabilidad_subvaluada * 100:,.1f}%", help="Proporción de simulaciones en las que el precio actual es menor que el precio justo.")
+
+    percentiles_df = pd.DataFrame({
+        "Percentil": [f"P{p}" for p in resultado.percentiles],
+        "Precio Justo Final ($)": [f"{v:,.2f}" for v in resultado.percentiles.values()],
+    })
+    st.table(percentiles_df)
+
+    centros = (resultado.histograma_bordes[:-1] + resultado.histograma_bordes[1:]) / 2
+    fig_montecarlo = go.Figure()
+    fig_montecarlo.add_trace(go.Bar(
+        name='Simulaciones', x=centros, y=resultado.histograma_conteos,
+        width=np.diff(resultado.histograma_bordes), marker_color='#00E0A0'
+    ))
+    fig_montecarlo.add_vline(x=data['precio_actual'], line=dict(color='#6A0DAD', dash='dash', width=3), annotation_text="Precio Actual")
+    fig_montecarlo.add_vline(x=resultado.percentiles[50], line=dict(color='#00FFC0', width=2), annotation_text="Mediana")
+    fig_montecarlo.update_layout(
+        title_text=f'Distribución del Precio Justo Final ({resultado.n_simulaciones:,} simulaciones)',
+        xaxis_title='Precio Justo Final ($)',
+        yaxis_title='Frecuencia',
+        plot_bgcolor='#0A0A1A',
+        paper_bgcolor='#0A0A1A',
+        font_color='#F8F8F8',
+        showlegend=False
+    )
+    st.plotly_chart(fig_montecarlo, use_container_width=True)
+
+def seccion_montecarlo_en_bloques(data, especificaciones):
+    """
+    Simulación Monte Carlo en bloques: memoria constante sin importar el número de simulaciones.
+    Reporta media, percentiles con su intervalo de error del Precio Justo Final y del Precio
+    Máximo a Pagar. El resultado se conserva en la sesión mientras no cambie la configuración.
+    """
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        n_simulaciones = st.selectbox(
+            "Número de Simulaciones", [1_000_000, 10_000_000, 100_000_000, 1_000_000_000], index=1,
+            format_func=lambda n: f"{n:,}", key="mc_bloques_n_simulaciones"
+        )
+    with col2:
+        tamaño_bloque = st.selectbox(
+            "Tamaño de Bloque", [100_000, 250_000, 1_000_000], index=1,
+            format_func=lambda n: f"{n:,}", key="mc_bloques_tamaño",
+            help="Simulaciones procesadas por bloque. La memoria usada depende solo de este valor."
+        )
+    with col3:
+        semilla = st.number_input("Semilla Aleatoria", min_value=0, value=42, step=1, key="mc_bloques_semilla")
+    precision_simple = st.checkbox("Usar precisión simple (float32)", value=False, key="mc_bloques_float32", help="Reduce a la mitad la memoria y acelera el cálculo a costa de algo de precisión numérica.")
+
+    clave = (tuple(data.items()), tuple(especificaciones), n_simulaciones, tamaño_bloque, int(semilla), precision_simple)
+    if st.button("🎲 Ejecutar Simulación en Bloques", key="mc_bloques_ejecutar"):
+        barra_progreso = st.progress(0.0, text="Simulando...")
+        try:
+            resultado = simular_valuacion_en_bloques(
+                data,
+                {campo: Distribucion(tipo, parametros) for campo, tipo, parametros in especificaciones},
+                n_simulaciones,
+                tamaño_bloque=tamaño_bloque,
+                dtype=np.float32 if precision_simple else np.float64,
+                semilla=int(semilla),
+                progreso=lambda fraccion: barra_progreso.progress(fraccion, text=f"Simulando... {fraccion * 100:,.0f}%"),
+            )
+        except ValueError as e:
+            st.error(f"Error en la configuración de la simulación: {e}")
+            return
+        barra_progreso.empty()
+        st.session_state.montecarlo_bloques = (clave, resultado)
+
+    guardado = st.session_state.get('montecarlo_bloques')
+    if guardado is None or guardado[0] != clave:
+        return
+    resultado = guardado[1]
+
+    if resultado.n_validas == 0:
+        st.warning("Ninguna simulación produjo un precio justo válido. Revisa las distribuciones (por ejemplo, crecimiento o WACC negativos).")
+        return
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Precio Justo Medio", f"${resultado.precio_justo_final.media:,.2f}", help=f"Error estándar de la media: ±${resultado.precio_justo_final.error_estandar:,.4f}")
+    col2.metric("Precio Máximo a Pagar Medio", f"${resultado.precio_maximo_a_pagar.media:,.2f}", help=f"Error estándar de la media: ±${resultado.precio_maximo_a_pagar.error_estandar:,.4f}")
+    col3.metric("Probabilidad de Subvaluación", f"{resultado.probabilidad_subvaluada * 100:,.2f}%")
+    st.caption(f"{resultado.n_validas:,} simulaciones válidas de {resultado.n_simulaciones:,}, procesadas en bloques de {resultado.tamaño_bloque:,}. Los intervalos combinan el error Monte Carlo al 95% y el error del resumen de cuantiles.")
+
+    percentiles_df = pd.DataFrame({
+        "Percentil": [f"P{e.percentil}" for e in resultado.percentiles_precio_justo],
+        "Precio Justo Final ($)": [f"{e.valor:,.2f}" for e in resultado.percentiles_precio_justo],
+        "Intervalo Precio Justo ($)": [f"{e.inferior:,.2f} – {e.superior:,.2f}" for e in resultado.percentiles_precio_justo],
+        "Precio Máximo a Pagar ($)": [f"{e.valor:,.2f}" for e in resultado.percentiles_precio_maximo],
+        "Intervalo Precio Máximo ($)": [f"{e.inferior:,.2f} – {e.superior:,.2f}" for e in resultado.percentiles_precio_maximo],
+    })
+    st.table(percentiles_df)
+
+ETIQUETAS_MUESTREADORES = {
+    'sobol': "Sobol (aleatorizado)",
+    'halton': "Halton (aleatorizado)",
+    'aleatorio': "Pseudoaleatorio",
+}
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def ejecutar_montecarlo_convergencia(data_items, especificaciones, tolerancia, muestreador, replicas, n_maximo, semilla):
+    """Ejecuta (y guarda en caché) la simulación con parada por convergencia."""
+    distribuciones = {campo: Distribucion(tipo, parametros) for campo, tipo, parametros in especificaciones}
+    return simular_hasta_convergencia(
+        dict(data_items), distribuciones, tolerancia=tolerancia, muestreador=muestreador,
+        replicas=replicas, n_maximo=n_maximo, semilla=semilla
+    )
+
+def seccion_montecarlo_convergencia(data, especificaciones):
+    """
+    Simulación con secuencias de baja discrepancia (Sobol/Halton) que se detiene cuando el
+    error estándar de la mediana del Precio Justo Final es menor que la tolerancia elegida.
+    """
+    col1, col2 = st.columns(2)
+    with col1:
+        muestreador = st.selectbox(
+            "Muestreador", MUESTREADORES, format_func=lambda m: ETIQUETAS_MUESTREADORES[m], key="qmc_muestreador",
+            help="Sobol requiere SciPy; si no está instalado se usa Halton automáticamente."
+        )
+        tolerancia = st.number_input(
+            "Tolerancia del Error Estándar de la Mediana ($)", min_value=0.001, value=0.05, step=0.01, format="%.3f",
+            key="qmc_tolerancia", help="La simulación se detiene cuando el error estándar de la mediana del precio justo cae por debajo de este valor."
+        )
+    with col2:
+        n_maximo = st.selectbox(
+            "Máximo de Evaluaciones", [65_536, 262_144, 1_048_576, 4_194_304], index=2,
+            format_func=lambda n: f"{n:,}", key="qmc_n_maximo"
+        )
+        replicas = st.slider("Réplicas Aleatorizadas", min_value=4, max_value=32, value=8, key="qmc_replicas", help="Secuencias independientes usadas para estimar el error estándar.")
+    semilla = st.number_input("Semilla Aleatoria", min_value=0, value=42, step=1, key="qmc_semilla")
 
-    # El precio objetivo se basa en el valor presente del valor terminal
-    precio_objetivo_multiplo_terminal = 0.0
-    if acciones_circulacion > 0:
-        precio_objetivo_multiplo_terminal = valor_presente_multiplo_terminal / acciones_circulacion
-        st.success(f"**Precio Objetivo por Acción (Múltiplo Terminal - {nombre_escenario}):** ${precio_objetivo_multiplo_terminal:,.2f}")
+    try:
+        resultado = ejecutar_montecarlo_convergencia(
+            tuple(data.items()), tuple(especificaciones), tolerancia, muestreador, replicas, n_maximo, int(semilla)
+        )
+    except ValueError as e:
+        st.error(f"Error en la configuración de la simulación: {e}")
+        return
+
+    if resultado.muestreador != muestreador:
+        st.info(f"SciPy no está instalado: se utilizó el muestreador {ETIQUETAS_MUESTREADORES[resultado.muestreador]}.")
+    if resultado.convergio:
+        st.success(f"Convergencia alcanzada con {resultado.n_evaluaciones:,} evaluaciones ({ETIQUETAS_MUESTREADORES[resultado.muestreador]}).")
     else:
-        st.warning("No se puede calcular el Precio Objetivo por Acción. El número de acciones en circulación es cero.")
+        st.warning(f"No se alcanzó la tolerancia tras {resultado.n_evaluaciones:,} evaluaciones. Aumenta el máximo de evaluaciones o la tolerancia.")
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Precio Justo Mediano", f"${resultado.mediana:,.2f}")
+    col2.metric("Error Estándar de la Mediana", f"±${resultado.error_estandar_mediana:,.4f}")
+    col3.metric("Probabilidad de Subvaluación", f"{resultado.probabilidad_subvaluada * 100:,.1f}%")
+
+    percentiles_df = pd.DataFrame({
+        "Percentil": [f"P{p}" for p in resultado.percentiles],
+        "Precio Justo Final ($)": [f"{v:,.2f}" for v in resultado.percentiles.values()],
+    })
+    st.table(percentiles_df)
+
+    n_evaluaciones, _, errores = zip(*resultado.historial)
+    fig_convergencia = go.Figure()
+    fig_convergencia.add_trace(go.Scatter(
+        name='Error Estándar', x=n_evaluaciones, y=errores, mode='lines+markers',
+        line=dict(color='#00FFC0', width=2)
+    ))
+    fig_convergencia.add_hline(y=tolerancia, line=dict(color='#FF6347', dash='dash'), annotation_text="Tolerancia")
+    fig_convergencia.update_layout(
+        title_text='Convergencia del Error Estándar de la Mediana',
+        xaxis_title='Evaluaciones', yaxis_title='Error Estándar ($)',
+        xaxis_type='log', yaxis_type='log',
+        plot_bgcolor='#0A0A1A',
+        paper_bgcolor='#0A0A1A',
+        font_color='#F8F8F8',
+        showlegend=False
+    )
+    st.plotly_chart(fig_convergencia, use_container_width=True)
+
+# ===================== SECCIÓN: Resumen de Escenarios Personalizados =====================
+def editor_escenarios(data):
+    """
+    Tabla editable de escenarios (se pueden agregar, quitar y renombrar filas). Parte de los
+    escenarios clásicos calculados con los inputs actuales; si los inputs cambian, vuelve a ellos.
+    Retorna la tabla como diccionario columna -> lista.
+    """
+    tabla_df = st.data_editor(
+        pd.DataFrame(tabla_escenarios_predeterminada(data)),
+        key="editor_escenarios",
+        num_rows="dynamic",
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            "nombre": st.column_config.TextColumn("Escenario", required=True),
+            "tasa_crecimiento_esperada": st.column_config.NumberColumn("Crecimiento Esperado (%)", format="%.2f", min_value=0.0),
+            "wacc": st.column_config.NumberColumn("WACC (%)", format="%.2f", min_value=0.0),
+            "tasa_crecimiento_perpetuo": st.column_config.NumberColumn("Crecimiento Perpetuo (%)", format="%.2f"),
+            "per_esperado": st.column_config.NumberColumn("Múltiplo Terminal (P/E)", format="%.2f", min_value=0.0),
+            "probabilidad": st.column_config.NumberColumn("Probabilidad (%)", format="%.1f", min_value=0.0, default=0.0),
+        },
+    )
+    tabla_df = tabla_df.dropna(how='all')
+    return {columna: tabla_df[columna].tolist() for columna in tabla_df.columns}
+
+def resumen_escenarios(data):
+    """
+    Resumen de precios objetivo de todos los escenarios de la tabla editable, evaluados en una
+    sola llamada vectorizada, con su promedio ponderado por probabilidad y el gráfico comparativo.
+    """
+    st.markdown("### Resumen de Precios Objetivos por Escenario")
+    st.markdown("Aquí puedes ver una consolidación de los precios objetivos calculados para cada escenario y método de valuación. Edita la tabla para ajustar los supuestos, agregar o quitar escenarios y asignarles una probabilidad.")
+
+    tabla = editor_escenarios(data)
+    if not tabla.get('nombre'):
+        st.info("Agrega al menos un escenario a la tabla para ver el resumen.")
+        return
+    escenarios = valuar_tabla_escenarios(data, tabla)
+
+    # DataFrame para la tabla de resumen, junto a la tarjeta de supuestos implícitos
+    col_resumen, col_implicitos = st.columns([2, 1])
+    with col_resumen:
+        resumen_df = pd.DataFrame({
+            "Escenario": list(escenarios.nombres_escenarios),
+            "Probabilidad (%)": [f"{p * 100:,.1f}" for p in escenarios.probabilidades],
+            "Precio Objetivo DCF ($)": [f"{v:,.2f}" for v in escenarios.precio_dcf],
+            "Precio Objetivo Múltiplo Terminal ($)": [f"{v:,.2f}" for v in escenarios.precio_multiplo_terminal]
+        })
+        st.table(resumen_df)
+        st.markdown(f"**Precio Ponderado por Probabilidad:** DCF ${escenarios.precio_dcf_ponderado:,.2f} · Múltiplo Terminal ${escenarios.precio_multiplo_terminal_ponderado:,.2f}")
+    with col_implicitos:
+        tarjeta_valuacion_inversa(data)
+
+    # Gráfico de precios justos por escenario
+    st.markdown("---")
+    st.subheader("Gráfico de Precios Justos por Escenario")
+
+    nombres = list(escenarios.nombres_escenarios)
+    fig_escenarios = go.Figure()
+    fig_escenarios.add_trace(go.Bar(
+        name='DCF (Crecimiento Perpetuo)',
+        x=nombres, y=escenarios.precio_dcf,
+        marker_color='#00FFC0'
+    ))
+    fig_escenarios.add_trace(go.Bar(
+        name='Múltiplo Terminal',
+        x=nombres, y=escenarios.precio_multiplo_terminal,
+        marker_color='#00E0A0'
+    ))
+    fig_escenarios.add_trace(go.Scatter(
+        name='Precio Actual',
+        x=nombres, y=[data['precio_actual']] * len(nombres),
+        mode='lines',
+        line=dict(color='#6A0DAD', dash='dash', width=3), # Morado oscuro
+        marker=dict(size=10)
+    ))
+    fig_escenarios.add_trace(go.Scatter(
+        name='DCF Ponderado',
+        x=nombres, y=[escenarios.precio_dcf_ponderado] * len(nombres),
+        mode='lines',
+        line=dict(color='#FF6347', dash='dot', width=2)
+    ))
+
+    fig_escenarios.update_layout(
+        title_text='Precios Objetivos por Escenario de Valuación',
+        xaxis_title='Escenario',
+        yaxis_title='Precio por Acción ($)',
+        barmode='group',
+        plot_bgcolor='#0A0A1A',
+        paper_bgcolor='#0A0A1A',
+        font_color='#F8F8F8',
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+    st.plotly_chart(fig_escenarios, use_container_width=True)
+
+# ===================== SECCIÓN: Valuación Inversa (Supuestos Implícitos) =====================
+def tarjeta_valuacion_inversa(data):
+    """
+    Muestra los supuestos que descuenta el precio actual (DCF inverso del escenario Base):
+    el crecimiento con el que cada método iguala el precio de mercado y el P/E terminal implícito.
+    """
+    st.markdown("#### Lo que Descuenta el Mercado")
+    st.caption(f"Supuestos con los que el escenario Base vale exactamente el precio actual (${data['precio_actual']:,.2f}).")
+    implicito = crecimiento_implicito(data)
+
+    def mostrar(etiqueta, valor, estado, supuesto, formato):
+        if estado == SOLUCION_ENCONTRADA:
+            st.metric(etiqueta, formato.format(valor), delta=formato.format(valor - supuesto) + " vs. supuesto", delta_color="inverse")
+        else:
+            st.metric(etiqueta, "N/A", help=DESCRIPCION_ESTADOS[int(estado)])
+
+    mostrar("Crecimiento Implícito (DCF)", implicito.tasa_crecimiento_dcf[0], implicito.estado_dcf[0],
+            data['tasa_crecimiento_esperada'], "{:,.2f}%")
+    mostrar("Crecimiento Implícito (Múltiplo Terminal)", implicito.tasa_crecimiento_multiplo_terminal[0], implicito.estado_multiplo_terminal[0],
+            data['tasa_crecimiento_esperada'], "{:,.2f}%")
+    mostrar("P/E Terminal Implícito", implicito.per_terminal[0], implicito.estado_per_terminal[0],
+            data['per_esperado'], "{:,.2f}x")
+
+def formatear_tasa_implicita(tasa, estado):
+    """Texto de una tasa implícita para tablas y PDF; si no hay solución indica el motivo."""
+    if estado == SOLUCION_ENCONTRADA:
+        return f"{tasa:.2f}%"
+    return f"N/A ({DESCRIPCION_ESTADOS[int(estado)]})"
+
+# ===================== SECCIÓN: Valuación de Universo (Lote) =====================
+# Filas inválidas del universo cuyos errores se detallan.
+FILAS_INVALIDAS_MOSTRADAS = 20
+
+def leer_universo_subido(nombre, contenido):
+    """DataFrame de un universo subido como CSV, Parquet o Arrow."""
+    fuente = io.BytesIO(contenido)
+    fuente.name = nombre # La extensión decide si se lee como CSV o Parquet.
+    return leer_tabla(fuente)
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def universo_subido(nombre, contenido, comparables=None):
+    """
+    DataFrame (en caché) del universo subido que usan todas las secciones; no se modifica.
+    Con `comparables` = (nombre, contenido, estadístico, recorte) de una tabla de pares, los
+    múltiplos esperados se toman de los pares de cada sector (`aplicar_comparables`) sobre la
+    tabla ya leída, sin volver a codificarla.
+    """
+    tabla = leer_universo_subido(nombre, contenido)
+    if comparables is None:
+        return tabla
+    nombre_pares, contenido_pares, estadistico, recorte = comparables
+    return aplicar_comparables(tabla, pares_subidos(nombre_pares, contenido_pares), estadistico, recorte)
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def valuar_universo_subido(nombre, contenido, comparables=None, max_procesos=1):
+    """Lee y valúa (en caché según el contenido) un universo subido como CSV, Parquet o Arrow."""
+    return valuar_universo(universo_subido(nombre, contenido, comparables), max_procesos=max_procesos)
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def validacion_universo_subido(nombre, contenido, comparables=None):
+    """Validación (en caché) de las filas del universo subido, con el esquema del lote."""
+    return validar_tabla(universo_subido(nombre, contenido, comparables), ESQUEMA_LOTE)
+
+def seccion_validacion_universo(nombre, contenido, comparables, n_invalidas):
+    """Aviso de las filas que no pasaron la validación, con el resumen por chequeo y los errores de las primeras."""
+    if n_invalidas == 0:
+        return
+    st.warning(f"{n_invalidas:,} filas no pasaron la validación y no se valuaron (clasificación '{ENTRADA_INVALIDA}').")
+    validacion = validacion_universo_subido(nombre, contenido, comparables)
+    with st.expander("Ver errores de validación"):
+        st.dataframe(resumen_validacion(validacion), hide_index=True, use_container_width=True)
+        # Los textos se arman solo para las primeras filas inválidas.
+        tickers = universo_subido(nombre, contenido, comparables).get(COLUMNA_TICKER)
+        for fila in np.flatnonzero(~validacion.filas_validas)[:FILAS_INVALIDAS_MOSTRADAS]:
+            nombre_fila = tickers.iloc[fila] if tickers is not None else f"Fila {fila + 1}"
+            st.markdown(f"**{nombre_fila}**: " + " ".join(texto for _, texto in mensajes_validacion(validacion, fila)))
+
+def seccion_comparables_universo(nombre, contenido, comparables, pares):
+    """Percentil de los múltiplos actuales de cada empresa entre los pares de su sector."""
+    st.markdown("### Comparables del Sector")
+    tabla = percentiles_universo(
+        universo_subido(nombre, contenido, comparables), validacion_universo_subido(nombre, contenido, comparables).columnas, pares
+    )
+    st.dataframe(
+        tabla,
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            **{f'{m}_actual': st.column_config.NumberColumn(f"{ETIQUETAS_MULTIPLOS[m]} Actual", format="%.2fx") for m in MULTIPLOS_PARES},
+            **{f'percentil_{m}': st.column_config.NumberColumn(f"Percentil {ETIQUETAS_MULTIPLOS[m]}", format="%.0f") for m in MULTIPLOS_PARES},
+        },
+    )
+
+def resultados_universo_parquet(resultados):
+    """Bytes de la tabla de resultados del universo como Parquet."""
+    destino = io.BytesIO()
+    destino.name = "resultados_universo.parquet"
+    guardar_tabla_columnar(resultados, destino)
+    return destino.getvalue()
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def cubo_universo_subido(nombre, contenido, comparables, factores_crecimiento, factores_wacc):
+    """
+    Valúa (en caché) el universo subido en la grilla de escenarios y guarda el cubo de
+    resultados en una carpeta temporal; se retorna abierto y mapeado en memoria. La carpeta
+    queda en el cubo, así que se borra cuando la caché lo descarta.
+    """
+    escenarios = escenarios_en_grilla(factores_crecimiento, factores_wacc)
+    carpeta = tempfile.TemporaryDirectory(prefix="cubo_universo_", ignore_cleanup_errors=True)
+    cubo = cubo_desde_universo(universo_subido(nombre, contenido, comparables), carpeta.name, escenarios)
+    cubo.carpeta = carpeta
+    return cubo
+
+def seccion_cubo_universo(nombre, contenido, comparables):
+    """
+    Cubo de resultados ticker × escenario × método para una grilla de escenarios (factores
+    sobre el crecimiento y el WACC). Cada vista lee solo la parte del cubo que muestra.
+    Retorna la grilla (factores de crecimiento, factores de WACC) del cubo construido, o None.
+    """
+    st.markdown("### Cubo de Resultados por Escenario")
+    st.markdown("Valúa todas las empresas en una grilla de escenarios y permite ver un escenario para todo el universo o todos los escenarios de una empresa.")
+    col1, col2 = st.columns(2)
+    with col1:
+        rango_crecimiento = st.slider("Factor sobre el Crecimiento", 0.0, 2.0, (0.7, 1.3), 0.05, key="cubo_rango_crecimiento")
+        pasos_crecimiento = st.number_input("Pasos de Crecimiento", min_value=1, max_value=50, value=5, step=1, key="cubo_pasos_crecimiento")
+    with col2:
+        rango_wacc = st.slider("Factor sobre el WACC", 0.5, 1.5, (0.8, 1.2), 0.05, key="cubo_rango_wacc")
+        pasos_wacc = st.number_input("Pasos de WACC", min_value=1, max_value=50, value=5, step=1, key="cubo_pasos_wacc")
+    factores_crecimiento = tuple(np.round(np.linspace(*rango_crecimiento, int(pasos_crecimiento)), 4).tolist())
+    factores_wacc = tuple(np.round(np.linspace(*rango_wacc, int(pasos_wacc)), 4).tolist())
+
+    if st.button("🧊 Construir Cubo", key="cubo_construir"):
+        st.session_state.cubo_activo = True
+    if not st.session_state.get('cubo_activo'):
+        return None
+    with st.spinner("Valuando la grilla de escenarios..."):
+        cubo = cubo_universo_subido(nombre, contenido, comparables, factores_crecimiento, factores_wacc)
+    n_tickers, n_escenarios, n_metodos = cubo.forma
+    st.caption(f"{n_tickers:,} empresas × {n_escenarios:,} escenarios × {n_metodos} métodos")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        escenario = st.selectbox("Escenario", cubo.escenarios, index=len(cubo.escenarios) // 2, key="cubo_escenario")
+        st.dataframe(
+            cubo.tabla_escenario(escenario),
+            hide_index=True,
+            use_container_width=True,
+            column_config={m: st.column_config.NumberColumn(ETIQUETAS_METODOS[m], format="dollar") for m in cubo.metodos},
+        )
+    with col2:
+        ticker = st.selectbox("Empresa", cubo.tickers, key="cubo_ticker")
+        st.dataframe(
+            cubo.empresa(ticker),
+            use_container_width=True,
+            column_config={m: st.column_config.NumberColumn(ETIQUETAS_METODOS[m], format="dollar") for m in cubo.metodos},
+        )
+    return factores_crecimiento, factores_wacc
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def screener_universo_subido(nombre, contenido, comparables, grilla_cubo=None, escenario_cubo=None):
+    """
+    Screener (en caché, con sus índices) de los resultados del universo subido; con la grilla
+    de un cubo construido agrega los precios de cada método en `escenario_cubo`.
+    """
+    cubo = None if grilla_cubo is None else cubo_universo_subido(nombre, contenido, comparables, *grilla_cubo)
+    return screener_universo(
+        valuar_universo_subido(nombre, contenido, comparables), universo_subido(nombre, contenido, comparables), cubo, escenario_cubo
+    )
+
+def seccion_screener_universo(nombre, contenido, comparables, grilla_cubo=None):
+    """
+    Filtros sobre los resultados del universo y ranking de las K mejores empresas. Los índices
+    se arman una vez por archivo, así que cambiar un umbral responde al instante. Con un cubo
+    construido (`grilla_cubo`) se puede filtrar y ordenar por sus precios en un escenario.
+    """
+    st.markdown("### Screener")
+    escenario_cubo = None
+    if grilla_cubo is not None:
+        escenarios_cubo = cubo_universo_subido(nombre, contenido, comparables, *grilla_cubo).escenarios
+        escenario_cubo = st.selectbox(
+            "Precios del Cubo en el Escenario", [None, *escenarios_cubo], format_func=lambda e: "Ninguno" if e is None else e,
+            key="screener_escenario_cubo", help="Agrega al screener el precio de cada método en ese escenario del cubo (columnas cubo_*)."
+        )
+    screener = screener_universo_subido(nombre, contenido, comparables, grilla_cubo if escenario_cubo is not None else None, escenario_cubo)
+    columnas_cubo = tuple(c for c in screener.tabla.columns if c.startswith('cubo_'))
+    condiciones = []
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        if st.checkbox("Margen de seguridad mínimo", value=True, key="screener_usar_margen"):
+            margen_minimo = st.number_input("Margen de seguridad mayor a (%)", value=30.0, step=5.0, key="screener_margen")
+            condiciones.append(Condicion('margen_seguridad', '>', margen_minimo))
+        clasificacion = st.selectbox("Clasificación", ["Todas", SUBVALUADA, NEUTRAL, SOBREVALUADA], key="screener_clasificacion")
+        if clasificacion != "Todas":
+            condiciones.append(Condicion('valuacion', '==', clasificacion))
+    with col2:
+        if st.checkbox("P/E proyectado menor que el P/E esperado", key="screener_per"):
+            condiciones.append(Condicion('per_proyectado', '<', 'per_esperado', contra_columna=True))
+        if st.checkbox("DCF pesimista mayor que el precio actual", key="screener_dcf_pesimista"):
+            condiciones.append(Condicion('precio_obj_dcf_pesimista', '>', 'precio_actual', contra_columna=True))
+    with col3:
+        columnas_orden = screener.columnas_numericas
+        ordenar_por = st.selectbox("Ordenar por", columnas_orden, index=columnas_orden.index('potencial'), key="screener_orden")
+        descendente = st.checkbox("Mayor a menor", value=True, key="screener_descendente")
+        k = st.number_input("Empresas a mostrar", min_value=1, max_value=1_000, value=K_PREDETERMINADO, step=10, key="screener_k")
 
-    return precio_objetivo_multiplo_terminal
+    try:
+        n_cumplen, top = screener.consultar(condiciones, ordenar_por, int(k), descendente, COLUMNAS_VISTA + columnas_cubo)
+    except ValueError as e:
+        st.error(f"Error en el filtro: {e}")
+        return
+    st.caption(f"{n_cumplen:,} de {screener.n_filas:,} empresas cumplen los filtros.")
+    st.dataframe(
+        top,
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            **{c: st.column_config.NumberColumn(format="dollar") for c in top.columns if c.startswith('precio')},
+            'margen_seguridad': st.column_config.NumberColumn("margen_seguridad (%)", format="%.2f%%"),
+            'potencial': st.column_config.NumberColumn("potencial (%)", format="%.2f%%"),
+            'per_proyectado': st.column_config.NumberColumn(format="%.2fx"),
+            'per_esperado': st.column_config.NumberColumn(format="%.2fx"),
+            **{c: st.column_config.NumberColumn(f"{ETIQUETAS_METODOS[c.removeprefix('cubo_')]} ({escenario_cubo})", format="dollar") for c in columnas_cubo},
+        },
+    )
+    if top.empty:
+        return
+    # Los textos de interpretación se arman solo para la empresa elegida.
+    posicion = st.selectbox(
+        "Interpretación de Múltiplos de", top.index.tolist(), format_func=lambda i: str(screener.tabla.at[i, COLUMNA_TICKER]),
+        key="screener_interpretacion"
+    )
+    if not screener.tabla.at[posicion, COLUMNA_VALIDA]:
+        for nivel, texto in mensajes_validacion(validacion_universo_subido(nombre, contenido, comparables), posicion):
+            getattr(st, nivel)(texto)
+        return
+    entrada = universo_subido(nombre, contenido, comparables).iloc[[posicion]]
+    for nivel, texto in mensajes_fila(evaluar_reglas(columnas_desde_tabla(entrada))):
+        getattr(st, nivel)(texto)
+
+def seccion_montecarlo_universo(nombre, contenido, comparables, resultados, max_procesos):
+    """
+    Monte Carlo de cada empresa del universo: los supuestos elegidos se muestrean alrededor
+    del valor de cada fila y se agregan al cuadro la media, los percentiles y la probabilidad
+    de subvaluación. Las empresas se reparten entre procesos y una barra muestra el avance.
+    """
+    st.markdown("### Monte Carlo por Empresa")
+    st.markdown("Cada empresa se simula con su propia semilla, así que los resultados no cambian con la cantidad de procesos.")
+    tipos_distribucion = {}
+    columnas_ui = st.columns(len(VARIABLES_SIMULABLES))
+    for i, campo in enumerate(VARIABLES_SIMULABLES):
+        with columnas_ui[i]:
+            tipo = st.selectbox(
+                ETIQUETAS_VARIABLES_SIMULABLES[campo], TIPOS_DISTRIBUCION, index=TIPOS_DISTRIBUCION.index('normal'),
+                key=f"universo_mc_tipo_{campo}"
+            )
+            if tipo != 'fija':
+                tipos_distribucion[campo] = tipo
+    col1, col2 = st.columns(2)
+    with col1:
+        n_simulaciones = st.selectbox(
+            "Simulaciones por Empresa", [1_000, 10_000, 100_000], index=1,
+            format_func=lambda n: f"{n:,}", key="universo_mc_n_simulaciones"
+        )
+    with col2:
+        semilla = st.number_input("Semilla Aleatoria", min_value=0, value=42, step=1, key="universo_mc_semilla")
+
+    clave = (nombre, hash(contenido), hash(comparables), tuple(tipos_distribucion.items()), n_simulaciones, int(semilla))
+    if st.button("🎲 Simular Universo", key="universo_mc_ejecutar"):
+        barra = st.progress(0.0, text="Simulando empresas...")
+        def avance(fraccion):
+            barra.progress(fraccion, text=f"Simulando empresas... {fraccion * 100:,.0f}%")
+        try:
+            # Solo se simulan las filas que pasaron la validación.
+            columnas = columnas_desde_tabla(universo_subido(nombre, contenido, comparables)[resultados[COLUMNA_VALIDA].to_numpy()])
+            simulacion = simular_universo(columnas, tipos_distribucion, n_simulaciones, int(semilla), max_procesos=max_procesos, progreso=avance)
+        except ValueError as e:
+            barra.empty()
+            st.error(f"Error en la simulación del universo: {e}")
+            return
+        barra.empty()
+        st.session_state.universo_montecarlo = (clave, simulacion)
+    guardado = st.session_state.get('universo_montecarlo')
+    if guardado is None or guardado[0] != clave:
+        return
+
+    simulacion = guardado[1]
+    validos = resultados[resultados[COLUMNA_VALIDA]]
+    tabla = pd.DataFrame({
+        COLUMNA_TICKER: validos[COLUMNA_TICKER].to_numpy(),
+        'precio_actual': validos['precio_actual'].to_numpy(),
+        'simulaciones_validas': simulacion.n_validas,
+        'precio_justo_medio': simulacion.media,
+        **{f'precio_justo_p{p}': valores for p, valores in simulacion.percentiles.items()},
+        'probabilidad_subvaluada': simulacion.probabilidad_subvaluada * 100,
+    })
+    st.dataframe(
+        tabla,
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            **{c: st.column_config.NumberColumn(format="dollar") for c in tabla.columns if c.startswith('precio')},
+            'probabilidad_subvaluada': st.column_config.NumberColumn("probabilidad_subvaluada (%)", format="%.1f%%"),
+        },
+    )
+    st.download_button(
+        label="Descargar Simulación CSV",
+        data=tabla.to_csv(index=False).encode("utf-8"),
+        file_name="montecarlo_universo.csv",
+        mime="text/csv",
+        key="universo_mc_descargar",
+    )
+
+def seccion_universo():
+    """
+    Valúa de una vez todas las empresas de un archivo (una fila por ticker, mismas columnas
+    que los datos de entrada) y muestra la tabla de resultados con su margen de seguridad.
+    """
+    st.header("Valuación de Universo")
+    st.markdown("Sube un archivo CSV, Parquet o Arrow con **una fila por empresa** y las mismas columnas que los datos de entrada (por ejemplo `precio_actual`, `net_income_estimado`, `wacc`, ...), más una columna `ticker`. Las columnas o celdas que falten toman su valor por defecto. Todas las empresas se valúan juntas con el motor vectorizado; las filas con valores inválidos (texto en un campo numérico, fechas o meses de cierre inválidos, precio o acciones no positivos, ...) se informan y se saltean.")
+
+    plantilla = pd.DataFrame([{COLUMNA_TICKER: "EJEMPLO", **datos_iniciales()}])
+    st.download_button(
+        label="Descargar Plantilla CSV",
+        data=plantilla.to_csv(index=False).encode("utf-8"),
+        file_name="plantilla_universo.csv",
+        mime="text/csv",
+        help="Archivo con todas las columnas admitidas y sus valores por defecto."
+    )
+    archivo = st.file_uploader("Archivo del Universo", type=["csv", "parquet", "arrow", "feather"], key="universo_archivo")
+    max_procesos = st.number_input(
+        "Procesos", min_value=1, max_value=procesos_disponibles(), value=procesos_disponibles(), step=1, key="universo_procesos",
+        help="Cantidad de procesos entre los que se reparten las empresas. Los resultados son idénticos con cualquier cantidad."
+    )
+    if archivo is None:
+        return
+    nombre, contenido = archivo.name, archivo.getvalue()
+    # Con comparables, `comparables` = (nombre, contenido, estadístico, recorte) de la tabla de pares.
+    comparables, pares, opciones = None, None, None
+    if st.checkbox(
+        "Múltiplos esperados desde comparables del sector", value=False, key="universo_pares_usar",
+        help="Reemplaza el P/E, P/S y P/B esperados de cada empresa por los de los pares de su sector (columna 'sector' del universo)."
+    ):
+        opciones = opciones_comparables("universo")
+    if opciones is not None:
+        nombre_pares, contenido_pares, pares, estadistico, recorte = opciones
+        comparables = (nombre_pares, contenido_pares, estadistico, recorte)
+        try:
+            universo_subido(nombre, contenido, comparables)
+        except ValueError as e:
+            st.error(f"No se pudieron aplicar los comparables: {e}")
+            comparables = None
+    try:
+        with st.spinner("Valuando el universo..."):
+            resultados = valuar_universo_subido(nombre, contenido, comparables, int(max_procesos))
+    except (ValueError, KeyError) as e:
+        st.error(f"No se pudo valuar el archivo: {e}")
+        return
+
+    resumen = resumir_universo(resultados)
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Empresas", f"{resumen.n_empresas:,}", help=f"{resumen.n_valuadas:,} con precio justo válido.")
+    col2.metric("Subvaluadas", f"{resumen.conteo_clasificacion[SUBVALUADA]:,}")
+    col3.metric("Neutrales", f"{resumen.conteo_clasificacion[NEUTRAL]:,}")
+    col4.metric("Sobrevaluadas", f"{resumen.conteo_clasificacion[SOBREVALUADA]:,}")
+    seccion_validacion_universo(nombre, contenido, comparables, resumen.conteo_clasificacion[ENTRADA_INVALIDA])
+
+    formato_precio = {c: st.column_config.NumberColumn(format="dollar") for c in resultados.columns if c.startswith('precio')}
+    st.dataframe(
+        resultados,
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            **formato_precio,
+            'margen_seguridad': st.column_config.NumberColumn("margen_seguridad (%)", format="%.2f%%"),
+        },
+    )
+    st.download_button(
+        label="Descargar Resultados CSV",
+        data=resultados.to_csv(index=False).encode("utf-8"),
+        file_name="resultados_universo.csv",
+        mime="text/csv",
+    )
+    if PARQUET_DISPONIBLE:
+        st.download_button(
+            label="Descargar Resultados Parquet",
+            data=resultados_universo_parquet(resultados),
+            file_name="resultados_universo.parquet",
+            mime="application/octet-stream",
+            help="Columnas tipadas: se puede abrir leyendo solo las columnas necesarias."
+        )
+    if comparables is not None:
+        seccion_comparables_universo(nombre, contenido, comparables, pares)
+    # El screener va arriba del cubo pero usa la grilla elegida en él, así que se dibuja después.
+    contenedor_screener = st.container()
+    grilla_cubo = seccion_cubo_universo(nombre, contenido, comparables)
+    with contenedor_screener:
+        seccion_screener_universo(nombre, contenido, comparables, grilla_cubo)
+    seccion_montecarlo_universo(nombre, contenido, comparables, resultados, int(max_procesos))
 
 # ===================== SECCIÓN: Generación de Reporte PDF =====================
 def generar_reporte_pdf(data, resultados):
@@ -531,8 +1634,12 @@ def generar_reporte_pdf(data, resultados):
         ["Métrica", "Valor"],
         ["Tasa de Crecimiento Esperada", f"{data['tasa_crecimiento_esperada']:.2f}%"],
         ["WACC / Tasa de Descuento", f"{data['wacc']:.2f}%"],
+        ["Origen del WACC", descripcion_wacc(data)],
         ["Margen de Seguridad Deseado", f"{data['margen_seguridad_deseado']:.2f}%"],
         ["Años de Proyección DCF", f"{data['años_proyeccion_dcf']}"],
+        ["Años de Transición DCF", f"{data['años_transicion_dcf']}"],
+        ["Tasa de Reinversión", f"{data['tasa_reinversion']:.2f}%"],
+        ["Descuento de Flujos", descripcion_calendario(data)],
         ["Tasa Crecimiento Perpetuo", f"{data['tasa_crecimiento_perpetuo']:.2f}%"],
     ]
 
@@ -639,10 +1746,10 @@ def generar_reporte_pdf(data, resultados):
     story.append(Spacer(1, 0.1 * inch))
 
     escenarios_valuacion_data = [
-        ["Escenario", "Precio Objetivo DCF", "Precio Objetivo Múltiplo Terminal"],
-        ["Pesimista", f"${resultados['precio_obj_dcf_pesimista']:,.2f}", f"${resultados['precio_obj_multiplo_terminal_pesimista']:,.2f}"],
-        ["Base", f"${resultados['precio_obj_dcf_base']:,.2f}", f"${resultados['precio_obj_multiplo_terminal_base']:,.2f}"],
-        ["Optimista", f"${resultados['precio_obj_dcf_optimista']:,.2f}", f"${resultados['precio_obj_multiplo_terminal_optimista']:,.2f}"],
+        ["Escenario", "Precio Objetivo DCF", "Precio Objetivo Múltiplo Terminal", "Precio Objetivo DDM"],
+        ["Pesimista", f"${resultados['precio_obj_dcf_pesimista']:,.2f}", f"${resultados['precio_obj_multiplo_terminal_pesimista']:,.2f}", f"${resultados['precio_obj_ddm_pesimista']:,.2f}"],
+        ["Base", f"${resultados['precio_obj_dcf_base']:,.2f}", f"${resultados['precio_obj_multiplo_terminal_base']:,.2f}", f"${resultados['precio_obj_ddm_base']:,.2f}"],
+        ["Optimista", f"${resultados['precio_obj_dcf_optimista']:,.2f}", f"${resultados['precio_obj_multiplo_terminal_optimista']:,.2f}", f"${resultados['precio_obj_ddm_optimista']:,.2f}"],
     ]
     t_escenarios_valuacion = Table(escenarios_valuacion_data)
     t_escenarios_valuacion.setStyle(table_style)
@@ -671,7 +1778,10 @@ def generar_reporte_pdf(data, resultados):
         ["Métrica", "Valor"],
         ["Precio Objetivo Promedio por Múltiplos", f"${resultados['precio_obj_multiplos']:,.2f}"],
         ["Precio Justo Final (Promedio Ponderado)", f"${resultados['precio_justo_final']:,.2f}"],
+        ["DDM Incluido en el Precio Justo", "Sí" if resultados['incluir_ddm_precio_justo'] else "No"],
         ["Precio Máximo a Pagar (con Margen de Seguridad)", f"${resultados['precio_maximo_a_pagar']:,.2f}"],
+        ["TIR Implícita al Precio Actual (DCF)", resultados['tir_dcf']],
+        ["TIR Implícita al Precio Actual (Múltiplo Terminal)", resultados['tir_multiplo_terminal']],
     ]
     t_final_results = Table(final_results_data)
     t_final_results.setStyle(table_style)
@@ -699,34 +1809,42 @@ def generar_reporte_pdf(data, resultados):
         st.error(f"Error al generar el PDF: {e}")
 
 # ===================== SECCIÓN: Guardar y Cargar Datos =====================
+# Archivo local de los inputs: Parquet con columnas tipadas (JSON si no está PyArrow).
+# El JSON de versiones anteriores se sigue pudiendo cargar.
+ARCHIVO_DATOS = "analisis_acciones_data.parquet" if PARQUET_DISPONIBLE else "analisis_acciones_data.json"
+ARCHIVO_DATOS_JSON = "analisis_acciones_data.json"
+
 def guardar_datos_locales():
     """
-    Guarda los datos de la sesión actual (inputs del usuario) en un archivo JSON local.
+    Guarda los datos de la sesión actual (inputs del usuario) en un archivo local.
     Esto permite al usuario guardar su progreso y cargarlo más tarde.
     """
     try:
-        with open("analisis_acciones_data.json", "w") as f:
-            json.dump(st.session_state.data_inputs, f, indent=4) # Guarda con formato legible.
-        st.success("Datos guardados exitosamente en `analisis_acciones_data.json`")
+        guardar_inputs(st.session_state.data_inputs, ARCHIVO_DATOS)
+        st.success(f"Datos guardados exitosamente en `{ARCHIVO_DATOS}`")
     except Exception as e:
         st.error(f"Error al guardar los datos: {e}")
 
+def aplicar_datos_cargados(loaded_data):
+    """Copia los inputs cargados a la sesión (solo las claves existentes) y recarga la aplicación."""
+    for key, value in loaded_data.items():
+        if key in st.session_state.data_inputs:
+            st.session_state.data_inputs[key] = value
+    st.rerun() # Fuerza una recarga de la aplicación para actualizar la UI.
+
 def cargar_datos_locales():
     """
-    Carga los datos desde un archivo JSON local a la sesión actual de Streamlit.
-    Recarga la aplicación para que los nuevos datos se reflejen en la interfaz.
+    Carga los datos desde el archivo local (o desde el JSON de versiones anteriores) a la
+    sesión actual de Streamlit. Recarga la aplicación para que los nuevos datos se reflejen en la interfaz.
     """
+    archivo = next((a for a in (ARCHIVO_DATOS, ARCHIVO_DATOS_JSON) if os.path.exists(a)), None)
+    if archivo is None:
+        st.warning(f"No se encontró el archivo `{ARCHIVO_DATOS}`. Por favor, guarda datos primero.")
+        return
     try:
-        with open("analisis_acciones_data.json", "r") as f:
-            loaded_data = json.load(f)
-            # Actualiza solo las claves existentes para evitar errores si el archivo JSON es antiguo.
-            for key, value in loaded_data.items():
-                if key in st.session_state.data_inputs:
-                    st.session_state.data_inputs[key] = value
-        st.success("Datos cargados exitosamente desde `analisis_acciones_data.json`")
-        st.experimental_rerun() # Fuerza una recarga de la aplicación para actualizar la UI.
-    except FileNotFoundError:
-        st.warning("No se encontró el archivo `analisis_acciones_data.json`. Por favor, guarda datos primero.")
+        loaded_data = cargar_inputs(archivo)
+        st.success(f"Datos cargados exitosamente desde `{archivo}`")
+        aplicar_datos_cargados(loaded_data)
     except json.JSONDecodeError:
         st.error("Error al decodificar el archivo JSON. Asegúrate de que el formato sea correcto.")
     except Exception as e:
@@ -737,38 +1855,11 @@ def reiniciar_datos():
     Reinicia todos los datos de la sesión a sus valores por defecto.
     Esto limpia todos los inputs y cálculos previos.
     """
-    st.session_state.data_inputs = {
-        'precio_actual': 0.0,
-        'eps_actual': 0.0,
-        'eps_proyectado': 0.0,
-        'revenue_actual': 0.0,
-        'revenue_pesimista': 0.0,
-        'revenue_base': 0.0,
-        'revenue_optimista': 0.0,
-        'net_income_estimado': 0.0,
-        'acciones_circulacion': 0.0,
-        'dividendos_anuales': 0.0,
-        'book_value_per_share': 0.0,
-        'equity_proyectado': 0.0,
-        'tasa_crecimiento_esperada': 0.0,
-        'wacc': 0.0,
-        'per_esperado': 0.0,
-        'ps_esperado': 0.0,
-        'pb_esperado': 0.0,
-        'margen_seguridad_deseado': 0.0,
-        'años_proyeccion_dcf': 5,
-        'tasa_crecimiento_perpetuo': 2.0, # En porcentaje
-        'per_historico_1': 0.0,
-        'per_historico_2': 0.0,
-        'per_historico_3': 0.0,
-        'ps_historico_1': 0.0,
-        'ps_historico_2': 0.0,
-        'ps_historico_3': 0.0,
-        'pb_historico_1': 0.0,
-        'pb_historico_2': 0.0,
-        'pb_historico_3': 0.0,
-    }
-    st.experimental_rerun() # Fuerza una recarga de la aplicación para reflejar los datos reiniciados.
+    st.session_state.data_inputs = datos_iniciales()
+    st.session_state.analisis_ejecutado = False
+    st.session_state.montecarlo_activo = False
+    st.session_state.montecarlo_bloques = None
+    st.rerun() # Fuerza una recarga de la aplicación para reflejar los datos reiniciados.
 
 # ===================== BARRA LATERAL (SIDEBAR) DE NAVEGACIÓN Y UTILIDADES =====================
 with st.sidebar:
@@ -781,16 +1872,34 @@ with st.sidebar:
     # Columnas para organizar los botones de guardar y cargar.
     col_save, col_load = st.columns(2)
     with col_save:
-        if st.button("💾 Guardar Datos", help="Guarda los datos de entrada actuales en un archivo JSON."):
+        if st.button("💾 Guardar Datos", help="Guarda los datos de entrada actuales en un archivo local."):
             guardar_datos_locales()
     with col_load:
-        if st.button("📂 Cargar Datos", help="Carga los datos de entrada desde un archivo JSON guardado previamente."):
+        if st.button("📂 Cargar Datos", help="Carga los datos de entrada desde el archivo local guardado previamente."):
             cargar_datos_locales()
     
+    # Exportación e importación de los inputs como JSON.
+    st.download_button(
+        "⬇️ Exportar JSON", data=exportar_json(st.session_state.data_inputs).encode("utf-8"),
+        file_name=ARCHIVO_DATOS_JSON, mime="application/json", help="Descarga los datos de entrada actuales como JSON."
+    )
+    archivo_json = st.file_uploader("Importar JSON", type=["json"], key="importar_json", help="Carga datos de entrada desde un JSON exportado.")
+    if archivo_json is not None and st.button("📥 Aplicar JSON Importado"):
+        try:
+            aplicar_datos_cargados(importar_json(archivo_json.getvalue().decode("utf-8")))
+        except (ValueError, TypeError) as e:
+            st.error(f"Error al importar el JSON: {e}")
+
     # Botón para reiniciar todos los datos a sus valores por defecto.
     if st.button("🔄 Reiniciar Datos", help="Borra todos los datos ingresados y los valores calculados, restaurando la aplicación a su estado inicial."):
         reiniciar_datos()
     
+    st.subheader("Modo de Análisis")
+    modo_analisis = st.radio(
+        "Modo de Análisis", ["Empresa Individual", "Universo (Lote)"], key="modo_analisis", label_visibility="collapsed",
+        help="Empresa Individual: análisis detallado de una acción. Universo: valuación de muchas empresas desde un archivo."
+    )
+
     st.markdown("---") # Separador visual.
     st.info("¡Bienvenido al Analizador de Acciones! Ingresa tus datos en la sección principal para empezar el análisis financiero detallado.")
 
@@ -798,6 +1907,11 @@ with st.sidebar:
 st.title("📈 Analizador de Acciones: Terminal Financiera")
 st.markdown("Una herramienta de análisis de acciones tipo **Bloomberg Terminal**, pero completamente **sin APIs ni internet**. Todos los datos son ingresados manualmente por ti. ¡Ideal para practicar y simular análisis de valuación!")
 
+# El modo universo tiene su propia pantalla: el resto de la página es el análisis individual.
+if modo_analisis == "Universo (Lote)":
+    seccion_universo()
+    st.stop()
+
 # ===================== SECCIÓN: 1. ENTRADA DE DATOS =====================
 st.header("1. Entrada de Datos Financieros")
 st.markdown("---") # Separador visual para la sección.
@@ -853,6 +1967,16 @@ with st.expander("📊 Datos Fundamentales de la Acción", expanded=True):
             help="El valor total del patrimonio (Equity) proyectado de la empresa para un período futuro. Representa el valor residual de los activos después de deducir los pasivos."
         )
 
+# Expander para armar el WACC con CAPM en lugar de ingresarlo directamente.
+with st.expander("🏦 Costo de Capital (CAPM → WACC)", expanded=False):
+    st.session_state.data_inputs['wacc_desde_capm'] = st.checkbox(
+        "Calcular el WACC con CAPM",
+        value=st.session_state.data_inputs['wacc_desde_capm'],
+        help="Arma el WACC con la tasa libre de riesgo, la beta, la prima de riesgo de mercado, el costo de la deuda y la estructura de capital."
+    )
+    if st.session_state.data_inputs['wacc_desde_capm']:
+        constructor_wacc(st.session_state.data_inputs)
+
 # Expander para organizar las proyecciones y tasas de descuento.
 with st.expander("📈 Proyecciones y Tasas de Descuento", expanded=True):
     col1, col2 = st.columns(2)
@@ -865,7 +1989,8 @@ with st.expander("📈 Proyecciones y Tasas de Descuento", expanded=True):
         st.session_state.data_inputs['wacc'] = st.number_input(
             "WACC / Tasa de Descuento (%)",
             min_value=0.0, max_value=100.0, value=st.session_state.data_inputs['wacc'], format="%.2f",
-            help="El Costo Promedio Ponderado del Capital (Weighted Average Cost of Capital - WACC) o la tasa de descuento utilizada para traer los flujos de caja futuros a valor presente. Representa el costo de financiar los activos de la empresa."
+            disabled=st.session_state.data_inputs['wacc_desde_capm'],
+            help="El Costo Promedio Ponderado del Capital (Weighted Average Cost of Capital - WACC) o la tasa de descuento utilizada para traer los flujos de caja futuros a valor presente. Representa el costo de financiar los activos de la empresa. Con el constructor CAPM activo se calcula en la sección de Costo de Capital."
         )
         st.session_state.data_inputs['margen_seguridad_deseado'] = st.number_input(
             "Margen de Seguridad Deseado (%)",
@@ -875,33 +2000,83 @@ with st.expander("📈 Proyecciones y Tasas de Descuento", expanded=True):
     with col2:
         st.session_state.data_inputs['años_proyeccion_dcf'] = st.slider(
             "Años de Proyección para DCF",
-            min_value=1, max_value=10, value=st.session_state.data_inputs['años_proyeccion_dcf'],
+            min_value=1, max_value=50, value=st.session_state.data_inputs['años_proyeccion_dcf'],
             help="El número de años para los cuales se proyectan explícitamente los flujos de caja en el modelo de Descuento de Flujos de Caja (DCF)."
         )
+        st.session_state.data_inputs['años_transicion_dcf'] = st.slider(
+            "Años de Transición al Crecimiento Perpetuo",
+            min_value=0, max_value=50, value=st.session_state.data_inputs['años_transicion_dcf'],
+            help="Años posteriores a la proyección explícita durante los cuales la tasa de crecimiento desciende linealmente hasta la tasa perpetua (DCF de tres etapas). Con 0 se pasa directamente a la perpetuidad."
+        )
         st.session_state.data_inputs['tasa_crecimiento_perpetuo'] = st.number_input(
             "Tasa de Crecimiento Perpetuo (%)",
             min_value=0.0, max_value=10.0, value=st.session_state.data_inputs['tasa_crecimiento_perpetuo'], format="%.2f",
             help="La tasa de crecimiento asumida para los flujos de caja de la empresa después del período de proyección explícita, en el modelo de crecimiento perpetuo del DCF."
         )
+        st.session_state.data_inputs['tasa_reinversion'] = st.number_input(
+            "Tasa de Reinversión (%)",
+            min_value=0.0, max_value=95.0, value=st.session_state.data_inputs['tasa_reinversion'], format="%.2f",
+            help="Porcentaje del Net Income que la empresa reinvierte cada año (capex neto y capital de trabajo). El Flujo de Caja Libre es el Net Income menos esta reinversión; con 0% se asume FCF = Net Income."
+        )
+
+    # Descuento por fechas: sin fecha de valuación los flujos se descuentan en años enteros.
+    descontar_por_fechas = st.checkbox(
+        "Descontar por fechas exactas",
+        value=bool(st.session_state.data_inputs['fecha_valuacion']),
+        help="Descuenta cada flujo según su fecha real (XNPV, ACT/365) en lugar de en años enteros: la fecha de valuación y el cierre del año fiscal definen cuánto falta para el primer flujo."
+    )
+    if descontar_por_fechas:
+        col1, col2 = st.columns(2)
+        with col1:
+            fecha_guardada = st.session_state.data_inputs['fecha_valuacion']
+            fecha_valuacion = st.date_input(
+                "Fecha de Valuación",
+                value=datetime.date.fromisoformat(fecha_guardada) if fecha_guardada else datetime.date.today(),
+                help="Fecha a la que se traen los flujos de caja."
+            )
+            st.session_state.data_inputs['fecha_valuacion'] = fecha_valuacion.isoformat()
+            st.session_state.data_inputs['mes_cierre_fiscal'] = st.selectbox(
+                "Mes de Cierre del Año Fiscal",
+                options=list(range(1, 13)),
+                index=int(st.session_state.data_inputs['mes_cierre_fiscal']) - 1,
+                format_func=lambda mes: MESES[mes - 1],
+                help="Mes en que termina el año fiscal de la empresa; cada flujo proyectado se ubica al cierre de un año fiscal."
+            )
+        with col2:
+            st.session_state.data_inputs['flujos_medio_año'] = st.checkbox(
+                "Convención de mitad de año",
+                value=st.session_state.data_inputs['flujos_medio_año'],
+                help="Supone que los flujos llegan repartidos durante el año y los descuenta desde la mitad de cada año fiscal en lugar de su cierre."
+            )
+            st.session_state.data_inputs['periodo_parcial'] = st.checkbox(
+                "Primer período parcial (stub)",
+                value=st.session_state.data_inputs['periodo_parcial'],
+                help="Cuenta en el primer flujo solo la fracción del año fiscal que queda entre la fecha de valuación y el cierre."
+            )
+    else:
+        st.session_state.data_inputs['fecha_valuacion'] = ''
+        st.session_state.data_inputs['flujos_medio_año'] = False
+        st.session_state.data_inputs['periodo_parcial'] = False
 
 # Expander para organizar los múltiplos esperados e históricos.
 with st.expander("📊 Múltiplos Esperados y Históricos", expanded=True):
     col1, col2 = st.columns(2)
     with col1:
         st.markdown("#### Múltiplos Esperados (para Valuación)")
+        desde_comparables = seccion_comparables(st.session_state.data_inputs)
         st.session_state.data_inputs['per_esperado'] = st.number_input(
             "PER Esperado (x)",
-            min_value=0.0, value=st.session_state.data_inputs['per_esperado'], format="%.2f",
+            min_value=0.0, value=st.session_state.data_inputs['per_esperado'], format="%.2f", disabled='per_esperado' in desde_comparables,
             help="El Ratio Precio/Beneficio (P/E) que se espera que la acción alcance o que se considera justo para la valuación."
         )
         st.session_state.data_inputs['ps_esperado'] = st.number_input(
             "P/S Esperado (x)",
-            min_value=0.0, value=st.session_state.data_inputs['ps_esperado'], format="%.2f",
+            min_value=0.0, value=st.session_state.data_inputs['ps_esperado'], format="%.2f", disabled='ps_esperado' in desde_comparables,
             help="El Ratio Precio/Ventas (P/S) que se espera o se considera justo para la valuación."
         )
         st.session_state.data_inputs['pb_esperado'] = st.number_input(
             "P/B Esperado (x)",
-            min_value=0.0, value=st.session_state.data_inputs['pb_esperado'], format="%.2f",
+            min_value=0.0, value=st.session_state.data_inputs['pb_esperado'], format="%.2f", disabled='pb_esperado' in desde_comparables,
             help="El Ratio Precio/Valor Contable (P/B) que se espera o se considera justo para la valuación."
         )
     with col2:
@@ -941,39 +2116,16 @@ with st.expander("📉 Escenarios de Revenue Estimado", expanded=True):
 # Botón para ejecutar el análisis financiero.
 st.markdown("---")
 if st.button("🚀 Ejecutar Análisis Financiero", key="run_analysis_button", help="Haz clic para calcular todos los múltiplos, valuaciones y generar recomendaciones."):
-    # Validar todos los inputs cruciales antes de proceder con los cálculos.
-    inputs_validos = True
-    # Lista de campos que deben ser estrictamente positivos para evitar divisiones por cero o cálculos sin sentido.
-    campos_positivos_requeridos = [
-        'precio_actual', 'eps_actual', 'eps_proyectado', 'revenue_actual',
-        'net_income_estimado', 'acciones_circulacion', 'book_value_per_share',
-        'equity_proyectado', 'wacc', 'per_esperado', 'ps_esperado', 'pb_esperado'
-    ]
-    # Campos que pueden ser cero pero no negativos
-    campos_no_negativos_permitidos_cero = [
-        'revenue_pesimista', 'revenue_base', 'revenue_optimista',
-        'dividendos_anuales', 'tasa_crecimiento_esperada', 'margen_seguridad_deseado',
-        'per_historico_1', 'per_historico_2', 'per_historico_3',
-        'ps_historico_1', 'ps_historico_2', 'ps_historico_3',
-        'pb_historico_1', 'pb_historico_2', 'pb_historico_3'
-    ]
+    st.session_state.analisis_ejecutado = True
 
-    # Realiza la validación para los campos estrictamente positivos
-    for campo in campos_positivos_requeridos:
-        if st.session_state.data_inputs[campo] <= 0:
-            st.error(f"Error: El campo '{campo.replace('_', ' ').title()}' debe ser un valor positivo para realizar los cálculos. Por favor, corrígelo.")
-            inputs_validos = False
-    
-    # Realiza la validación para los campos no negativos
-    for campo in campos_no_negativos_permitidos_cero:
-        if st.session_state.data_inputs[campo] < 0:
-            st.error(f"Error: El campo '{campo.replace('_', ' ').title()}' no puede ser negativo. Por favor, corrígelo.")
-            inputs_validos = False
-
-    # Validación específica para WACC vs Tasa de Crecimiento Perpetuo
-    if st.session_state.data_inputs['wacc'] <= st.session_state.data_inputs['tasa_crecimiento_perpetuo'] and st.session_state.data_inputs['wacc'] > 0:
-        st.warning("Advertencia: Para el cálculo del Valor Terminal por Crecimiento Perpetuo, el WACC debe ser mayor que la Tasa de Crecimiento Perpetuo. Los resultados del DCF podrían ser inexactos o cero.")
-        # No se detiene la ejecución, pero se advierte al usuario.
+if st.session_state.analisis_ejecutado:
+    # Validar todos los inputs cruciales antes de proceder con los cálculos (esquema en `validacion.ESQUEMA_ANALISIS`):
+    # los campos que se dividen deben ser positivos, los demás no negativos, y un WACC no mayor que el
+    # crecimiento perpetuo solo se advierte, sin detener la ejecución.
+    validacion_inputs = validar_datos(st.session_state.data_inputs, ESQUEMA_ANALISIS)
+    for nivel, texto in mensajes_validacion(validacion_inputs):
+        getattr(st, nivel)(texto)
+    inputs_validos = bool(validacion_inputs.filas_validas[0])
 
     if inputs_validos:
         st.success("¡Datos validados! Procediendo con el análisis financiero...")
@@ -989,8 +2141,14 @@ if st.button("🚀 Ejecutar Análisis Financiero", key="run_analysis_button", he
             'precio_obj_multiplo_terminal_pesimista': 0.0,
             'precio_obj_multiplo_terminal_base': 0.0,
             'precio_obj_multiplo_terminal_optimista': 0.0,
+            'precio_obj_ddm_pesimista': 0.0,
+            'precio_obj_ddm_base': 0.0,
+            'precio_obj_ddm_optimista': 0.0,
+            'incluir_ddm_precio_justo': False,
             'precio_justo_final': 0.0,
             'precio_maximo_a_pagar': 0.0,
+            'tir_dcf': "N/A",
+            'tir_multiplo_terminal': "N/A",
             'recomendaciones_generales': [],
             'recomendaciones_multiplos': [],
             'fcf_proyectados_base': [],
@@ -1006,20 +2164,14 @@ if st.button("🚀 Ejecutar Análisis Financiero", key="run_analysis_button", he
         st.header("2. Cálculo y Análisis de Múltiplos")
         st.markdown("---")
 
-        # Cálculo de múltiplos actuales
-        revenue_per_share_actual = st.session_state.data_inputs['revenue_actual'] / st.session_state.data_inputs['acciones_circulacion'] if st.session_state.data_inputs['acciones_circulacion'] > 0 else 0
-        
-        pe_actual = calcular_pe(st.session_state.data_inputs['precio_actual'], st.session_state.data_inputs['eps_actual'])
-        ps_actual = calcular_ps(st.session_state.data_inputs['precio_actual'], revenue_per_share_actual)
-        pb_actual = calcular_pb(st.session_state.data_inputs['precio_actual'], st.session_state.data_inputs['book_value_per_share'])
-
-        # Cálculo de múltiplos proyectados
-        # Para P/S proyectado, usamos el revenue base proyectado
-        revenue_per_share_proyectado_base = st.session_state.data_inputs['revenue_base'] / st.session_state.data_inputs['acciones_circulacion'] if st.session_state.data_inputs['acciones_circulacion'] > 0 else 0
-        
-        pe_proyectado = calcular_pe(st.session_state.data_inputs['precio_actual'], st.session_state.data_inputs['eps_proyectado'])
-        ps_proyectado = calcular_ps(st.session_state.data_inputs['precio_actual'], revenue_per_share_proyectado_base)
-        pb_proyectado = calcular_pb(st.session_state.data_inputs['precio_actual'], st.session_state.data_inputs['equity_proyectado'] / st.session_state.data_inputs['acciones_circulacion'] if st.session_state.data_inputs['acciones_circulacion'] > 0 else 0)
+        # Cálculo de múltiplos actuales y proyectados (P/S proyectado usa el revenue base)
+        multiplos_calculados = calcular_multiplos(st.session_state.data_inputs)
+        pe_actual = multiplos_calculados.pe_actual
+        ps_actual = multiplos_calculados.ps_actual
+        pb_actual = multiplos_calculados.pb_actual
+        pe_proyectado = multiplos_calculados.pe_proyectado
+        ps_proyectado = multiplos_calculados.ps_proyectado
+        pb_proyectado = multiplos_calculados.pb_proyectado
 
         resultados_analisis['pe_actual'] = pe_actual
         resultados_analisis['ps_actual'] = ps_actual
@@ -1037,38 +2189,9 @@ if st.button("🚀 Ejecutar Análisis Financiero", key="run_analysis_button", he
         st.table(multiplos_df)
 
         st.markdown("#### Interpretación de Múltiplos")
-        # Interpretación de P/E
-        if pe_proyectado > 0 and st.session_state.data_inputs['per_esperado'] > 0:
-            if pe_proyectado < st.session_state.data_inputs['per_esperado'] * 0.9:
-                resultados_analisis['recomendaciones_multiplos'].append(f"El PER proyectado ({pe_proyectado:,.2f}x) es significativamente menor que el PER esperado ({st.session_state.data_inputs['per_esperado']:,.2f}x), lo que sugiere que la acción podría estar **subvaluada** por PER.")
-            elif pe_proyectado > st.session_state.data_inputs['per_esperado'] * 1.1:
-                resultados_analisis['recomendaciones_multiplos'].append(f"El PER proyectado ({pe_proyectado:,.2f}x) es significativamente mayor que el PER esperado ({st.session_state.data_inputs['per_esperado']:,.2f}x), lo que sugiere que la acción podría estar **sobrevaluada** por PER.")
-            else:
-                resultados_analisis['recomendaciones_multiplos'].append(f"El PER proyectado ({pe_proyectado:,.2f}x) está en línea con el PER esperado ({st.session_state.data_inputs['per_esperado']:,.2f}x), indicando una valuación **neutral** por PER.")
-        else:
-            resultados_analisis['recomendaciones_multiplos'].append("No se puede interpretar el PER proyectado debido a datos insuficientes (EPS proyectado o PER esperado es cero).")
-
-        # Interpretación de P/S
-        if ps_proyectado > 0 and st.session_state.data_inputs['ps_esperado'] > 0:
-            if ps_proyectado < st.session_state.data_inputs['ps_esperado'] * 0.9:
-                resultados_analisis['recomendaciones_multiplos'].append(f"El P/S proyectado ({ps_proyectado:,.2f}x) es significativamente menor que el P/S esperado ({st.session_state.data_inputs['ps_esperado']:,.2f}x), lo que sugiere que la acción podría estar **subvaluada** por P/S.")
-            elif ps_proyectado > st.session_state.data_inputs['ps_esperado'] * 1.1:
-                resultados_analisis['recomendaciones_multiplos'].append(f"El P/S proyectado ({ps_proyectado:,.2f}x) es significativamente mayor que el P/S esperado ({st.session_state.data_inputs['ps_esperado']:,.2f}x), lo que sugiere que la acción podría estar **sobrevaluada** por P/S.")
-            else:
-                resultados_analisis['recomendaciones_multiplos'].append(f"El P/S proyectado ({ps_proyectado:,.2f}x) está en línea con el P/S esperado ({st.session_state.data_inputs['ps_esperado']:,.2f}x), indicando una valuación **neutral** por P/S.")
-        else:
-            resultados_analisis['recomendaciones_multiplos'].append("No se puede interpretar el P/S proyectado debido a datos insuficientes (Revenue por acción proyectado o P/S esperado es cero).")
-
-        # Interpretación de P/B
-        if pb_proyectado > 0 and st.session_state.data_inputs['pb_esperado'] > 0:
-            if pb_proyectado < st.session_state.data_inputs['pb_esperado'] * 0.9:
-                resultados_analisis['recomendaciones_multiplos'].append(f"El P/B proyectado ({pb_proyectado:,.2f}x) es significativamente menor que el P/B esperado ({st.session_state.data_inputs['pb_esperado']:,.2f}x), lo que sugiere que la acción podría estar **subvaluada** por P/B.")
-            elif pb_proyectado > st.session_state.data_inputs['pb_esperado'] * 1.1:
-                resultados_analisis['recomendaciones_multiplos'].append(f"El P/B proyectado ({pb_proyectado:,.2f}x) es significativamente mayor que el P/B esperado ({st.session_state.data_inputs['pb_esperado']:,.2f}x), lo que sugiere que la acción podría estar **sobrevaluada** por P/B.")
-            else:
-                resultados_analisis['recomendaciones_multiplos'].append(f"El P/B proyectado ({pb_proyectado:,.2f}x) está en línea con el P/B esperado ({st.session_state.data_inputs['pb_esperado']:,.2f}x), indicando una valuación **neutral** por P/B.")
-        else:
-            resultados_analisis['recomendaciones_multiplos'].append("No se puede interpretar el P/B proyectado debido a datos insuficientes (Book Value por acción proyectado o P/B esperado es cero).")
+        # Tabla de reglas evaluada sobre la empresa: esperado (±10%) y tendencia histórica (±20%).
+        reglas_evaluadas = evaluar_reglas(st.session_state.data_inputs)
+        resultados_analisis['recomendaciones_multiplos'].extend(texto for _, texto in mensajes_fila(reglas_evaluadas, tipo=TIPO_ESPERADO))
 
         for rec in resultados_analisis['recomendaciones_multiplos']:
             st.info(rec)
@@ -1141,150 +2264,60 @@ if st.button("🚀 Ejecutar Análisis Financiero", key="run_analysis_button", he
         # Detección de múltiplos fuera del promedio histórico
         st.markdown("---")
         st.subheader("Análisis de Tendencia de Múltiplos")
-        multiplos_historicos_per = [st.session_state.data_inputs['per_historico_1'], st.session_state.data_inputs['per_historico_2'], st.session_state.data_inputs['per_historico_3']]
-        multiplos_historicos_ps = [st.session_state.data_inputs['ps_historico_1'], st.session_state.data_inputs['ps_historico_2'], st.session_state.data_inputs['ps_historico_3']]
-        multiplos_historicos_pb = [st.session_state.data_inputs['pb_historico_1'], st.session_state.data_inputs['pb_historico_2'], st.session_state.data_inputs['pb_historico_3']]
-
-        if all(m > 0 for m in multiplos_historicos_per):
-            avg_per_hist = np.mean(multiplos_historicos_per)
-            if pe_proyectado > avg_per_hist * 1.2:
-                st.warning(f"El PER proyectado ({pe_proyectado:,.2f}x) está significativamente por encima del promedio histórico ({avg_per_hist:,.2f}x). Esto podría indicar una sobrevaluación o altas expectativas de crecimiento.")
-            elif pe_proyectado < avg_per_hist * 0.8:
-                st.info(f"El PER proyectado ({pe_proyectado:,.2f}x) está significativamente por debajo del promedio histórico ({avg_per_hist:,.2f}x). Esto podría indicar una subvaluación o que el mercado tiene bajas expectativas.")
-            else:
-                st.success(f"El PER proyectado ({pe_proyectado:,.2f}x) está en línea con el promedio histórico ({avg_per_hist:,.2f}x), lo que sugiere una valuación consistente.")
-        else:
-            st.info("No hay suficientes datos históricos de PER para un análisis de tendencia.")
-
-        if all(m > 0 for m in multiplos_historicos_ps):
-            avg_ps_hist = np.mean(multiplos_historicos_ps)
-            if ps_proyectado > avg_ps_hist * 1.2:
-                st.warning(f"El P/S proyectado ({ps_proyectado:,.2f}x) está significativamente por encima del promedio histórico ({avg_ps_hist:,.2f}x).")
-            elif ps_proyectado < avg_ps_hist * 0.8:
-                st.info(f"El P/S proyectado ({ps_proyectado:,.2f}x) está significativamente por debajo del promedio histórico ({avg_ps_hist:,.2f}x).")
-            else:
-                st.success(f"El P/S proyectado ({ps_proyectado:,.2f}x) está en línea con el promedio histórico ({avg_ps_hist:,.2f}x).")
-        else:
-            st.info("No hay suficientes datos históricos de P/S para un análisis de tendencia.")
-
-        if all(m > 0 for m in multiplos_historicos_pb):
-            avg_pb_hist = np.mean(multiplos_historicos_pb)
-            if pb_proyectado > avg_pb_hist * 1.2:
-                st.warning(f"El P/B proyectado ({pb_proyectado:,.2f}x) está significativamente por encima del promedio histórico ({avg_pb_hist:,.2f}x).")
-            elif pb_proyectado < avg_pb_hist * 0.8:
-                st.info(f"El P/B proyectado ({pb_proyectado:,.2f}x) está significativamente por debajo del promedio histórico ({avg_pb_hist:,.2f}x).")
-            else:
-                st.success(f"El P/B proyectado ({pb_proyectado:,.2f}x) está en línea con el promedio histórico ({avg_pb_hist:,.2f}x).")
-        else:
-            st.info("No hay suficientes datos históricos de P/B para un análisis de tendencia.")
+        for nivel, texto in mensajes_fila(reglas_evaluadas, tipo=TIPO_TENDENCIA):
+            getattr(st, nivel)(texto)
 
         # ===================== SECCIÓN: 3. VALUACIÓN POR ESCENARIOS =====================
         st.header("3. Valuación por Escenarios")
         st.markdown("---")
         
+        # Precios objetivo de todos los escenarios (DCF y Múltiplo Terminal) en una sola llamada vectorizada.
+        resultado_escenarios = valuar_escenarios(
+            st.session_state.data_inputs,
+            factores_crecimiento=[fc for _, fc, _ in ESCENARIOS_PREDETERMINADOS],
+            factores_wacc=[fw for _, _, fw in ESCENARIOS_PREDETERMINADOS],
+            nombres_escenarios=[nombre for nombre, _, _ in ESCENARIOS_PREDETERMINADOS],
+        )
+        for i, (nombre_escenario, _, _) in enumerate(ESCENARIOS_PREDETERMINADOS):
+            resultados_analisis[f'precio_obj_dcf_{nombre_escenario.lower()}'] = float(resultado_escenarios.precio_dcf[i])
+            resultados_analisis[f'precio_obj_multiplo_terminal_{nombre_escenario.lower()}'] = float(resultado_escenarios.precio_multiplo_terminal[i])
+
         # Pestañas para organizar los métodos de valuación
-        tab_dcf, tab_multiplos_terminal, tab_resumen_escenarios = st.tabs(["DCF (Crecimiento Perpetuo)", "Múltiplo Terminal", "Resumen Escenarios"])
+        tab_dcf, tab_multiplos_terminal, tab_ddm, tab_resumen_escenarios, tab_sensibilidad, tab_montecarlo = st.tabs(["DCF (Crecimiento Perpetuo)", "Múltiplo Terminal", "DDM (Dividendos)", "Resumen Escenarios", "Mapa de Sensibilidad", "Monte Carlo"])
 
         with tab_dcf:
             st.markdown("### Descuento de Flujos de Caja (DCF) - Método de Crecimiento Perpetuo")
             st.markdown("Este método proyecta los flujos de caja libres de la empresa y los descuenta al presente, asumiendo un crecimiento perpetuo después de un período explícito.")
             
-            # Escenario Pesimista (DCF)
-            st.markdown("#### Escenario Pesimista")
-            precio_obj_dcf_pesimista, fcf_pesimista = valuacion_dcf(st.session_state.data_inputs, "Pesimista", factor_crecimiento=0.7, factor_wacc=1.2)
-            resultados_analisis['precio_obj_dcf_pesimista'] = precio_obj_dcf_pesimista
-            
-            # Escenario Base (DCF)
-            st.markdown("#### Escenario Base")
-            precio_obj_dcf_base, fcf_base = valuacion_dcf(st.session_state.data_inputs, "Base", factor_crecimiento=1.0, factor_wacc=1.0)
-            resultados_analisis['precio_obj_dcf_base'] = precio_obj_dcf_base
-            resultados_analisis['fcf_proyectados_base'] = fcf_base # Guardar para el PDF
-
-            # Escenario Optimista (DCF)
-            st.markdown("#### Escenario Optimista")
-            precio_obj_dcf_optimista, fcf_optimista = valuacion_dcf(st.session_state.data_inputs, "Optimista", factor_crecimiento=1.3, factor_wacc=0.8)
-            resultados_analisis['precio_obj_dcf_optimista'] = precio_obj_dcf_optimista
+            # Detalle año por año de cada escenario
+            for nombre_escenario, factor_crecimiento, factor_wacc in ESCENARIOS_PREDETERMINADOS:
+                st.markdown(f"#### Escenario {nombre_escenario}")
+                _, fcf_escenario = valuacion_dcf(st.session_state.data_inputs, nombre_escenario, factor_crecimiento=factor_crecimiento, factor_wacc=factor_wacc)
+                if nombre_escenario == "Base":
+                    resultados_analisis['fcf_proyectados_base'] = fcf_escenario # Guardar para el PDF
 
         with tab_multiplos_terminal:
             st.markdown("### Valuación por Múltiplo Terminal")
             st.markdown("Este método estima el valor de la empresa al final del período de proyección explícita, aplicando un múltiplo de valoración (ej. PER) a una métrica financiera proyectada.")
 
-            # Escenario Pesimista (Múltiplo Terminal)
-            st.markdown("#### Escenario Pesimista")
-            precio_obj_multiplo_terminal_pesimista = valuacion_multiplo_terminal(st.session_state.data_inputs, "Pesimista", factor_crecimiento=0.7, factor_wacc=1.2)
-            resultados_analisis['precio_obj_multiplo_terminal_pesimista'] = precio_obj_multiplo_terminal_pesimista
-
-            # Escenario Base (Múltiplo Terminal)
-            st.markdown("#### Escenario Base")
-            precio_obj_multiplo_terminal_base = valuacion_multiplo_terminal(st.session_state.data_inputs, "Base", factor_crecimiento=1.0, factor_wacc=1.0)
-            resultados_analisis['precio_obj_multiplo_terminal_base'] = precio_obj_multiplo_terminal_base
+            # Detalle de cada escenario
+            for nombre_escenario, factor_crecimiento, factor_wacc in ESCENARIOS_PREDETERMINADOS:
+                st.markdown(f"#### Escenario {nombre_escenario}")
+                valuacion_multiplo_terminal(st.session_state.data_inputs, nombre_escenario, factor_crecimiento=factor_crecimiento, factor_wacc=factor_wacc)
 
-            # Escenario Optimista (Múltiplo Terminal)
-            st.markdown("#### Escenario Optimista")
-            precio_obj_multiplo_terminal_optimista = valuacion_multiplo_terminal(st.session_state.data_inputs, "Optimista", factor_crecimiento=1.3, factor_wacc=0.8)
-            resultados_analisis['precio_obj_multiplo_terminal_optimista'] = precio_obj_multiplo_terminal_optimista
+        with tab_ddm:
+            resultado_ddm = valuacion_ddm(st.session_state.data_inputs)
+            for i, (nombre_escenario, _, _) in enumerate(ESCENARIOS_PREDETERMINADOS):
+                resultados_analisis[f'precio_obj_ddm_{nombre_escenario.lower()}'] = float(resultado_ddm.precio_multietapa[i])
 
         with tab_resumen_escenarios:
-            st.markdown("### Resumen de Precios Objetivos por Escenario")
-            st.markdown("Aquí puedes ver una consolidación de los precios objetivos calculados para cada escenario y método de valuación.")
-
-            precios_dcf = {
-                "Pesimista": resultados_analisis['precio_obj_dcf_pesimista'],
-                "Base": resultados_analisis['precio_obj_dcf_base'],
-                "Optimista": resultados_analisis['precio_obj_dcf_optimista']
-            }
-            precios_multiplo_terminal = {
-                "Pesimista": resultados_analisis['precio_obj_multiplo_terminal_pesimista'],
-                "Base": resultados_analisis['precio_obj_multiplo_terminal_base'],
-                "Optimista": resultados_analisis['precio_obj_multiplo_terminal_optimista']
-            }
-
-            # DataFrame para la tabla de resumen
-            resumen_df = pd.DataFrame({
-                "Escenario": ["Pesimista", "Base", "Optimista"],
-                "Precio Objetivo DCF ($)": [f"{v:,.2f}" for v in precios_dcf.values()],
-                "Precio Objetivo Múltiplo Terminal ($)": [f"{v:,.2f}" for v in precios_multiplo_terminal.values()]
-            })
-            st.table(resumen_df)
-
-            # Gráfico de precios justos por escenario
-            st.markdown("---")
-            st.subheader("Gráfico de Precios Justos por Escenario")
-            
-            escenarios = list(precios_dcf.keys())
-            valores_dcf = list(precios_dcf.values())
-            valores_multiplo_terminal = list(precios_multiplo_terminal.values())
-
-            fig_escenarios = go.Figure()
-            fig_escenarios.add_trace(go.Bar(
-                name='DCF (Crecimiento Perpetuo)',
-                x=escenarios, y=valores_dcf,
-                marker_color='#00FFC0'
-            ))
-            fig_escenarios.add_trace(go.Bar(
-                name='Múltiplo Terminal',
-                x=escenarios, y=valores_multiplo_terminal,
-                marker_color='#00E0A0'
-            ))
-            fig_escenarios.add_trace(go.Scatter(
-                name='Precio Actual',
-                x=escenarios, y=[st.session_state.data_inputs['precio_actual']] * len(escenarios),
-                mode='lines',
-                line=dict(color='#6A0DAD', dash='dash', width=3), # Morado oscuro
-                marker=dict(size=10)
-            ))
+            resumen_escenarios(st.session_state.data_inputs)
 
-            fig_escenarios.update_layout(
-                title_text='Precios Objetivos por Escenario de Valuación',
-                xaxis_title='Escenario',
-                yaxis_title='Precio por Acción ($)',
-                barmode='group',
-                plot_bgcolor='#0A0A1A',
-                paper_bgcolor='#0A0A1A',
-                font_color='#F8F8F8',
-                legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
-            )
-            st.plotly_chart(fig_escenarios, use_container_width=True)
+        with tab_sensibilidad:
+            mapa_sensibilidad(st.session_state.data_inputs)
+
+        with tab_montecarlo:
+            seccion_montecarlo(st.session_state.data_inputs)
 
         # ===================== SECCIÓN: 4. RECOMENDACIONES FINALES =====================
         st.header("4. Resumen de Valuación y Recomendaciones")
@@ -1296,26 +2329,28 @@ if st.button("🚀 Ejecutar Análisis Financiero", key="run_analysis_button", he
         resultados_analisis['precio_obj_multiplos'] = precio_obj_multiplos_promedio
 
         # Consideramos un promedio simple entre los métodos principales para el precio justo final
-        precios_para_promedio = []
-        if resultados_analisis['precio_obj_dcf_base'] > 0:
-            precios_para_promedio.append(resultados_analisis['precio_obj_dcf_base'])
-        if resultados_analisis['precio_obj_multiplo_terminal_base'] > 0:
-            precios_para_promedio.append(resultados_analisis['precio_obj_multiplo_terminal_base'])
-        if precio_obj_multiplos_promedio > 0:
-            precios_para_promedio.append(precio_obj_multiplos_promedio)
-        
-        if precios_para_promedio:
-            precio_justo_final = np.mean(precios_para_promedio)
+        st.session_state.data_inputs['incluir_ddm_precio_justo'] = st.checkbox(
+            "Incluir el DDM (Multietapa - Base) en el precio justo final",
+            value=st.session_state.data_inputs['incluir_ddm_precio_justo'],
+            disabled=resultados_analisis['precio_obj_ddm_base'] <= 0,
+            help="Útil para empresas que reparten dividendos de forma estable. Solo se incluye si el DDM produce un precio válido."
+        )
+        resultados_analisis['incluir_ddm_precio_justo'] = st.session_state.data_inputs['incluir_ddm_precio_justo'] and resultados_analisis['precio_obj_ddm_base'] > 0
+        precio_justo_final = calcular_precio_justo(
+            resultados_analisis['precio_obj_dcf_base'],
+            resultados_analisis['precio_obj_multiplo_terminal_base'],
+            precio_obj_multiplos_promedio,
+            resultados_analisis['precio_obj_ddm_base'] if resultados_analisis['incluir_ddm_precio_justo'] else 0.0,
+        )
+        if precio_justo_final > 0:
             st.success(f"**Precio Justo Final Estimado (Promedio Ponderado de Métodos):** ${precio_justo_final:,.2f}")
         else:
-            precio_justo_final = 0.0
             st.warning("No se pudo calcular un precio justo final. Asegúrate de que los métodos de valuación generen resultados válidos.")
         
         resultados_analisis['precio_justo_final'] = precio_justo_final
 
         # Calcular precio máximo a pagar con margen de seguridad
-        margen_seguridad_decimal = st.session_state.data_inputs['margen_seguridad_deseado'] / 100
-        precio_maximo_a_pagar = precio_justo_final * (1 - margen_seguridad_decimal)
+        precio_maximo_a_pagar = calcular_precio_maximo(precio_justo_final, st.session_state.data_inputs['margen_seguridad_deseado'])
         
         if precio_justo_final > 0:
             st.success(f"**Precio Máximo a Pagar (con Margen de Seguridad del {st.session_state.data_inputs['margen_seguridad_deseado']:.2f}%):** ${precio_maximo_a_pagar:,.2f}")
@@ -1324,6 +2359,11 @@ if st.button("🚀 Ejecutar Análisis Financiero", key="run_analysis_button", he
 
         resultados_analisis['precio_maximo_a_pagar'] = precio_maximo_a_pagar
 
+        # Rentabilidad esperada (TIR) de comprar al precio actual, por DCF y por Múltiplo Terminal
+        tasa_implicita = tasa_descuento_implicita(st.session_state.data_inputs)
+        resultados_analisis['tir_dcf'] = formatear_tasa_implicita(tasa_implicita.tasa_descuento_dcf[0], tasa_implicita.estado_dcf[0])
+        resultados_analisis['tir_multiplo_terminal'] = formatear_tasa_implicita(tasa_implicita.tasa_descuento_multiplo_terminal[0], tasa_implicita.estado_multiplo_terminal[0])
+
         st.markdown("#### Recomendaciones Generales")
         # Generar mensajes de recomendación basados en los resultados
         if precio_justo_final > 0:
@@ -1385,9 +2425,14 @@ if st.button("🚀 Ejecutar Análisis Financiero", key="run_analysis_button", he
         )
         st.plotly_chart(fig_comparacion, use_container_width=True)
 
+        # Gráfico tornado de sensibilidad del precio justo final a cada input
+        st.markdown("---")
+        grafico_tornado(st.session_state.data_inputs)
+
         # Tabla de resumen de resultados y métricas clave
         st.markdown("---")
         st.subheader("Resumen de Resultados y Métricas Clave")
+        objetivos_multiplos = valuar_multiplos(st.session_state.data_inputs)
         
         resumen_data = {
             "Métrica": [
@@ -1402,8 +2447,12 @@ if st.button("🚀 Ejecutar Análisis Financiero", key="run_analysis_button", he
                 "Equity Proyectado",
                 "Tasa de Crecimiento Esperada",
                 "WACC / Tasa de Descuento",
+                "Origen del WACC",
                 "Margen de Seguridad Deseado",
                 "Años de Proyección DCF",
+                "Años de Transición DCF",
+                "Tasa de Reinversión",
+                "Descuento de Flujos",
                 "Tasa Crecimiento Perpetuo",
                 "PER Esperado",
                 "P/S Esperado",
@@ -1424,8 +2473,11 @@ if st.button("🚀 Ejecutar Análisis Financiero", key="run_analysis_button", he
                 "Precio Objetivo Múltiplo Terminal (Pesimista)",
                 "Precio Objetivo Múltiplo Terminal (Base)",
                 "Precio Objetivo Múltiplo Terminal (Optimista)",
+                "Precio Objetivo DDM Multietapa (Base)",
                 "Precio Justo Final (Promedio Ponderado)",
-                "Precio Máximo a Pagar (con Margen de Seguridad)"
+                "Precio Máximo a Pagar (con Margen de Seguridad)",
+                "TIR Implícita al Precio Actual (DCF)",
+                "TIR Implícita al Precio Actual (Múltiplo Terminal)"
             ],
             "Valor": [
                 f"${st.session_state.data_inputs['precio_actual']:,.2f}",
@@ -1439,8 +2491,12 @@ if st.button("🚀 Ejecutar Análisis Financiero", key="run_analysis_button", he
                 f"${st.session_state.data_inputs['equity_proyectado']:,.2f}",
                 f"{st.session_state.data_inputs['tasa_crecimiento_esperada']:.2f}%",
                 f"{st.session_state.data_inputs['wacc']:.2f}%",
+                descripcion_wacc(st.session_state.data_inputs),
                 f"{st.session_state.data_inputs['margen_seguridad_deseado']:.2f}%",
                 f"{st.session_state.data_inputs['años_proyeccion_dcf']}",
+                f"{st.session_state.data_inputs['años_transicion_dcf']}",
+                f"{st.session_state.data_inputs['tasa_reinversion']:.2f}%",
+                descripcion_calendario(st.session_state.data_inputs),
                 f"{st.session_state.data_inputs['tasa_crecimiento_perpetuo']:.2f}%",
                 f"{st.session_state.data_inputs['per_esperado']:.2f}x",
                 f"{st.session_state.data_inputs['ps_esperado']:.2f}x",
@@ -1451,9 +2507,9 @@ if st.button("🚀 Ejecutar Análisis Financiero", key="run_analysis_button", he
                 f"{pe_proyectado:.2f}x",
                 f"{ps_proyectado:.2f}x",
                 f"{pb_proyectado:.2f}x",
-                f"${st.session_state.data_inputs['eps_proyectado'] * st.session_state.data_inputs['per_esperado'] if st.session_state.data_inputs['eps_proyectado'] > 0 and st.session_state.data_inputs['per_esperado'] > 0 else 0.0:,.2f}",
-                f"${(st.session_state.data_inputs['revenue_base'] / st.session_state.data_inputs['acciones_circulacion']) * st.session_state.data_inputs['ps_esperado'] if st.session_state.data_inputs['acciones_circulacion'] > 0 and st.session_state.data_inputs['revenue_base'] > 0 and st.session_state.data_inputs['ps_esperado'] > 0 else 0.0:,.2f}",
-                f"${(st.session_state.data_inputs['equity_proyectado'] / st.session_state.data_inputs['acciones_circulacion']) * st.session_state.data_inputs['pb_esperado'] if st.session_state.data_inputs['equity_proyectado'] > 0 and st.session_state.data_inputs['acciones_circulacion'] > 0 and st.session_state.data_inputs['pb_esperado'] > 0 else 0.0:,.2f}",
+                f"${objetivos_multiplos.precio_objetivo_pe:,.2f}",
+                f"${objetivos_multiplos.precio_objetivo_ps:,.2f}",
+                f"${objetivos_multiplos.precio_objetivo_pb:,.2f}",
                 f"${resultados_analisis['precio_obj_multiplos']:,.2f}",
                 f"${resultados_analisis['precio_obj_dcf_pesimista']:,.2f}",
                 f"${resultados_analisis['precio_obj_dcf_base']:,.2f}",
@@ -1461,8 +2517,11 @@ if st.button("🚀 Ejecutar Análisis Financiero", key="run_analysis_button", he
                 f"${resultados_analisis['precio_obj_multiplo_terminal_pesimista']:,.2f}",
                 f"${resultados_analisis['precio_obj_multiplo_terminal_base']:,.2f}",
                 f"${resultados_analisis['precio_obj_multiplo_terminal_optimista']:,.2f}",
+                f"${resultados_analisis['precio_obj_ddm_base']:,.2f}",
                 f"${resultados_analisis['precio_justo_final']:,.2f}",
-                f"${resultados_analisis['precio_maximo_a_pagar']:,.2f}"
+                f"${resultados_analisis['precio_maximo_a_pagar']:,.2f}",
+                resultados_analisis['tir_dcf'],
+                resultados_analisis['tir_multiplo_terminal']
             ]
         }
         resumen_df_final = pd.DataFrame(resumen_data)
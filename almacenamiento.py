@@ -0,0 +1,235 @@
+"""
+Almacenamiento columnar de inputs y resultados.
+
+Los inputs de una o varias empresas y las tablas de resultados se guardan en Parquet, CSV o en
+Arrow IPC (`.arrow`, `.feather`, `.ipc`) con columnas tipadas según `datos_iniciales`. La
+lectura lee solo las columnas pedidas (en Parquet se saltean las demás en disco) y los
+archivos Arrow IPC se abren mapeados en memoria, así que las columnas numéricas se usan sin
+copiarlas: abrir un archivo de un millón de filas no depende de su tamaño.
+
+JSON se mantiene como formato de importación y exportación de un juego de inputs.
+"""
+import json
+from pathlib import Path
+
+import pandas as pd
+
+from motor_valuacion import datos_iniciales
+
+# PyArrow es opcional: sin él no se pueden leer ni guardar archivos Parquet o Arrow, solo CSV y JSON.
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+    PARQUET_DISPONIBLE = True
+except ImportError:
+    PARQUET_DISPONIBLE = False
+
+# Formatos según la extensión del archivo.
+FORMATO_PARQUET = 'parquet'
+FORMATO_ARROW = 'arrow'
+FORMATO_CSV = 'csv'
+FORMATO_JSON = 'json'
+EXTENSIONES = {
+    '.parquet': FORMATO_PARQUET, '.pq': FORMATO_PARQUET,
+    '.arrow': FORMATO_ARROW, '.feather': FORMATO_ARROW, '.ipc': FORMATO_ARROW,
+    '.json': FORMATO_JSON,
+}
+
+# ===================== FORMATOS Y ESQUEMA =====================
+
+def formato_archivo(fuente):
+    """Formato de una ruta o archivo abierto según su extensión (CSV si no es otra conocida)."""
+    sufijo = Path(str(getattr(fuente, 'name', fuente))).suffix.lower()
+    return EXTENSIONES.get(sufijo, FORMATO_CSV)
+
+def _requiere_arrow(accion):
+    if not PARQUET_DISPONIBLE:
+        raise ValueError(f"{accion} archivos Parquet o Arrow requiere PyArrow (pip install pyarrow).")
+
+def _abrir_arrow(fuente):
+    """Lector de un Arrow IPC: las rutas se mapean en memoria; los archivos abiertos se leen como vienen."""
+    if isinstance(fuente, (str, Path)):
+        return ipc.open_file(pa.memory_map(str(fuente), 'r'))
+    return ipc.open_file(fuente)
+
+def _tipo_arrow(valor):
+    if isinstance(valor, bool):
+        return pa.bool_()
+    if isinstance(valor, int):
+        return pa.int64()
+    if isinstance(valor, str):
+        return pa.string()
+    return pa.float64()
+
+def esquema_inputs():
+    """Esquema Arrow de los inputs: una columna tipada por cada campo de `datos_iniciales()`."""
+    _requiere_arrow("Usar")
+    return pa.schema([(campo, _tipo_arrow(valor)) for campo, valor in datos_iniciales().items()])
+
+# ===================== INPUTS =====================
+
+def tabla_inputs(registros):
+    """
+    Tabla Arrow tipada con un juego de inputs por fila (`registros` es un dict o una lista de
+    dicts como `data_inputs`). Los campos que falten toman su valor por defecto y los
+    desconocidos se ignoran.
+    """
+    if isinstance(registros, dict):
+        registros = [registros]
+    esquema = esquema_inputs()
+    defectos = datos_iniciales()
+    return pa.table(
+        [pa.array([r.get(campo.name, defectos[campo.name]) for r in registros], type=campo.type) for campo in esquema],
+        schema=esquema,
+    )
+
+def tabla_inputs_csv(registros):
+    """
+    DataFrame con un juego de inputs por fila y las mismas columnas, en el mismo orden, que
+    `tabla_inputs`: los campos que falten toman su valor por defecto y los desconocidos se ignoran.
+    """
+    if isinstance(registros, dict):
+        registros = [registros]
+    defectos = datos_iniciales()
+    return pd.DataFrame([{campo: r.get(campo, defecto) for campo, defecto in defectos.items()} for r in registros], columns=list(defectos))
+
+def guardar_inputs(registros, destino):
+    """Guarda uno o varios juegos de inputs en Parquet, Arrow IPC, CSV o (un solo juego) JSON, según la extensión."""
+    formato = formato_archivo(destino)
+    if formato == FORMATO_JSON:
+        if not isinstance(registros, dict):
+            raise ValueError("JSON guarda un solo juego de inputs; usa Parquet, Arrow o CSV para varios.")
+        Path(destino).write_text(exportar_json(registros), encoding='utf-8')
+    elif formato == FORMATO_CSV:
+        tabla_inputs_csv(registros).to_csv(destino, index=False)
+    else:
+        guardar_tabla_columnar(tabla_inputs(registros), destino)
+
+def cargar_inputs(fuente, fila=0):
+    """
+    Lee el juego de inputs de la fila `fila` de un archivo Parquet, Arrow IPC, CSV o JSON,
+    completado con los valores por defecto de los campos que no estén en el archivo. Las celdas
+    de un CSV se validan y convierten campo por campo como las de un JSON (ver `_valor_json`).
+    """
+    formato = formato_archivo(fuente)
+    if formato == FORMATO_JSON:
+        return importar_json(Path(fuente).read_text(encoding='utf-8'))
+    if formato == FORMATO_CSV:
+        tabla = pd.read_csv(fuente, dtype=str, keep_default_na=False)
+        if not 0 <= fila < len(tabla):
+            raise ValueError(f"El archivo tiene {len(tabla)} filas; no existe la fila {fila}.")
+        data = datos_iniciales()
+        for campo, valor in tabla.iloc[fila].items():
+            if campo in data:
+                data[campo] = _valor_json(campo, data[campo], valor)
+        return data
+    tabla = abrir_tabla(fuente, [c for c in datos_iniciales() if c in columnas_archivo(fuente)])
+    if not 0 <= fila < tabla.num_rows:
+        raise ValueError(f"El archivo tiene {tabla.num_rows} filas; no existe la fila {fila}.")
+    return {**datos_iniciales(), **tabla.slice(fila, 1).to_pylist()[0]}
+
+def exportar_json(data):
+    """Texto JSON legible de un juego de inputs."""
+    return json.dumps(data, indent=4, ensure_ascii=False)
+
+def _valor_json(campo, defecto, valor):
+    """
+    Valor de un campo importado (de un JSON o de una celda de CSV), del tipo de su valor por defecto. Los booleanos aceptan solo
+    true/false (como booleano JSON o como texto) y los enteros solo valores enteros; cualquier
+    otro valor lanza ValueError con el nombre del campo en lugar de convertirse a ciegas.
+    """
+    if isinstance(defecto, bool):
+        if isinstance(valor, bool):
+            return valor
+        if isinstance(valor, str) and valor.strip().lower() in ('true', 'false'):
+            return valor.strip().lower() == 'true'
+        raise ValueError(f"El campo '{campo}' debe ser true o false; se recibió {valor!r}.")
+    if isinstance(defecto, str):
+        if not isinstance(valor, str):
+            raise ValueError(f"El campo '{campo}' debe ser un texto; se recibió {valor!r}.")
+        return valor
+    if isinstance(valor, bool) or not isinstance(valor, (int, float, str)):
+        raise ValueError(f"El campo '{campo}' debe ser numérico; se recibió {valor!r}.")
+    try:
+        numero = float(valor)
+    except ValueError:
+        raise ValueError(f"El campo '{campo}' debe ser numérico; se recibió {valor!r}.") from None
+    if isinstance(defecto, int):
+        if not numero.is_integer():
+            raise ValueError(f"El campo '{campo}' debe ser un número entero; se recibió {valor!r}.")
+        return int(numero)
+    return numero
+
+def importar_json(texto):
+    """
+    Juego de inputs desde un texto JSON: se toman solo los campos conocidos, validados y
+    convertidos al tipo de su valor por defecto (ver `_valor_json`), y el resto queda con su
+    valor por defecto.
+    """
+    cargados = json.loads(texto)
+    if not isinstance(cargados, dict):
+        raise ValueError("El JSON debe contener un objeto con los inputs.")
+    data = datos_iniciales()
+    for campo, valor in cargados.items():
+        if campo in data:
+            data[campo] = _valor_json(campo, data[campo], valor)
+    return data
+
+# ===================== TABLAS COLUMNARES =====================
+
+def guardar_tabla_columnar(tabla, destino):
+    """Guarda un DataFrame o una tabla Arrow como Parquet o Arrow IPC (sin compresión, para mapearlo en memoria)."""
+    _requiere_arrow("Guardar")
+    if isinstance(tabla, pd.DataFrame):
+        tabla = pa.Table.from_pandas(tabla, preserve_index=False)
+    if formato_archivo(destino) == FORMATO_PARQUET:
+        pq.write_table(tabla, destino)
+    else:
+        with pa.OSFile(str(destino), 'wb') as archivo, ipc.new_file(archivo, tabla.schema) as escritor:
+            escritor.write_table(tabla)
+
+def columnas_archivo(fuente):
+    """Nombres de las columnas de un Parquet o Arrow IPC, leídos solo de sus metadatos."""
+    _requiere_arrow("Leer")
+    if formato_archivo(fuente) == FORMATO_PARQUET:
+        return pq.read_schema(fuente).names
+    return _abrir_arrow(fuente).schema.names
+
+def abrir_tabla(fuente, columnas=None):
+    """
+    Tabla Arrow con las `columnas` pedidas (todas si es None) de un Parquet o Arrow IPC. Del
+    Parquet se leen solo esas columnas; el Arrow IPC se mapea en memoria y sus buffers se usan
+    sin copiarlos, así que las columnas no pedidas nunca se leen del disco.
+    """
+    _requiere_arrow("Leer")
+    if formato_archivo(fuente) == FORMATO_PARQUET:
+        return pq.read_table(fuente, columns=columnas, memory_map=True)
+    tabla = _abrir_arrow(fuente).read_all()
+    return tabla if columnas is None else tabla.select(columnas)
+
+def lotes_arrow(fuente, filas_por_lote):
+    """Recorre un Arrow IPC de a `filas_por_lote` filas como RecordBatch (rebanadas sin copia de los lotes del archivo)."""
+    _requiere_arrow("Leer")
+    lector = _abrir_arrow(fuente)
+    for i in range(lector.num_record_batches):
+        lote = lector.get_batch(i)
+        for inicio in range(0, lote.num_rows, filas_por_lote):
+            yield lote.slice(inicio, filas_por_lote)
+
+def leer_columnas(fuente, columnas=None):
+    """
+    Columnas de un Parquet o Arrow IPC como arreglos de NumPy. Las numéricas sin nulos de un
+    Arrow IPC son vistas del archivo mapeado (sin copia); el resto se convierte.
+    """
+    tabla = abrir_tabla(fuente, columnas)
+    return {
+        nombre: (columna.combine_chunks() if columna.num_chunks != 1 else columna.chunk(0)).to_numpy(zero_copy_only=False)
+        for nombre, columna in zip(tabla.column_names, tabla.columns)
+    }
+
+def leer_resultados(fuente, columnas=None):
+    """DataFrame de resultados (por ejemplo, de `universo.valuar_archivo`) con solo las columnas pedidas."""
+    if formato_archivo(fuente) == FORMATO_CSV:
+        return pd.read_csv(fuente, usecols=columnas)
+    return abrir_tabla(fuente, columnas).to_pandas()
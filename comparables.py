@@ -0,0 +1,205 @@
+"""
+Comparables del sector: múltiplos esperados y posición de cada empresa entre sus pares.
+
+Una tabla de pares tiene una fila por empresa con su sector y sus múltiplos P/E, P/S y P/B
+(columnas `sector`, `per`, `ps` y `pb`, en CSV, Parquet o Arrow). `TablaPares` la indexa una
+sola vez: ordena los múltiplos válidos (positivos) por sector y valor y guarda dónde empieza
+cada sector y las sumas acumuladas. Con ese índice la mediana y la media recortada de todos los
+sectores salen de operaciones sobre arreglos, y el percentil de cualquier cantidad de empresas
+es una búsqueda binaria dentro del tramo de su sector: recalcular los comparables de todo un
+universo es un group-by, no un recorrido de los pares por cada empresa.
+"""
+import numpy as np
+import pandas as pd
+
+from universo import COLUMNA_TICKER, leer_tabla
+
+# Columna del sector en la tabla de pares y en el universo.
+COLUMNA_SECTOR = 'sector'
+
+# Múltiplos de la tabla de pares y el input esperado que reemplaza cada uno.
+MULTIPLOS_PARES = ('per', 'ps', 'pb')
+CAMPOS_ESPERADOS = {'per': 'per_esperado', 'ps': 'ps_esperado', 'pb': 'pb_esperado'}
+ETIQUETAS_MULTIPLOS = {'per': "P/E", 'ps': "P/S", 'pb': "P/B"}
+
+# Estadísticos de los múltiplos de cada sector.
+MEDIANA = 'mediana'
+MEDIA_RECORTADA = 'media_recortada'
+ESTADISTICOS = (MEDIANA, MEDIA_RECORTADA)
+ETIQUETAS_ESTADISTICOS = {MEDIANA: "Mediana", MEDIA_RECORTADA: "Media recortada"}
+
+# Fracción de pares que la media recortada descarta en cada extremo.
+RECORTE_PREDETERMINADO = 0.10
+
+# Con menos pares válidos que estos, el sector no da múltiplo esperado ni percentil.
+MINIMO_PARES = 3
+
+def _textos_sector(sectores):
+    """Sectores como texto sin espacios en los extremos; vacíos y faltantes quedan como NA."""
+    textos = pd.Series(sectores, dtype='string').str.strip()
+    return textos.mask(textos == '')
+
+class TablaPares:
+    """
+    Índice de una tabla de pares. Por cada múltiplo se guardan los valores válidos ordenados
+    por (sector, valor), el inicio y la cantidad de valores de cada sector y la suma acumulada
+    (para la media recortada). Se arma una vez por tabla; las consultas no vuelven a ordenar.
+    """
+    __slots__ = ('sectores', 'n_filas', 'minimo_pares', '_valores', '_inicios', '_conteos', '_acumulados')
+
+    def __init__(self, tabla, minimo_pares=MINIMO_PARES):
+        if COLUMNA_SECTOR not in tabla.columns:
+            raise ValueError(f"La tabla de pares debe tener una columna '{COLUMNA_SECTOR}'.")
+        if not any(m in tabla.columns for m in MULTIPLOS_PARES):
+            raise ValueError(f"La tabla de pares debe tener al menos una de las columnas {', '.join(MULTIPLOS_PARES)}.")
+        self.n_filas = len(tabla)
+        self.minimo_pares = int(minimo_pares)
+        codigos, sectores = pd.factorize(_textos_sector(tabla[COLUMNA_SECTOR]), sort=True)
+        self.sectores = pd.Index(sectores.astype(object), name=COLUMNA_SECTOR)
+        grupos = np.arange(len(self.sectores))
+        self._valores, self._inicios, self._conteos, self._acumulados = {}, {}, {}, {}
+        for multiplo in MULTIPLOS_PARES:
+            if multiplo in tabla.columns:
+                valores = pd.to_numeric(tabla[multiplo], errors='coerce').to_numpy(dtype=np.float64)
+            else:
+                valores = np.full(self.n_filas, np.nan)
+            validos = (codigos >= 0) & np.isfinite(valores) & (valores > 0)
+            codigos_validos, valores = codigos[validos], valores[validos]
+            orden = np.lexsort((valores, codigos_validos))
+            codigos_validos, valores = codigos_validos[orden], valores[orden]
+            inicios = np.searchsorted(codigos_validos, grupos, side='left')
+            self._valores[multiplo] = valores
+            self._inicios[multiplo] = inicios
+            self._conteos[multiplo] = np.searchsorted(codigos_validos, grupos, side='right') - inicios
+            self._acumulados[multiplo] = np.concatenate(([0.0], np.cumsum(valores)))
+
+    def codigos_sector(self, sectores):
+        """Posición de cada sector en `sectores` (-1 si no está en la tabla de pares)."""
+        return self.sectores.get_indexer(_textos_sector(sectores).to_numpy(dtype=object, na_value=None))
+
+    def conteo(self, multiplo):
+        """Cantidad de pares con el múltiplo válido en cada sector."""
+        return self._conteos[multiplo]
+
+    def mediana(self, multiplo):
+        """Mediana del múltiplo en cada sector (NaN con menos de `minimo_pares`)."""
+        inicios, conteos, valores = self._inicios[multiplo], self._conteos[multiplo], self._valores[multiplo]
+        suficientes = conteos >= max(self.minimo_pares, 1)
+        bajo = np.where(suficientes, inicios + (conteos - 1) // 2, 0)
+        alto = np.where(suficientes, inicios + conteos // 2, 0)
+        return np.where(suficientes, (valores[bajo] + valores[alto]) / 2, np.nan) if len(valores) else np.full(len(conteos), np.nan)
+
+    def media_recortada(self, multiplo, recorte=RECORTE_PREDETERMINADO):
+        """
+        Media del múltiplo en cada sector sin el `recorte` de pares más bajos ni el de los más
+        altos (redondeado hacia abajo), a partir de las sumas acumuladas.
+        """
+        if not 0 <= recorte < 0.5:
+            raise ValueError("El recorte debe estar entre 0 y 0.5 (sin incluir).")
+        inicios, conteos, acumulados = self._inicios[multiplo], self._conteos[multiplo], self._acumulados[multiplo]
+        descartados = np.floor(conteos * recorte).astype(np.intp)
+        restantes = conteos - 2 * descartados
+        suma = acumulados[inicios + conteos - descartados] - acumulados[inicios + descartados]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where((conteos >= max(self.minimo_pares, 1)) & (restantes > 0), suma / restantes, np.nan)
+
+    def estadistico(self, multiplo, estadistico=MEDIANA, recorte=RECORTE_PREDETERMINADO):
+        """Múltiplo esperado de cada sector según `estadistico` (mediana o media recortada)."""
+        if estadistico == MEDIANA:
+            return self.mediana(multiplo)
+        if estadistico == MEDIA_RECORTADA:
+            return self.media_recortada(multiplo, recorte)
+        raise ValueError(f"Estadístico desconocido: '{estadistico}'. Opciones: {', '.join(ESTADISTICOS)}.")
+
+    def tabla_sectores(self, estadistico=MEDIANA, recorte=RECORTE_PREDETERMINADO):
+        """Una fila por sector con la cantidad de pares y el múltiplo esperado de cada múltiplo."""
+        columnas = {}
+        for multiplo in MULTIPLOS_PARES:
+            columnas[f'n_{multiplo}'] = self.conteo(multiplo)
+            columnas[multiplo] = self.estadistico(multiplo, estadistico, recorte)
+        return pd.DataFrame(columnas, index=self.sectores)
+
+    def percentil(self, multiplo, sectores, valores):
+        """
+        Percentil (0 a 100) de cada valor entre los pares de su sector: el porcentaje de pares
+        con un múltiplo menor, contando la mitad de los iguales. NaN si el valor no es positivo,
+        si el sector no está en la tabla o tiene menos de `minimo_pares`. Los valores se agrupan
+        por sector y cada grupo se busca de una vez en el tramo ordenado de ese sector.
+        """
+        codigos = self.codigos_sector(sectores)
+        valores = np.asarray(valores, dtype=np.float64)
+        percentiles = np.full(len(valores), np.nan)
+        inicios, conteos, ordenados = self._inicios[multiplo], self._conteos[multiplo], self._valores[multiplo]
+        buscados = np.flatnonzero((codigos >= 0) & np.isfinite(valores) & (valores > 0))
+        buscados = buscados[conteos[codigos[buscados]] >= max(self.minimo_pares, 1)]
+        buscados = buscados[np.argsort(codigos[buscados], kind='stable')]
+        cortes = np.searchsorted(codigos[buscados], np.arange(len(self.sectores) + 1))
+        for codigo in np.flatnonzero(np.diff(cortes)):
+            filas = buscados[cortes[codigo]:cortes[codigo + 1]]
+            tramo = ordenados[inicios[codigo]:inicios[codigo] + conteos[codigo]]
+            menores = np.searchsorted(tramo, valores[filas], side='left')
+            hasta_iguales = np.searchsorted(tramo, valores[filas], side='right')
+            percentiles[filas] = (menores + hasta_iguales) / 2 / conteos[codigo] * 100
+        return percentiles
+
+def leer_pares(fuente, minimo_pares=MINIMO_PARES):
+    """Lee una tabla de pares (CSV, Parquet o Arrow) y la indexa."""
+    return TablaPares(leer_tabla(fuente), minimo_pares)
+
+# ===================== COMPARABLES DE UN UNIVERSO =====================
+
+def multiplos_actuales(columnas):
+    """
+    Versión vectorizada de los múltiplos actuales de `calcular_multiplos` (P/E con el EPS
+    actual, P/S con el revenue actual por acción, P/B con el book value por acción), con las
+    claves de la tabla de pares. NaN donde el denominador no es positivo.
+    """
+    col = lambda nombre: np.asarray(columnas[nombre], dtype=np.float64)
+    precio, acciones = col('precio_actual'), col('acciones_circulacion')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        revenue_por_accion = np.where(acciones > 0, col('revenue_actual') / acciones, 0.0)
+        por_accion = {'per': col('eps_actual'), 'ps': revenue_por_accion, 'pb': col('book_value_per_share')}
+        return {multiplo: np.where(base > 0, precio / base, np.nan) for multiplo, base in por_accion.items()}
+
+def esperados_por_fila(pares, sectores, estadistico=MEDIANA, recorte=RECORTE_PREDETERMINADO):
+    """Múltiplo esperado de cada fila según su sector: {campo esperado: arreglo} (NaN sin pares suficientes)."""
+    codigos = pares.codigos_sector(sectores)
+    esperados = {}
+    for multiplo in MULTIPLOS_PARES:
+        por_sector = np.append(pares.estadistico(multiplo, estadistico, recorte), np.nan) # El -1 (sin sector) toma el NaN final.
+        esperados[CAMPOS_ESPERADOS[multiplo]] = por_sector[codigos]
+    return esperados
+
+def aplicar_comparables(tabla, pares, estadistico=MEDIANA, recorte=RECORTE_PREDETERMINADO):
+    """
+    Copia de un universo (una fila por empresa, con columna `sector`) con `per_esperado`,
+    `ps_esperado` y `pb_esperado` tomados de los pares de su sector. Donde el sector no tiene
+    pares suficientes se conserva la celda del archivo tal cual, para que la validación siga
+    señalando las mal formadas.
+    """
+    if COLUMNA_SECTOR not in tabla.columns:
+        raise ValueError(f"El universo debe tener una columna '{COLUMNA_SECTOR}' para usar comparables.")
+    tabla = tabla.copy()
+    for campo, esperados in esperados_por_fila(pares, tabla[COLUMNA_SECTOR], estadistico, recorte).items():
+        if campo in tabla.columns:
+            tabla[campo] = tabla[campo].where(np.isnan(esperados), esperados)
+        else:
+            tabla[campo] = esperados
+    return tabla
+
+def percentiles_universo(tabla, columnas, pares):
+    """
+    Posición de cada empresa de un universo entre los pares de su sector: sus múltiplos
+    actuales (de `columnas`, como las de `universo.columnas_desde_tabla`) y el percentil de
+    cada uno. Retorna un DataFrame con una fila por empresa.
+    """
+    n_filas = len(tabla)
+    sectores = tabla[COLUMNA_SECTOR] if COLUMNA_SECTOR in tabla.columns else pd.Series(pd.NA, index=tabla.index, dtype='string')
+    resultado = {COLUMNA_SECTOR: _textos_sector(sectores).to_numpy(dtype=object)}
+    if COLUMNA_TICKER in tabla.columns:
+        resultado = {COLUMNA_TICKER: tabla[COLUMNA_TICKER].astype(str).to_numpy(dtype=object), **resultado}
+    for multiplo, valores in multiplos_actuales(columnas).items():
+        valores = np.broadcast_to(valores, (n_filas,))
+        resultado[f'{multiplo}_actual'] = valores
+        resultado[f'percentil_{multiplo}'] = pares.percentil(multiplo, sectores, valores)
+    return pd.DataFrame(resultado)
@@ -0,0 +1,249 @@
+"""
+Costo de capital: WACC a partir del CAPM y betas estimadas con precios históricos.
+
+El WACC deja de ser un número tipeado: se arma con la tasa libre de riesgo, la prima de
+riesgo de mercado, la beta, el costo de la deuda y la estructura de capital. Las betas se
+estiman con archivos locales de precios diarios (CSV o Parquet) contra la serie de un índice,
+con una covarianza móvil vectorizada por sumas acumuladas: una pasada por arreglo para miles
+de tickers, sin recorrer ventana por ventana.
+"""
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# PyArrow es opcional: sin él no se pueden leer archivos Parquet, solo CSV.
+try:
+    import pyarrow # noqa: F401
+    PARQUET_DISPONIBLE = True
+except ImportError:
+    PARQUET_DISPONIBLE = False
+
+# Ventana por defecto de la beta móvil: un año bursátil de rendimientos diarios.
+VENTANA_BETA = 252
+
+# Ajuste de Blume: la beta estimada se acerca a 1 (beta ajustada = 2/3 beta + 1/3).
+PESO_BLUME = 2.0 / 3.0
+
+# Columnas por defecto de los archivos de precios.
+COLUMNA_FECHA = 'fecha'
+COLUMNA_TICKER = 'ticker'
+COLUMNA_PRECIO = 'cierre'
+
+# ===================== CAPM Y WACC =====================
+
+@dataclass(slots=True)
+class ResultadoWACC:
+    """Componentes del WACC, en porcentaje (escalares o arreglos por fila)."""
+    costo_capital_propio: np.ndarray
+    costo_deuda_despues_impuestos: np.ndarray
+    peso_capital_propio: np.ndarray
+    peso_deuda: np.ndarray
+    wacc: np.ndarray
+
+def costo_capital_propio(tasa_libre_riesgo, beta, prima_riesgo_mercado):
+    """Costo del capital propio por CAPM: rf + beta · prima de riesgo de mercado (tasas en porcentaje)."""
+    return np.asarray(tasa_libre_riesgo, dtype=np.float64) + np.asarray(beta, dtype=np.float64) * np.asarray(prima_riesgo_mercado, dtype=np.float64)
+
+def wacc_capm(tasa_libre_riesgo, beta, prima_riesgo_mercado, costo_deuda, tasa_impuestos, proporcion_deuda):
+    """
+    WACC = E/V · Ke + D/V · Kd · (1 - t), con Ke del CAPM. Todas las tasas y la proporción
+    de deuda D/V van en porcentaje, como en `data`; acepta escalares o arreglos (un lote de
+    empresas a la vez). Lanza ValueError si la proporción de deuda no está en [0, 100].
+    """
+    proporcion_deuda = np.asarray(proporcion_deuda, dtype=np.float64)
+    if np.any((proporcion_deuda < 0) | (proporcion_deuda > 100)):
+        raise ValueError("La proporción de deuda debe estar entre 0% y 100%.")
+    costo_propio = costo_capital_propio(tasa_libre_riesgo, beta, prima_riesgo_mercado)
+    costo_deuda_neto = np.asarray(costo_deuda, dtype=np.float64) * (1 - np.asarray(tasa_impuestos, dtype=np.float64) / 100)
+    peso_deuda = proporcion_deuda / 100
+    return ResultadoWACC(
+        costo_capital_propio=costo_propio,
+        costo_deuda_despues_impuestos=costo_deuda_neto,
+        peso_capital_propio=1 - peso_deuda,
+        peso_deuda=peso_deuda,
+        wacc=(1 - peso_deuda) * costo_propio + peso_deuda * costo_deuda_neto,
+    )
+
+def wacc_desde_datos(columnas):
+    """
+    WACC de `columnas` (un `data` o columnas de un lote): el calculado por CAPM en las filas
+    con `wacc_desde_capm` y el `wacc` ingresado en el resto.
+    """
+    calculado = wacc_capm(
+        columnas['tasa_libre_riesgo'], columnas['beta'], columnas['prima_riesgo_mercado'],
+        columnas['costo_deuda'], columnas['tasa_impuestos'], columnas['proporcion_deuda'],
+    ).wacc
+    return np.where(np.asarray(columnas.get('wacc_desde_capm', False), dtype=bool), calculado, np.asarray(columnas['wacc'], dtype=np.float64))
+
+# ===================== ARCHIVOS DE PRECIOS =====================
+
+@dataclass(slots=True)
+class SeriesPrecios:
+    """Precios de cierre diarios alineados por fecha: una columna por ticker (NaN si no cotizó)."""
+    fechas: np.ndarray
+    tickers: tuple
+    precios: np.ndarray # (fechas, tickers)
+
+    def columna(self, ticker):
+        """Índice de `ticker` en `tickers`; lanza ValueError si no está."""
+        try:
+            return self.tickers.index(ticker)
+        except ValueError:
+            raise ValueError(f"El ticker '{ticker}' no está en los precios cargados.") from None
+
+def leer_tabla_precios(fuente, columna_fecha=COLUMNA_FECHA, columna_ticker=COLUMNA_TICKER, columna_precio=COLUMNA_PRECIO):
+    """
+    Lee un archivo de precios (ruta o archivo abierto; el formato sale de la extensión) y lo
+    devuelve en formato ancho, indexado por fecha con una columna por ticker. Acepta el
+    formato ancho (fecha + una columna por ticker) o el largo (fecha, ticker, cierre).
+    """
+    nombre = str(getattr(fuente, 'name', fuente))
+    if Path(nombre).suffix.lower() in ('.parquet', '.pq'):
+        if not PARQUET_DISPONIBLE:
+            raise ValueError("Leer archivos Parquet requiere PyArrow (pip install pyarrow).")
+        tabla = pd.read_parquet(fuente)
+    else:
+        tabla = pd.read_csv(fuente)
+    if columna_fecha not in tabla.columns:
+        raise ValueError(f"El archivo '{nombre}' no tiene la columna de fecha '{columna_fecha}'.")
+    tabla[columna_fecha] = pd.to_datetime(tabla[columna_fecha])
+    if columna_ticker in tabla.columns and columna_precio in tabla.columns:
+        tabla = tabla.pivot_table(index=columna_fecha, columns=columna_ticker, values=columna_precio, aggfunc='last')
+    else:
+        tabla = tabla.set_index(columna_fecha)
+    tabla.columns = tabla.columns.astype(str)
+    return tabla.apply(pd.to_numeric, errors='coerce')
+
+def cargar_precios(fuentes, columna_fecha=COLUMNA_FECHA, columna_ticker=COLUMNA_TICKER, columna_precio=COLUMNA_PRECIO):
+    """
+    Carga uno o varios archivos de precios y los alinea por fecha (unión de fechas, orden
+    ascendente). Si un ticker aparece en más de un archivo se conserva el primero.
+    """
+    if isinstance(fuentes, (str, Path)) or hasattr(fuentes, 'read'):
+        fuentes = [fuentes]
+    tablas = [leer_tabla_precios(f, columna_fecha, columna_ticker, columna_precio) for f in fuentes]
+    if not tablas:
+        raise ValueError("No se indicó ningún archivo de precios.")
+    tabla = pd.concat(tablas, axis=1, join='outer').sort_index()
+    tabla = tabla.loc[:, ~tabla.columns.duplicated()]
+    return SeriesPrecios(
+        fechas=tabla.index.to_numpy(dtype='datetime64[D]'),
+        tickers=tuple(tabla.columns),
+        precios=tabla.to_numpy(dtype=np.float64),
+    )
+
+# ===================== BETA MÓVIL VECTORIZADA =====================
+
+def rendimientos_logaritmicos(precios):
+    """Rendimientos log diarios (una fila menos); los precios faltantes o no positivos dan NaN."""
+    precios = np.asarray(precios, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_precios = np.log(np.where(precios > 0, precios, np.nan))
+    return np.diff(log_precios, axis=0)
+
+def _sumas_moviles(x, ventana):
+    """Suma de cada ventana de `ventana` filas por diferencia de sumas acumuladas (float64)."""
+    acumulada = np.cumsum(x, axis=0, dtype=np.float64)
+    moviles = acumulada[ventana - 1:].copy()
+    moviles[1:] -= acumulada[:-ventana]
+    return moviles
+
+def betas_moviles(rendimientos, rendimientos_indice, ventana=VENTANA_BETA, min_observaciones=None, tamaño_bloque=1024):
+    """
+    Beta de cada ticker contra el índice en cada ventana móvil de `ventana` rendimientos.
+
+    `rendimientos` es (fechas, tickers) y `rendimientos_indice` (fechas,). Cada ventana usa
+    solo los días en que cotizaron el ticker y el índice; con menos de `min_observaciones`
+    días (por defecto la mitad de la ventana) o sin varianza del índice la beta es NaN.
+    Las sumas de x, y, xy y x² de todas las ventanas salen de sumas acumuladas, con los
+    rendimientos centrados antes para no perder precisión al restar. Los tickers se procesan
+    en bloques de `tamaño_bloque` columnas para acotar la memoria con universos grandes.
+
+    Retorna (betas, observaciones), ambos de forma (fechas - ventana + 1, tickers): la fila i
+    corresponde a la ventana que termina en la fecha i + ventana - 1.
+    """
+    rendimientos = np.asarray(rendimientos, dtype=np.float64)
+    indice = np.asarray(rendimientos_indice, dtype=np.float64)
+    n_fechas, n_tickers = rendimientos.shape
+    if indice.shape != (n_fechas,):
+        raise ValueError("La serie del índice debe tener una observación por fecha de los rendimientos.")
+    if not 2 <= ventana <= n_fechas:
+        raise ValueError(f"La ventana debe estar entre 2 y {n_fechas} rendimientos.")
+    if min_observaciones is None:
+        min_observaciones = max(2, ventana // 2)
+
+    n_ventanas = n_fechas - ventana + 1
+    betas = np.full((n_ventanas, n_tickers), np.nan)
+    observaciones = np.zeros((n_ventanas, n_tickers), dtype=np.int64)
+    indice_valido = np.isfinite(indice)
+    indice = np.where(indice_valido, indice, 0.0)
+    indice_centrado = np.where(indice_valido, indice - indice.sum() / max(indice_valido.sum(), 1), 0.0)
+
+    for inicio in range(0, n_tickers, tamaño_bloque):
+        bloque = slice(inicio, inicio + tamaño_bloque)
+        activos = rendimientos[:, bloque]
+        validos = np.isfinite(activos) & indice_valido[:, np.newaxis]
+        activos = np.where(validos, activos, 0.0)
+        medias = activos.sum(axis=0) / np.maximum(validos.sum(axis=0), 1)
+        y = np.where(validos, activos - medias, 0.0)
+        x = np.where(validos, indice_centrado[:, np.newaxis], 0.0)
+
+        n = _sumas_moviles(validos, ventana)
+        suma_x, suma_y = _sumas_moviles(x, ventana), _sumas_moviles(y, ventana)
+        suma_xy, suma_xx = _sumas_moviles(x * y, ventana), _sumas_moviles(x * x, ventana)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            covarianza = suma_xy - suma_x * suma_y / n
+            varianza = suma_xx - suma_x * suma_x / n
+            beta = covarianza / varianza
+        suficientes = (n >= min_observaciones) & (varianza > 0)
+        betas[:, bloque] = np.where(suficientes, beta, np.nan)
+        observaciones[:, bloque] = np.rint(n).astype(np.int64)
+    return betas, observaciones
+
+@dataclass(slots=True)
+class ResultadoBetas:
+    """Betas estimadas del universo contra el índice."""
+    tickers: tuple
+    indice: str
+    ventana: int
+    fechas: np.ndarray # Fecha de cierre de cada ventana.
+    betas: np.ndarray # (ventanas, tickers); NaN sin datos suficientes.
+    observaciones: np.ndarray # Días con datos en cada ventana.
+    beta_actual: np.ndarray # Beta de la última ventana (ajustada por Blume si se pidió).
+
+    def beta(self, ticker):
+        """Beta actual de `ticker` (NaN si no se pudo estimar)."""
+        return float(self.beta_actual[self.tickers.index(ticker)])
+
+def estimar_betas(series, indice, ventana=VENTANA_BETA, min_observaciones=None, ajuste_blume=False,
+                  serie_completa=True, tamaño_bloque=1024):
+    """
+    Betas de todos los tickers de `series` (ver `cargar_precios`) contra la columna `indice`.
+
+    Con `serie_completa=False` solo se calcula la última ventana (el recálculo nocturno del
+    universo): se recortan los rendimientos a esa ventana antes de las sumas. Con
+    `ajuste_blume` la beta actual se acerca a 1 (2/3 beta + 1/3); la serie móvil queda sin ajustar.
+    """
+    columna_indice = series.columna(indice)
+    rendimientos = rendimientos_logaritmicos(series.precios)
+    fechas = series.fechas[1:]
+    if not serie_completa:
+        rendimientos, fechas = rendimientos[-ventana:], fechas[-ventana:]
+    otros = np.array([i for i in range(len(series.tickers)) if i != columna_indice], dtype=np.intp)
+    betas, observaciones = betas_moviles(
+        rendimientos[:, otros], rendimientos[:, columna_indice], ventana, min_observaciones, tamaño_bloque
+    )
+    beta_actual = betas[-1] if betas.shape[0] else np.full(otros.size, np.nan)
+    if ajuste_blume:
+        beta_actual = PESO_BLUME * beta_actual + (1 - PESO_BLUME)
+    return ResultadoBetas(
+        tickers=tuple(series.tickers[i] for i in otros),
+        indice=indice,
+        ventana=ventana,
+        fechas=fechas[ventana - 1:],
+        betas=betas,
+        observaciones=observaciones,
+        beta_actual=beta_actual,
+    )
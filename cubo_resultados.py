@@ -0,0 +1,218 @@
+"""
+Cubo de resultados de un universo: precio de cada ticker × escenario × método de valuación.
+
+El cubo se guarda en una carpeta con dos archivos: `precios.npy`, un arreglo de NumPy que se
+abre mapeado en memoria, e `indice.json`, con las etiquetas de cada eje. En disco el orden es
+método × escenario × ticker, así que la vista más usada (un método y un escenario para todas
+las empresas, como en un screener) es un tramo contiguo del archivo y solo se leen sus páginas;
+`CuboResultados.precios` expone el orden lógico ticker × escenario × método sin copiar nada.
+"""
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from motor_valuacion import ESCENARIOS_PREDETERMINADOS, promedio_positivos, valuar_lote
+from universo import columnas_desde_tabla, tickers_de_tabla
+from validacion import ESQUEMA_LOTE, validar_tabla
+
+# Archivos dentro de la carpeta del cubo.
+ARCHIVO_PRECIOS = 'precios.npy'
+ARCHIVO_INDICE = 'indice.json'
+
+# Métodos del cubo: los precios por escenario (DCF, Múltiplo Terminal, DDM), los objetivos por
+# múltiplos (iguales en todos los escenarios) y el precio justo combinado de cada escenario.
+METODOS_CUBO = ('dcf', 'multiplo_terminal', 'ddm', 'pe', 'ps', 'pb', 'precio_justo')
+ETIQUETAS_METODOS = {
+    'dcf': "DCF",
+    'multiplo_terminal': "Múltiplo Terminal",
+    'ddm': "DDM",
+    'pe': "Objetivo P/E",
+    'ps': "Objetivo P/S",
+    'pb': "Objetivo P/B",
+    'precio_justo': "Precio Justo",
+}
+
+# Empresas que se valúan juntas al llenar el cubo: con muchos escenarios acota la memoria.
+FILAS_POR_BLOQUE_CUBO = 2_000
+
+# ===================== ESCENARIOS Y PRECIOS =====================
+
+def escenarios_en_grilla(factores_crecimiento, factores_wacc):
+    """
+    Escenarios (nombre, factor de crecimiento, factor de WACC) para cada combinación de los
+    factores dados, como los de ESCENARIOS_PREDETERMINADOS.
+    """
+    return tuple(
+        (f"g×{fc:.2f} / WACC×{fw:.2f}", float(fc), float(fw))
+        for fc in factores_crecimiento for fw in factores_wacc
+    )
+
+def _por_fila(precio, forma):
+    """Precio por fila (igual en todos los escenarios) extendido a la forma fila × escenario, sin copiar."""
+    return np.broadcast_to(np.reshape(precio, (-1, 1)), forma)
+
+def precios_por_metodo(lote, incluir_ddm=False):
+    """
+    Precios de un `ResultadoLote` en el orden del cubo en disco: método × escenario × fila.
+    El precio justo de cada escenario combina DCF, Múltiplo Terminal, múltiplos y (si
+    `incluir_ddm`) DDM de ese escenario igual que `valuar_lote` lo hace con el escenario Base.
+    """
+    n_filas = np.shape(lote.precio_justo_final)[0]
+    forma = (n_filas, len(lote.nombres_escenarios))
+    dcf = np.broadcast_to(lote.precio_dcf, forma)
+    multiplo_terminal = np.broadcast_to(lote.precio_multiplo_terminal, forma)
+    ddm = np.broadcast_to(lote.precio_ddm, forma)
+    ddm_incluido = np.where(np.reshape(np.asarray(incluir_ddm, dtype=bool), (-1, 1)), ddm, 0.0)
+    precio_justo = promedio_positivos(dcf, multiplo_terminal, _por_fila(lote.precio_obj_multiplos, forma), ddm_incluido)
+    metodos = {
+        'dcf': dcf, 'multiplo_terminal': multiplo_terminal, 'ddm': ddm,
+        'pe': _por_fila(lote.precio_objetivo_pe, forma), 'ps': _por_fila(lote.precio_objetivo_ps, forma),
+        'pb': _por_fila(lote.precio_objetivo_pb, forma),
+        'precio_justo': precio_justo,
+    }
+    return np.stack([metodos[m].T for m in METODOS_CUBO])
+
+# ===================== CUBO EN DISCO =====================
+
+@dataclass(slots=True)
+class CuboResultados:
+    """
+    Cubo abierto: etiquetas de cada eje y el arreglo mapeado en memoria (`datos`, en el orden
+    de disco método × escenario × ticker). Los cortes leen solo las partes del archivo que usan.
+    `carpeta`, si se indica, es el dueño de la carpeta del cubo (por ejemplo, un
+    `tempfile.TemporaryDirectory`): vive lo mismo que el cubo, que así borra su carpeta al liberarse.
+    """
+    tickers: np.ndarray
+    escenarios: tuple
+    metodos: tuple
+    datos: np.ndarray
+    _posicion_ticker: dict = field(default=None, repr=False)
+    carpeta: object = field(default=None, repr=False)
+
+    @property
+    def forma(self):
+        """Forma lógica: (tickers, escenarios, métodos)."""
+        return (len(self.tickers), len(self.escenarios), len(self.metodos))
+
+    @property
+    def precios(self):
+        """Vista ticker × escenario × método del arreglo en disco (sin copiar)."""
+        return self.datos.transpose(2, 1, 0)
+
+    def posicion_ticker(self, ticker):
+        """Posición de un ticker en el cubo (el índice se arma la primera vez que se pide)."""
+        if self._posicion_ticker is None:
+            self._posicion_ticker = {t: i for i, t in enumerate(self.tickers)}
+        try:
+            return self._posicion_ticker[ticker]
+        except KeyError:
+            raise ValueError(f"El ticker '{ticker}' no está en el cubo.") from None
+
+    def _posiciones(self, etiquetas, disponibles, eje):
+        if etiquetas is None:
+            return slice(None)
+        if isinstance(etiquetas, str):
+            etiquetas = [etiquetas]
+        if eje == 'ticker':
+            return np.array([self.posicion_ticker(e) for e in etiquetas], dtype=np.intp)
+        faltantes = [e for e in etiquetas if e not in disponibles]
+        if faltantes:
+            raise ValueError(f"{eje.capitalize()} desconocido en el cubo: {', '.join(map(str, faltantes))}.")
+        return np.array([disponibles.index(e) for e in etiquetas], dtype=np.intp)
+
+    def seccion(self, escenario, metodo):
+        """Precios de todos los tickers para un escenario y un método: una vista de un tramo contiguo del archivo."""
+        i_metodo = self._posiciones(metodo, self.metodos, 'método')[0]
+        i_escenario = self._posiciones(escenario, self.escenarios, 'escenario')[0]
+        return self.datos[i_metodo, i_escenario]
+
+    def corte(self, tickers=None, escenarios=None, metodos=None):
+        """
+        Sub-cubo ticker × escenario × método con las etiquetas pedidas en cada eje (None = todas).
+        Solo se copian a memoria los valores del corte.
+        """
+        i_metodos = self._posiciones(metodos, self.metodos, 'método')
+        i_escenarios = self._posiciones(escenarios, self.escenarios, 'escenario')
+        i_tickers = self._posiciones(tickers, None, 'ticker')
+        datos = self.datos[i_metodos][:, i_escenarios][:, :, i_tickers]
+        return np.ascontiguousarray(datos.transpose(2, 1, 0))
+
+    def empresa(self, ticker):
+        """Tabla escenario × método de un ticker."""
+        precios = self.corte(tickers=[ticker])[0]
+        return pd.DataFrame(precios, index=pd.Index(self.escenarios, name='escenario'), columns=list(self.metodos))
+
+    def tabla_escenario(self, escenario, metodos=None):
+        """Tabla ticker × método para un escenario (una columna contigua por método)."""
+        metodos = list(self.metodos if metodos is None else metodos)
+        return pd.DataFrame({'ticker': self.tickers, **{m: self.seccion(escenario, m) for m in metodos}})
+
+def _indice(tickers, escenarios, metodos, dtype):
+    return {
+        'orden_en_disco': ['metodo', 'escenario', 'ticker'],
+        'dtype': np.dtype(dtype).str,
+        'tickers': [str(t) for t in tickers],
+        'escenarios': list(escenarios),
+        'metodos': list(metodos),
+    }
+
+def crear_cubo(ruta, tickers, nombres_escenarios, metodos=METODOS_CUBO, dtype=np.float64):
+    """Crea en `ruta` un cubo vacío (lleno de NaN) para escribir por partes y lo retorna abierto en escritura."""
+    ruta = Path(ruta)
+    ruta.mkdir(parents=True, exist_ok=True)
+    indice = _indice(tickers, nombres_escenarios, metodos, dtype)
+    (ruta / ARCHIVO_INDICE).write_text(json.dumps(indice, ensure_ascii=False), encoding='utf-8')
+    datos = np.lib.format.open_memmap(
+        ruta / ARCHIVO_PRECIOS, mode='w+', dtype=dtype, shape=(len(metodos), len(nombres_escenarios), len(tickers))
+    )
+    datos[...] = np.nan
+    return CuboResultados(np.asarray(indice['tickers'], dtype=object), tuple(nombres_escenarios), tuple(metodos), datos)
+
+def abrir_cubo(ruta):
+    """Abre un cubo guardado: lee el índice y mapea los precios en memoria (solo lectura, sin cargarlos)."""
+    ruta = Path(ruta)
+    indice = json.loads((ruta / ARCHIVO_INDICE).read_text(encoding='utf-8'))
+    datos = np.load(ruta / ARCHIVO_PRECIOS, mmap_mode='r')
+    forma = (len(indice['metodos']), len(indice['escenarios']), len(indice['tickers']))
+    if datos.shape != forma:
+        raise ValueError(f"El cubo en '{ruta}' tiene forma {datos.shape} y su índice indica {forma}.")
+    return CuboResultados(np.asarray(indice['tickers'], dtype=object), tuple(indice['escenarios']), tuple(indice['metodos']), datos)
+
+def valuar_cubo(tickers, columnas, ruta, escenarios=ESCENARIOS_PREDETERMINADOS, filas_por_bloque=FILAS_POR_BLOQUE_CUBO, progreso=None,
+                posiciones=None):
+    """
+    Valúa un universo (columnas como las de `valuar_lote`) en todos los `escenarios` y guarda
+    el cubo en `ruta`, de a `filas_por_bloque` empresas: cada bloque se escribe directamente
+    en el archivo mapeado. Con `posiciones`, las columnas son solo las de esos tickers y el
+    resto queda en NaN. `progreso`, si se indica, recibe la fracción completada.
+    Retorna el cubo abierto en solo lectura.
+    """
+    n_filas = len(tickers) if posiciones is None else len(posiciones)
+    cubo = crear_cubo(ruta, tickers, tuple(nombre for nombre, _, _ in escenarios))
+    for inicio in range(0, n_filas, filas_por_bloque):
+        fin = min(inicio + filas_por_bloque, n_filas)
+        bloque = {campo: valor[inicio:fin] if np.ndim(valor) else valor for campo, valor in columnas.items()}
+        lote = valuar_lote(bloque, escenarios)
+        destino = slice(inicio, fin) if posiciones is None else posiciones[inicio:fin]
+        cubo.datos[:, :, destino] = precios_por_metodo(lote, bloque.get('incluir_ddm_precio_justo', False))
+        if progreso is not None:
+            progreso(fin / n_filas)
+    cubo.datos.flush()
+    del cubo
+    return abrir_cubo(ruta)
+
+def cubo_desde_universo(tabla, ruta, escenarios=ESCENARIOS_PREDETERMINADOS, filas_por_bloque=FILAS_POR_BLOQUE_CUBO, progreso=None):
+    """
+    Cubo de un DataFrame con una fila por empresa (ver `universo.columnas_desde_tabla`). Las
+    filas que no pasan la validación del lote (`validacion.ESQUEMA_LOTE`) quedan en NaN.
+    """
+    validas = validar_tabla(tabla, ESQUEMA_LOTE).filas_validas
+    if validas.all():
+        return valuar_cubo(tickers_de_tabla(tabla), columnas_desde_tabla(tabla), ruta, escenarios, filas_por_bloque, progreso)
+    posiciones = np.flatnonzero(validas)
+    return valuar_cubo(
+        tickers_de_tabla(tabla), columnas_desde_tabla(tabla.iloc[posiciones]), ruta, escenarios, filas_por_bloque, progreso, posiciones
+    )
@@ -0,0 +1,293 @@
+"""
+Ejecución en varios procesos de las corridas grandes: universos de empresas y simulaciones
+Monte Carlo (también una simulación por empresa de un universo).
+
+El trabajo se divide en bloques que se reparten a un `ProcessPoolExecutor`. Las columnas de
+entrada de un universo viajan en memoria compartida (`multiprocessing.shared_memory`): cada
+proceso recibe solo el nombre, la forma y el tipo de cada arreglo, sin serializar los datos.
+Una simulación se sortea en tramos fijos de `simulacion.SIMULACIONES_POR_SEMILLA`, cada uno
+con su semilla hija de `SeedSequence`; cada bloque toma tramos enteros y los resultados se
+combinan en el orden de los bloques, así que una corrida en varios procesos da exactamente el
+mismo resultado que `simulacion.simular_valuacion` con la misma semilla, para cualquier tamaño
+de bloque o cantidad de procesos.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, fields
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import motor_valuacion
+from motor_valuacion import ESCENARIOS_PREDETERMINADOS, ResultadoLote, valuar_lote
+from simulacion import (
+    ESCENARIO_SIMULACION, PERCENTILES_REPORTADOS, SIMULACIONES_POR_SEMILLA, VARIABLES_SIMULABLES,
+    distribucion_predeterminada, muestrear_por_tramos, resumir_simulacion, semillas_simulacion,
+)
+
+# Filas (empresas) por bloque de un universo y simulaciones por bloque de un Monte Carlo (se
+# redondea a un múltiplo de `SIMULACIONES_POR_SEMILLA`).
+TAMAÑO_BLOQUE_UNIVERSO = 50_000
+TAMAÑO_BLOQUE_SIMULACION = 4 * SIMULACIONES_POR_SEMILLA
+
+# Empresas por bloque cuando se simula cada empresa de un universo.
+EMPRESAS_POR_BLOQUE = 64
+
+# Los procesos nuevos arrancan con forkserver (o spawn): hacer fork de un servidor con hilos,
+# como Streamlit, no es seguro.
+_METODO_INICIO = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+def procesos_disponibles():
+    """Núcleos que puede usar este proceso (respeta la afinidad de CPU si el sistema la informa)."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+# ===================== MEMORIA COMPARTIDA =====================
+
+@dataclass(slots=True, frozen=True)
+class ArregloCompartido:
+    """Descripción de un arreglo en memoria compartida: lo único que se envía a cada proceso."""
+    nombre: str
+    forma: tuple
+    dtype: str
+
+class ColumnasCompartidas:
+    """
+    Copia las columnas-arreglo de un lote a memoria compartida (los escalares se envían tal
+    cual). Las columnas de texto se guardan como cadenas de ancho fijo. Se usa como contexto:
+    al salir se libera la memoria.
+    """
+    __slots__ = ('descriptores', 'escalares', '_bloques')
+
+    def __init__(self, columnas):
+        self.descriptores, self.escalares, self._bloques = {}, {}, []
+        for campo, valor in columnas.items():
+            if np.ndim(valor) == 0:
+                self.escalares[campo] = valor
+                continue
+            arreglo = np.asarray(valor)
+            if arreglo.dtype == object:
+                arreglo = arreglo.astype(str)
+            bloque = shared_memory.SharedMemory(create=True, size=max(arreglo.nbytes, 1))
+            self._bloques.append(bloque)
+            np.ndarray(arreglo.shape, dtype=arreglo.dtype, buffer=bloque.buf)[...] = arreglo
+            self.descriptores[campo] = ArregloCompartido(bloque.name, arreglo.shape, arreglo.dtype.str)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.liberar()
+
+    def liberar(self):
+        """Cierra y elimina los bloques de memoria compartida."""
+        for bloque in self._bloques:
+            bloque.close()
+            bloque.unlink()
+        self._bloques = []
+
+def _abrir_columnas(descriptores, escalares, filas):
+    """
+    Vistas (sin copia) de las filas `filas` de las columnas compartidas, más los escalares.
+    Retorna (columnas, bloques); los bloques deben cerrarse después de usar las vistas.
+    """
+    columnas, bloques = dict(escalares), []
+    for campo, descriptor in descriptores.items():
+        bloque = shared_memory.SharedMemory(name=descriptor.nombre)
+        bloques.append(bloque)
+        columnas[campo] = np.ndarray(descriptor.forma, dtype=np.dtype(descriptor.dtype), buffer=bloque.buf)[filas]
+    return columnas, bloques
+
+def _cerrar(bloques):
+    for bloque in bloques:
+        bloque.close()
+
+# ===================== EJECUCIÓN DE BLOQUES =====================
+
+def _inicializar_proceso(backend):
+    """Cada proceso usa el mismo backend que el principal y un solo hilo de Numba (los núcleos ya los reparte el pool)."""
+    motor_valuacion.seleccionar_backend(backend)
+    if backend == 'numba':
+        import numba
+        numba.set_num_threads(1)
+
+def ejecutar_bloques(funcion, argumentos, max_procesos=None, progreso=None):
+    """
+    Ejecuta funcion(*argumentos[i]) para cada bloque y retorna los resultados en el orden de
+    `argumentos`, sin importar en qué orden terminen. Con `max_procesos=1` (o un solo bloque)
+    todo corre en este proceso. `progreso`, si se indica, recibe la fracción de bloques
+    completados cada vez que termina uno.
+    """
+    max_procesos = procesos_disponibles() if max_procesos is None else max(int(max_procesos), 1)
+    resultados = [None] * len(argumentos)
+    if max_procesos == 1 or len(argumentos) <= 1:
+        for i, args in enumerate(argumentos):
+            resultados[i] = funcion(*args)
+            if progreso is not None:
+                progreso((i + 1) / len(argumentos))
+        return resultados
+
+    with ProcessPoolExecutor(
+        max_workers=min(max_procesos, len(argumentos)),
+        mp_context=multiprocessing.get_context(_METODO_INICIO),
+        initializer=_inicializar_proceso,
+        initargs=(motor_valuacion.backend_activo(),),
+    ) as ejecutor:
+        futuros = {ejecutor.submit(funcion, *args): i for i, args in enumerate(argumentos)}
+        for completados, futuro in enumerate(as_completed(futuros), start=1):
+            resultados[futuros[futuro]] = futuro.result()
+            if progreso is not None:
+                progreso(completados / len(argumentos))
+    return resultados
+
+def _bloques(n, tamaño_bloque):
+    """Rangos [inicio, fin) consecutivos de hasta `tamaño_bloque` elementos que cubren n."""
+    return [(inicio, min(inicio + tamaño_bloque, n)) for inicio in range(0, n, max(int(tamaño_bloque), 1))]
+
+# ===================== UNIVERSO EN PARALELO =====================
+
+def _valuar_bloque(descriptores, escalares, inicio, fin, escenarios):
+    """Valúa las filas [inicio, fin) de las columnas compartidas (se ejecuta en un proceso del pool)."""
+    columnas, bloques = _abrir_columnas(descriptores, escalares, slice(inicio, fin))
+    try:
+        lote = valuar_lote(columnas, escenarios)
+        n_escenarios = len(lote.nombres_escenarios)
+        # Copias de forma completa: las vistas sobre la memoria compartida no sobreviven al cierre.
+        return {
+            campo: np.array(np.broadcast_to(
+                getattr(lote, campo), (fin - inicio, n_escenarios) if np.ndim(getattr(lote, campo)) == 2 else (fin - inicio,)
+            ))
+            for campo in (f.name for f in fields(ResultadoLote)) if campo != 'nombres_escenarios'
+        }
+    finally:
+        _cerrar(bloques)
+
+def valuar_lote_paralelo(columnas, escenarios=ESCENARIOS_PREDETERMINADOS, tamaño_bloque=TAMAÑO_BLOQUE_UNIVERSO,
+                         max_procesos=None, progreso=None):
+    """
+    Equivalente de `motor_valuacion.valuar_lote` repartido en bloques de filas entre varios
+    procesos. Las columnas-arreglo se comparten sin copiarlas a cada proceso y los bloques se
+    vuelven a unir en orden, así que el resultado es idéntico al de `valuar_lote`.
+    """
+    n_filas = max((np.shape(v)[0] for v in columnas.values() if np.ndim(v) > 0), default=1)
+    rangos = _bloques(n_filas, tamaño_bloque)
+    with ColumnasCompartidas(columnas) as compartidas:
+        partes = ejecutar_bloques(
+            _valuar_bloque,
+            [(compartidas.descriptores, compartidas.escalares, inicio, fin, escenarios) for inicio, fin in rangos],
+            max_procesos, progreso,
+        )
+    return ResultadoLote(
+        nombres_escenarios=tuple(nombre for nombre, _, _ in escenarios),
+        **{campo: np.concatenate([parte[campo] for parte in partes]) for campo in partes[0]},
+    )
+
+# ===================== MONTE CARLO EN PARALELO =====================
+
+def _simular_bloque(data, distribuciones, n_simulaciones, semillas):
+    """Un bloque de la simulación: sus tramos, cada uno con su `SeedSequence` (se ejecuta en un proceso del pool)."""
+    columnas = muestrear_por_tramos(data, distribuciones, n_simulaciones, semillas)
+    lote = valuar_lote(columnas, escenarios=ESCENARIO_SIMULACION)
+    return (
+        np.ascontiguousarray(lote.precio_justo_final),
+        np.ascontiguousarray(lote.precio_dcf[:, 0]),
+        np.ascontiguousarray(lote.precio_multiplo_terminal[:, 0]),
+    )
+
+def simular_en_paralelo(data, distribuciones, n_simulaciones, semilla=None, tamaño_bloque=TAMAÑO_BLOQUE_SIMULACION,
+                        max_procesos=None, progreso=None):
+    """
+    Simulación Monte Carlo como `simulacion.simular_valuacion`, repartida en bloques entre
+    varios procesos. `tamaño_bloque` se redondea a tramos enteros de SIMULACIONES_POR_SEMILLA
+    y cada tramo usa la misma semilla hija que en `simular_valuacion`, así que con la misma
+    semilla el resultado es idéntico al de `simular_valuacion`, sin importar el tamaño de
+    bloque ni cuántos procesos se usen. Retorna un `ResultadoMonteCarlo`.
+    """
+    tramos_por_bloque = max(-(-int(tamaño_bloque) // SIMULACIONES_POR_SEMILLA), 1)
+    rangos = _bloques(n_simulaciones, tramos_por_bloque * SIMULACIONES_POR_SEMILLA)
+    semillas = semillas_simulacion(semilla, n_simulaciones)
+    partes = ejecutar_bloques(
+        _simular_bloque,
+        [
+            (data, distribuciones, fin - inicio, semillas[i * tramos_por_bloque:(i + 1) * tramos_por_bloque])
+            for i, (inicio, fin) in enumerate(rangos)
+        ],
+        max_procesos, progreso,
+    )
+    precio_justo_final, precio_dcf, precio_multiplo_terminal = (np.concatenate(p) for p in zip(*partes))
+    return resumir_simulacion(precio_justo_final, precio_dcf, precio_multiplo_terminal, data['precio_actual'])
+
+# ===================== MONTE CARLO POR EMPRESA DE UN UNIVERSO =====================
+
+@dataclass(slots=True)
+class ResultadoSimulacionUniverso:
+    """Resumen de la simulación de cada empresa de un universo (arreglos de una fila por empresa)."""
+    n_simulaciones: int
+    n_validas: np.ndarray
+    media: np.ndarray
+    desviacion: np.ndarray
+    percentiles: dict # percentil -> arreglo por empresa
+    probabilidad_subvaluada: np.ndarray
+
+def _fila_resumen(precio_justo_final, precio_actual):
+    """
+    Resumen de la simulación de una empresa como fila: simulaciones válidas, media,
+    desviación, probabilidad de subvaluación y percentiles (los mismos valores que
+    `resumir_simulacion`, sin armar el histograma que el universo no usa).
+    """
+    fila = np.zeros(4 + len(PERCENTILES_REPORTADOS))
+    validos = precio_justo_final[precio_justo_final > 0]
+    if validos.size:
+        fila[:4] = validos.size, validos.mean(), validos.std(), np.count_nonzero(validos > precio_actual) / validos.size
+        fila[4:] = np.percentile(validos, PERCENTILES_REPORTADOS)
+    return fila
+
+def _simular_empresas(descriptores, escalares, inicio, fin, tipos_distribucion, n_simulaciones, semillas):
+    """Simula las empresas [inicio, fin) del universo compartido, cada una con su semilla."""
+    columnas, bloques = _abrir_columnas(descriptores, escalares, slice(inicio, fin))
+    try:
+        resumen = np.zeros((fin - inicio, 4 + len(PERCENTILES_REPORTADOS)))
+        for k in range(fin - inicio):
+            data = {campo: (valor[k].item() if np.ndim(valor) > 0 else valor) for campo, valor in columnas.items()}
+            distribuciones = {campo: distribucion_predeterminada(tipo, data[campo]) for campo, tipo in tipos_distribucion.items()}
+            precio_justo_final = _simular_bloque(data, distribuciones, n_simulaciones, semillas_simulacion(semillas[k], n_simulaciones))[0]
+            resumen[k] = _fila_resumen(np.asarray(precio_justo_final), data['precio_actual'])
+        return resumen
+    finally:
+        _cerrar(bloques)
+
+def simular_universo(columnas, tipos_distribucion, n_simulaciones, semilla=None, empresas_por_bloque=EMPRESAS_POR_BLOQUE,
+                     max_procesos=None, progreso=None):
+    """
+    Monte Carlo de cada empresa de un universo (columnas como las de `valuar_lote`).
+    `tipos_distribucion` mapea campos de VARIABLES_SIMULABLES a un tipo de distribución; los
+    parámetros de cada empresa salen de `distribucion_predeterminada`, centrados en su propio
+    valor. Cada empresa tiene su semilla hija de `SeedSequence(semilla).spawn`, así que su
+    resultado no depende de cómo se agrupen las empresas en bloques ni de cuántos procesos se usen.
+    """
+    for campo in tipos_distribucion:
+        if campo not in VARIABLES_SIMULABLES:
+            raise ValueError(f"El campo '{campo}' no se puede simular.")
+    n_empresas = max((np.shape(v)[0] for v in columnas.values() if np.ndim(v) > 0), default=1)
+    semillas = np.random.SeedSequence(semilla).spawn(n_empresas)
+    rangos = _bloques(n_empresas, empresas_por_bloque)
+    with ColumnasCompartidas(columnas) as compartidas:
+        partes = ejecutar_bloques(
+            _simular_empresas,
+            [
+                (compartidas.descriptores, compartidas.escalares, inicio, fin, tipos_distribucion, n_simulaciones, semillas[inicio:fin])
+                for inicio, fin in rangos
+            ],
+            max_procesos, progreso,
+        )
+    resumen = np.concatenate(partes)
+    return ResultadoSimulacionUniverso(
+        n_simulaciones=n_simulaciones,
+        n_validas=resumen[:, 0].astype(np.int64),
+        media=resumen[:, 1],
+        desviacion=resumen[:, 2],
+        percentiles={p: resumen[:, 4 + i] for i, p in enumerate(PERCENTILES_REPORTADOS)},
+        probabilidad_subvaluada=resumen[:, 3],
+    )
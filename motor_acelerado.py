@@ -0,0 +1,226 @@
+"""
+Backend acelerado (opcional) de los kernels de valuación, compilado con Numba.
+
+Implementa con `@njit(parallel=True)` la misma matemática que los kernels NumPy de
+`motor_valuacion` (DCF, Múltiplo Terminal y precios objetivo por múltiplos), recorriendo
+cada elemento una sola vez y sin arreglos temporales. `motor_valuacion` lo usa
+automáticamente para lotes grandes cuando Numba está instalado; si no, todo sigue
+funcionando con NumPy.
+
+Ejecutar `python motor_acelerado.py` verifica que ambos backends coinciden.
+"""
+import math
+import sys
+
+import numpy as np
+
+try:
+    import numba
+    from numba import njit, prange
+    NUMBA_DISPONIBLE = True
+    # Streamlit ejecuta el script en un hilo secundario; la capa TBB iniciada desde ese hilo
+    # impide que el proceso termine, así que se prefiere OpenMP salvo que el usuario fije otra.
+    numba.config.THREADING_LAYER_PRIORITY = ['omp', 'workqueue', 'tbb']
+except ImportError:
+    NUMBA_DISPONIBLE = False
+
+import motor_valuacion
+from motor_valuacion import ResultadoDCFVectorizado
+
+# ===================== KERNELS NUMBA =====================
+
+if NUMBA_DISPONIBLE:
+    @njit(parallel=True, cache=True)
+    def _kernel_dcf(fcf_inicial, wacc, g, g_perpetuo, n, acciones, per_terminal, n_transicion,
+                    valido_dcf, valido_multiplo_terminal, valor_presente_fcf, fcf_final, valor_terminal,
+                    valor_presente_valor_terminal, precio_dcf, valor_terminal_multiplo, precio_multiplo_terminal):
+        for i in prange(fcf_inicial.size):
+            años = float(math.trunc(n[i])) if math.isfinite(n[i]) else n[i]
+            transicion = float(math.trunc(n_transicion[i])) if math.isfinite(n_transicion[i]) else n_transicion[i]
+            valido = fcf_inicial[i] > 0 and acciones[i] > 0 and wacc[i] > 0 and g[i] >= 0 and años > 0 and transicion >= 0
+            valido_dcf[i] = valido
+            valido_multiplo_terminal[i] = valido and per_terminal[i] > 0
+            if not valido:
+                valor_presente_fcf[i] = 0.0
+                fcf_final[i] = 0.0
+                valor_terminal[i] = 0.0
+                valor_presente_valor_terminal[i] = 0.0
+                precio_dcf[i] = 0.0
+                valor_terminal_multiplo[i] = 0.0
+                precio_multiplo_terminal[i] = 0.0
+                continue
+
+            log_crecimiento = math.log1p(g[i])
+            log_descuento = math.log1p(wacc[i])
+            log_q = log_crecimiento - log_descuento
+            if log_q == 0.0:
+                suma_geometrica = años
+            else:
+                suma_geometrica = math.exp(log_q) * math.expm1(años * log_q) / math.expm1(log_q)
+
+            fcf_n = fcf_inicial[i] * math.exp(años * log_crecimiento)
+            descuento_n = math.exp(años * log_descuento)
+            valor_presente = fcf_inicial[i] * suma_geometrica
+            if transicion > 0:
+                # Transición lineal del crecimiento hacia el perpetuo, año por año.
+                crecimiento_acumulado = 1.0
+                descuento_acumulado = 1.0
+                suma_transicion = 0.0
+                for k in range(1, int(transicion) + 1):
+                    crecimiento_acumulado *= 1 + g[i] + (g_perpetuo[i] - g[i]) * k / (transicion + 1)
+                    descuento_acumulado *= 1 + wacc[i]
+                    suma_transicion += crecimiento_acumulado / descuento_acumulado
+                valor_presente += fcf_n / descuento_n * suma_transicion
+                fcf_n *= crecimiento_acumulado
+                descuento_n *= descuento_acumulado
+            terminal = 0.0
+            if wacc[i] > g_perpetuo[i]:
+                terminal = fcf_n * (1 + g_perpetuo[i]) / (wacc[i] - g_perpetuo[i])
+
+            valor_presente_fcf[i] = valor_presente
+            fcf_final[i] = fcf_n
+            valor_terminal[i] = terminal
+            valor_presente_valor_terminal[i] = terminal / descuento_n
+            precio_dcf[i] = (valor_presente_fcf[i] + valor_presente_valor_terminal[i]) / acciones[i]
+            if valido_multiplo_terminal[i]:
+                valor_terminal_multiplo[i] = fcf_n * per_terminal[i]
+                precio_multiplo_terminal[i] = valor_terminal_multiplo[i] / descuento_n / acciones[i]
+            else:
+                valor_terminal_multiplo[i] = 0.0
+                precio_multiplo_terminal[i] = 0.0
+
+    @njit(parallel=True, cache=True)
+    def _kernel_multiplos(eps_proyectado, per_esperado, revenue_base, ps_esperado, equity_proyectado, pb_esperado,
+                          acciones, precio_objetivo_pe, precio_objetivo_ps, precio_objetivo_pb, precio_promedio):
+        for i in prange(eps_proyectado.size):
+            pe = eps_proyectado[i] * per_esperado[i] if eps_proyectado[i] > 0 and per_esperado[i] > 0 else 0.0
+            ps = revenue_base[i] / acciones[i] * ps_esperado[i] if acciones[i] > 0 and revenue_base[i] > 0 and ps_esperado[i] > 0 else 0.0
+            pb = equity_proyectado[i] / acciones[i] * pb_esperado[i] if equity_proyectado[i] > 0 and acciones[i] > 0 and pb_esperado[i] > 0 else 0.0
+            suma = 0.0
+            cantidad = 0
+            for precio in (pe, ps, pb):
+                if precio > 0:
+                    suma += precio
+                    cantidad += 1
+            precio_objetivo_pe[i] = pe
+            precio_objetivo_ps[i] = ps
+            precio_objetivo_pb[i] = pb
+            precio_promedio[i] = suma / cantidad if cantidad > 0 else 0.0
+
+# ===================== ENVOLTORIOS COMPATIBLES CON motor_valuacion =====================
+
+def _planos(*arreglos):
+    """Versiones contiguas de una dimensión de arreglos ya compatibles por broadcasting."""
+    forma = np.broadcast_shapes(*(a.shape for a in arreglos))
+    return forma, [np.ascontiguousarray(np.broadcast_to(a, forma)).ravel() for a in arreglos]
+
+def dcf_numba(fcf_inicial, wacc, g, g_perpetuo, n, acciones, per_terminal, n_transicion):
+    """Equivalente de `motor_valuacion.dcf_vectorizado` (argumentos ya convertidos y en decimales)."""
+    forma, entradas = _planos(fcf_inicial, wacc, g, g_perpetuo, n, acciones, per_terminal, n_transicion)
+    dtype = entradas[0].dtype
+    tamaño = entradas[0].size
+    valido_dcf = np.empty(tamaño, dtype=np.bool_)
+    valido_multiplo_terminal = np.empty(tamaño, dtype=np.bool_)
+    salidas = [np.empty(tamaño, dtype=dtype) for _ in range(7)]
+    _kernel_dcf(*entradas, valido_dcf, valido_multiplo_terminal, *salidas)
+    valor_presente_fcf, fcf_final, valor_terminal, valor_presente_valor_terminal, precio_dcf, valor_terminal_multiplo, precio_multiplo_terminal = (
+        s.reshape(forma) for s in salidas
+    )
+    return ResultadoDCFVectorizado(
+        valido_dcf=valido_dcf.reshape(forma),
+        valido_multiplo_terminal=valido_multiplo_terminal.reshape(forma),
+        valor_presente_fcf=valor_presente_fcf,
+        fcf_final=fcf_final,
+        valor_terminal=valor_terminal,
+        valor_presente_valor_terminal=valor_presente_valor_terminal,
+        precio_dcf=precio_dcf,
+        valor_terminal_multiplo=valor_terminal_multiplo,
+        precio_multiplo_terminal=precio_multiplo_terminal,
+    )
+
+def multiplos_numba(eps_proyectado, per_esperado, revenue_base, ps_esperado, equity_proyectado, pb_esperado, acciones):
+    """Equivalente de `motor_valuacion.objetivos_multiplos`."""
+    forma, entradas = _planos(eps_proyectado, per_esperado, revenue_base, ps_esperado, equity_proyectado, pb_esperado, acciones)
+    salidas = [np.empty(entradas[0].size, dtype=entradas[0].dtype) for _ in range(4)]
+    _kernel_multiplos(*entradas, *salidas)
+    return tuple(s.reshape(forma) for s in salidas)
+
+# ===================== VERIFICACIÓN DE PARIDAD ENTRE BACKENDS =====================
+
+def _entradas_aleatorias(n, semilla):
+    """Columnas aleatorias que cubren los casos borde: inputs en cero, g = 0, wacc <= g perpetuo, con y sin transición, reinversión o calendario."""
+    rng = np.random.default_rng(semilla)
+    columnas = motor_valuacion.datos_iniciales()
+
+    def con_ceros(valores, proporcion=0.1):
+        return np.where(rng.random(n) < proporcion, 0.0, valores)
+
+    columnas.update(
+        eps_proyectado=con_ceros(rng.uniform(0.1, 20, n)),
+        per_esperado=con_ceros(rng.uniform(2, 60, n)),
+        revenue_pesimista=con_ceros(rng.uniform(10, 1e5, n)),
+        revenue_base=con_ceros(rng.uniform(10, 1e5, n)),
+        revenue_optimista=con_ceros(rng.uniform(10, 1e5, n)),
+        ps_esperado=con_ceros(rng.uniform(0.2, 15, n)),
+        equity_proyectado=con_ceros(rng.uniform(10, 1e5, n)),
+        pb_esperado=con_ceros(rng.uniform(0.2, 10, n)),
+        net_income_estimado=con_ceros(rng.uniform(1, 1e4, n)),
+        acciones_circulacion=con_ceros(rng.uniform(1, 1e3, n)),
+        wacc=con_ceros(rng.uniform(0.5, 25, n)),
+        tasa_crecimiento_esperada=con_ceros(rng.uniform(-2, 40, n), 0.2),
+        tasa_crecimiento_perpetuo=rng.uniform(0, 12, n),
+        años_proyeccion_dcf=rng.integers(0, 51, n).astype(np.float64),
+        años_transicion_dcf=np.where(rng.random(n) < 0.5, 0.0, rng.integers(0, 31, n)),
+        dividendos_anuales=con_ceros(rng.uniform(0.05, 10, n), 0.3),
+        incluir_ddm_precio_justo=rng.random(n) < 0.5,
+        tasa_reinversion=np.where(rng.random(n) < 0.5, 0.0, rng.uniform(-20, 110, n)),
+        margen_seguridad_deseado=rng.uniform(0, 50, n),
+        fecha_valuacion=rng.choice(np.array(['', '2024-02-29', '2026-10-18'], dtype=object), n),
+        mes_cierre_fiscal=rng.integers(1, 13, n),
+        flujos_medio_año=rng.random(n) < 0.5,
+        periodo_parcial=rng.random(n) < 0.5,
+    )
+    # Casos con q exactamente 1 (crecimiento igual al WACC)
+    iguales = rng.random(n) < 0.05
+    columnas['tasa_crecimiento_esperada'] = np.where(iguales, columnas['wacc'], columnas['tasa_crecimiento_esperada'])
+    return columnas
+
+def verificar_paridad_backends(n=200_000, semilla=0, rtol=1e-9, atol=1e-9):
+    """
+    Valúa el mismo lote aleatorio con ambos backends y compara todos los resultados de
+    `valuar_lote`. Retorna un diccionario {campo: diferencia relativa máxima}; lanza
+    AssertionError si algún campo difiere más allá de la tolerancia.
+    """
+    if not NUMBA_DISPONIBLE:
+        raise RuntimeError("Numba no está instalado: no hay backend acelerado que verificar.")
+    columnas = _entradas_aleatorias(n, semilla)
+    anterior = motor_valuacion.backend_activo()
+    try:
+        motor_valuacion.seleccionar_backend('numpy')
+        esperado = motor_valuacion.valuar_lote(columnas)
+        motor_valuacion.seleccionar_backend('numba')
+        obtenido = motor_valuacion.valuar_lote(columnas)
+    finally:
+        motor_valuacion.seleccionar_backend(anterior)
+
+    diferencias = {}
+    for campo in ('precio_objetivo_pe', 'precio_objetivo_ps', 'precio_objetivo_pb', 'precio_obj_multiplos',
+                  'precio_dcf', 'precio_multiplo_terminal', 'precio_ddm_gordon', 'precio_ddm',
+                  'precio_justo_final', 'precio_maximo_a_pagar'):
+        a, b = getattr(esperado, campo), getattr(obtenido, campo)
+        np.testing.assert_allclose(b, a, rtol=rtol, atol=atol, err_msg=f"Los backends difieren en '{campo}'.")
+        with np.errstate(divide='ignore', invalid='ignore'):
+            relativa = np.abs(a - b) / np.maximum(np.abs(a), atol)
+        diferencias[campo] = float(np.nanmax(relativa)) if relativa.size else 0.0
+    return diferencias
+
+
+if __name__ == '__main__':
+    try:
+        resultado = verificar_paridad_backends()
+    except (AssertionError, RuntimeError) as e:
+        print(e)
+        sys.exit(1)
+    for campo, diferencia in resultado.items():
+        print(f"{campo:<28} diferencia relativa máxima: {diferencia:.3e}")
+    print("Los backends NumPy y Numba coinciden.")
@@ -0,0 +1,1279 @@
+"""
+Motor de valuación del Analizador de Acciones.
+
+Contiene toda la matemática financiera (múltiplos, DCF, múltiplo terminal y precio
+justo final) sin ninguna dependencia de Streamlit. Las funciones reciben el mismo
+diccionario de datos que `st.session_state.data_inputs` y devuelven resultados
+estructurados, de modo que la interfaz solo se encarga de mostrarlos y el mismo
+cálculo puede reutilizarse desde procesos por lotes, workers o pruebas.
+"""
+import calendar
+import datetime
+import functools
+import os
+from dataclasses import dataclass, field
+
+import numpy as np
+
+# ===================== DATOS DE ENTRADA =====================
+
+# Escenarios clásicos de la aplicación: (nombre, factor_crecimiento, factor_wacc).
+ESCENARIOS_PREDETERMINADOS = (
+    ("Pesimista", 0.7, 1.2),
+    ("Base", 1.0, 1.0),
+    ("Optimista", 1.3, 0.8),
+)
+
+# Probabilidad (en porcentaje) de cada escenario predeterminado en la tabla de escenarios editable.
+PROBABILIDADES_PREDETERMINADAS = (25.0, 50.0, 25.0)
+
+# Input de revenue de cada escenario con nombre conocido; los demás escenarios usan el revenue base.
+CAMPOS_REVENUE_ESCENARIO = {
+    'Pesimista': 'revenue_pesimista',
+    'Base': 'revenue_base',
+    'Optimista': 'revenue_optimista',
+}
+
+# Columnas de la tabla de escenarios: nombre y supuestos absolutos (tasas en porcentaje).
+COLUMNAS_TABLA_ESCENARIOS = (
+    'nombre', 'tasa_crecimiento_esperada', 'wacc', 'tasa_crecimiento_perpetuo', 'per_esperado', 'probabilidad',
+)
+
+
+def datos_iniciales():
+    """
+    Retorna un diccionario nuevo con los valores por defecto de todos los inputs.
+    Es la fuente única del esquema de datos de entrada de la aplicación.
+    """
+    return {
+        'precio_actual': 0.0,
+        'eps_actual': 0.0,
+        'eps_proyectado': 0.0,
+        'revenue_actual': 0.0,
+        'revenue_pesimista': 0.0,
+        'revenue_base': 0.0,
+        'revenue_optimista': 0.0,
+        'net_income_estimado': 0.0,
+        'acciones_circulacion': 0.0,
+        'dividendos_anuales': 0.0,
+        'book_value_per_share': 0.0,
+        'equity_proyectado': 0.0,
+        'tasa_crecimiento_esperada': 0.0,
+        'wacc': 0.0,
+        # Constructor del WACC por CAPM (`costo_capital`); tasas y proporción de deuda en porcentaje.
+        'wacc_desde_capm': False,
+        'tasa_libre_riesgo': 0.0,
+        'beta': 1.0,
+        'prima_riesgo_mercado': 0.0,
+        'costo_deuda': 0.0,
+        'tasa_impuestos': 0.0,
+        'proporcion_deuda': 0.0, # Deuda / (Deuda + Capital propio) a valor de mercado.
+        'per_esperado': 0.0,
+        'ps_esperado': 0.0,
+        'pb_esperado': 0.0,
+        'margen_seguridad_deseado': 0.0,
+        'incluir_ddm_precio_justo': False, # Si el DDM (Base) entra en el promedio del precio justo final.
+        'tasa_reinversion': 0.0, # Porcentaje del Net Income que se reinvierte (FCF = Net Income - reinversión).
+        'años_proyeccion_dcf': 5, # Número de años por defecto para la proyección DCF.
+        'años_transicion_dcf': 0, # Años en que el crecimiento converge al perpetuo (0 = DCF de dos etapas).
+        # Calendario de descuento: sin fecha de valuación se descuenta en años enteros.
+        'fecha_valuacion': '', # AAAA-MM-DD
+        'mes_cierre_fiscal': 12,
+        'flujos_medio_año': False, # Convención de mitad de año para los flujos explícitos.
+        'periodo_parcial': False, # El primer flujo es solo la parte del año fiscal en curso que falta.
+        'tasa_crecimiento_perpetuo': 2.0, # Tasa de crecimiento perpetuo por defecto (en porcentaje).
+        # Datos históricos para la comparación de múltiplos.
+        'per_historico_1': 0.0,
+        'per_historico_2': 0.0,
+        'per_historico_3': 0.0,
+        'ps_historico_1': 0.0,
+        'ps_historico_2': 0.0,
+        'ps_historico_3': 0.0,
+        'pb_historico_1': 0.0,
+        'pb_historico_2': 0.0,
+        'pb_historico_3': 0.0,
+    }
+
+# ===================== RESULTADOS ESTRUCTURADOS =====================
+
+@dataclass(slots=True)
+class MultiplosCalculados:
+    """Múltiplos P/E, P/S y P/B actuales y proyectados al precio de mercado."""
+    pe_actual: float = 0.0
+    ps_actual: float = 0.0
+    pb_actual: float = 0.0
+    pe_proyectado: float = 0.0
+    ps_proyectado: float = 0.0
+    pb_proyectado: float = 0.0
+
+
+@dataclass(slots=True)
+class ResultadoMultiplos:
+    """Precios objetivo por múltiplos esperados. Un precio en 0.0 indica datos insuficientes."""
+    precio_objetivo_pe: float = 0.0
+    precio_objetivo_ps: float = 0.0
+    precio_objetivo_pb: float = 0.0
+    revenue_per_share_proyectado: float = 0.0
+    book_value_per_share_proyectado: float = 0.0
+    precio_promedio: float = 0.0
+
+
+@dataclass(slots=True)
+class ResultadoDCF:
+    """Detalle completo de una valuación DCF con crecimiento perpetuo para un escenario."""
+    escenario: str
+    valido: bool
+    años_proyeccion: int
+    wacc: float
+    tasa_crecimiento_esperada: float
+    tasa_crecimiento_perpetuo: float
+    net_income_estimado: float
+    años_transicion: int = 0
+    horizonte: int = 0 # Años totales proyectados (crecimiento alto + transición).
+    tasa_reinversion: float = 0.0
+    tasas_crecimiento: list = field(default_factory=list)
+    revenue_proyectados: list = field(default_factory=list)
+    margenes_netos: list = field(default_factory=list)
+    net_income_proyectados: list = field(default_factory=list)
+    reinversiones: list = field(default_factory=list)
+    fcf_proyectados: list = field(default_factory=list)
+    momentos_flujos: list = field(default_factory=list) # Años desde la valuación hasta cada flujo.
+    factores_descuento: list = field(default_factory=list)
+    valores_presentes_fcf: list = field(default_factory=list)
+    valor_presente_fcf: float = 0.0
+    valor_terminal_calculable: bool = False
+    fcf_siguiente_periodo: float = 0.0
+    valor_terminal: float = 0.0
+    momento_valor_terminal: float = 0.0
+    valor_presente_valor_terminal: float = 0.0
+    valor_empresa: float = 0.0
+    valor_equidad: float = 0.0
+    precio_objetivo: float = 0.0
+
+
+@dataclass(slots=True)
+class ResultadoMultiploTerminal:
+    """Detalle de una valuación por múltiplo terminal (PER de salida) para un escenario."""
+    escenario: str
+    valido: bool
+    años_proyeccion: int
+    wacc: float
+    tasa_crecimiento_esperada: float
+    per_terminal: float
+    años_transicion: int = 0
+    horizonte: int = 0
+    net_income_proyectado_final: float = 0.0
+    momento_valor_terminal: float = 0.0
+    valor_terminal: float = 0.0
+    valor_presente_valor_terminal: float = 0.0
+    precio_objetivo: float = 0.0
+
+
+@dataclass(slots=True)
+class ProyeccionOperativa:
+    """
+    Proyección revenue → margen → reinversión → FCF. Las matrices tienen forma
+    (años, escenarios); `valido` tiene un elemento por escenario.
+    """
+    nombres_escenarios: tuple
+    valido: np.ndarray
+    tasas_crecimiento: np.ndarray
+    revenue: np.ndarray
+    margen_neto: np.ndarray
+    net_income: np.ndarray
+    reinversion: np.ndarray
+    fcf: np.ndarray
+
+
+@dataclass(slots=True)
+class ResultadoDCFVectorizado:
+    """
+    Resultados del kernel vectorizado: cada campo es un arreglo con la forma
+    resultante del broadcasting de los parámetros de entrada (un elemento por escenario).
+    """
+    valido_dcf: np.ndarray
+    valido_multiplo_terminal: np.ndarray
+    valor_presente_fcf: np.ndarray
+    fcf_final: np.ndarray
+    valor_terminal: np.ndarray
+    valor_presente_valor_terminal: np.ndarray
+    precio_dcf: np.ndarray
+    valor_terminal_multiplo: np.ndarray
+    precio_multiplo_terminal: np.ndarray
+
+
+@dataclass(slots=True)
+class ResultadoDDMVectorizado:
+    """
+    Precios por acción del modelo de descuento de dividendos: Gordon (crecimiento perpetuo
+    desde el primer año) y multietapa (mismas etapas que el DCF). Un precio en 0.0 indica
+    datos insuficientes o tasa de descuento no mayor que el crecimiento perpetuo.
+    """
+    valido_gordon: np.ndarray
+    precio_gordon: np.ndarray
+    valido_multietapa: np.ndarray
+    precio_multietapa: np.ndarray
+
+
+@dataclass(slots=True)
+class ResultadoLote:
+    """
+    Valuación completa de un lote de filas de inputs (empresas, perturbaciones o simulaciones).
+    Los campos por escenario tienen forma (n_filas, n_escenarios); el resto, (n_filas,).
+    """
+    nombres_escenarios: tuple
+    precio_objetivo_pe: np.ndarray
+    precio_objetivo_ps: np.ndarray
+    precio_objetivo_pb: np.ndarray
+    precio_obj_multiplos: np.ndarray
+    precio_dcf: np.ndarray
+    precio_multiplo_terminal: np.ndarray
+    precio_ddm_gordon: np.ndarray
+    precio_ddm: np.ndarray
+    precio_justo_final: np.ndarray
+    precio_maximo_a_pagar: np.ndarray
+
+
+@dataclass(slots=True)
+class ResultadoTornado:
+    """Sensibilidad del precio justo final a cada input, ordenada de mayor a menor impacto."""
+    campos: list
+    valores_base: np.ndarray
+    valores_bajos: np.ndarray
+    valores_altos: np.ndarray
+    precio_base: float
+    precios_bajos: np.ndarray
+    precios_altos: np.ndarray
+    impacto: np.ndarray
+
+
+@dataclass(slots=True)
+class ResultadoTablaEscenarios:
+    """Precios de cada escenario definido por el usuario y su promedio ponderado por probabilidad."""
+    nombres_escenarios: tuple
+    probabilidades: np.ndarray
+    precio_dcf: np.ndarray
+    precio_multiplo_terminal: np.ndarray
+    precio_dcf_ponderado: float = 0.0
+    precio_multiplo_terminal_ponderado: float = 0.0
+
+
+@dataclass(slots=True)
+class ResultadoValuacion:
+    """Resultado consolidado de todos los métodos para una empresa."""
+    multiplos_calculados: MultiplosCalculados
+    multiplos: ResultadoMultiplos
+    nombres_escenarios: tuple
+    escenarios: ResultadoDCFVectorizado
+    escenarios_ddm: ResultadoDDMVectorizado
+    precio_justo_final: float = 0.0
+    precio_maximo_a_pagar: float = 0.0
+
+    def precio_dcf(self, nombre_escenario):
+        """Precio objetivo DCF del escenario indicado."""
+        return float(self.escenarios.precio_dcf[self.nombres_escenarios.index(nombre_escenario)])
+
+    def precio_multiplo_terminal(self, nombre_escenario):
+        """Precio objetivo por Múltiplo Terminal del escenario indicado."""
+        return float(self.escenarios.precio_multiplo_terminal[self.nombres_escenarios.index(nombre_escenario)])
+
+    def precio_ddm(self, nombre_escenario):
+        """Precio por DDM multietapa del escenario indicado."""
+        return float(self.escenarios_ddm.precio_multietapa[self.nombres_escenarios.index(nombre_escenario)])
+
+# ===================== CÁLCULOS DE MÚLTIPLOS =====================
+
+def calcular_pe(precio, eps):
+    """
+    Calcula el Ratio Precio/Beneficio (P/E).
+    Retorna 0.0 si EPS es cero para evitar divisiones por cero.
+    """
+    if eps > 0:
+        return precio / eps
+    return 0.0
+
+def calcular_ps(precio, revenue_per_share):
+    """
+    Calcula el Ratio Precio/Ventas (P/S).
+    Retorna 0.0 si Revenue por Acción es cero.
+    """
+    if revenue_per_share > 0:
+        return precio / revenue_per_share
+    return 0.0
+
+def calcular_pb(precio, book_value_per_share):
+    """
+    Calcula el Ratio Precio/Valor Contable (P/B).
+    Retorna 0.0 si Book Value por Acción es cero.
+    """
+    if book_value_per_share > 0:
+        return precio / book_value_per_share
+    return 0.0
+
+def calcular_multiplos(data):
+    """
+    Calcula los múltiplos actuales y proyectados al precio de mercado actual.
+    Los proyectados usan EPS proyectado, Revenue Base y Equity Proyectado por acción.
+    """
+    acciones = data['acciones_circulacion']
+    revenue_per_share_actual = data['revenue_actual'] / acciones if acciones > 0 else 0
+    revenue_per_share_proyectado_base = data['revenue_base'] / acciones if acciones > 0 else 0
+    book_value_per_share_proyectado = data['equity_proyectado'] / acciones if acciones > 0 else 0
+
+    return MultiplosCalculados(
+        pe_actual=calcular_pe(data['precio_actual'], data['eps_actual']),
+        ps_actual=calcular_ps(data['precio_actual'], revenue_per_share_actual),
+        pb_actual=calcular_pb(data['precio_actual'], data['book_value_per_share']),
+        pe_proyectado=calcular_pe(data['precio_actual'], data['eps_proyectado']),
+        ps_proyectado=calcular_ps(data['precio_actual'], revenue_per_share_proyectado_base),
+        pb_proyectado=calcular_pb(data['precio_actual'], book_value_per_share_proyectado),
+    )
+
+# ===================== VALUACIÓN POR MÚLTIPLOS =====================
+
+def valuar_multiplos(data):
+    """
+    Calcula los precios objetivo basados en los múltiplos P/E, P/S y P/B esperados
+    y su promedio simple sobre los métodos con datos válidos.
+    """
+    resultado = ResultadoMultiplos()
+
+    if data['eps_proyectado'] > 0 and data['per_esperado'] > 0:
+        resultado.precio_objetivo_pe = data['eps_proyectado'] * data['per_esperado']
+
+    if data['acciones_circulacion'] > 0 and data['revenue_base'] > 0 and data['ps_esperado'] > 0:
+        resultado.revenue_per_share_proyectado = data['revenue_base'] / data['acciones_circulacion']
+        resultado.precio_objetivo_ps = resultado.revenue_per_share_proyectado * data['ps_esperado']
+
+    if data['equity_proyectado'] > 0 and data['acciones_circulacion'] > 0 and data['pb_esperado'] > 0:
+        resultado.book_value_per_share_proyectado = data['equity_proyectado'] / data['acciones_circulacion']
+        resultado.precio_objetivo_pb = resultado.book_value_per_share_proyectado * data['pb_esperado']
+
+    precios_validos = [p for p in [resultado.precio_objetivo_pe, resultado.precio_objetivo_ps, resultado.precio_objetivo_pb] if p > 0]
+    if precios_validos:
+        resultado.precio_promedio = float(np.mean(precios_validos))
+    return resultado
+
+# ===================== DESCUENTO POR FECHAS (CALENDARIO FISCAL Y XNPV) =====================
+
+# Base de conteo de las fracciones de año (ACT/365, como XNPV).
+DIAS_POR_AÑO = 365.0
+
+# Inputs que definen el calendario de descuento (no son magnitudes numéricas que perturbar).
+CAMPOS_CALENDARIO = ('fecha_valuacion', 'mes_cierre_fiscal', 'flujos_medio_año', 'periodo_parcial')
+
+
+@dataclass(slots=True, frozen=True)
+class CalendarioFiscal:
+    """
+    Momento de los flujos anuales respecto de la fecha de valuación. El flujo del año t se
+    recibe `años_hasta_cierre + t - 1` años después de la valuación (medio año antes con la
+    convención de mitad de año) y el primero se multiplica por `factor_primer_flujo`.
+    """
+    años_hasta_cierre: float = 1.0
+    factor_primer_flujo: float = 1.0
+    medio_año: bool = False
+    periodo_parcial: bool = False
+
+
+def _fin_de_mes(año, mes):
+    return datetime.date(año, mes, calendar.monthrange(año, mes)[1])
+
+@functools.lru_cache(maxsize=4096)
+def calendario_fiscal(fecha_valuacion='', mes_cierre_fiscal=12, flujos_medio_año=False, periodo_parcial=False):
+    """
+    Calendario de descuento para una fecha de valuación (AAAA-MM-DD) y el mes de cierre del
+    año fiscal (el año fiscal termina el último día de ese mes).
+
+    - Sin fecha, el primer cierre está a un año exacto: descuento en años enteros.
+    - Con período parcial, el primer flujo es la fracción del año fiscal en curso que queda
+      entre la valuación y el cierre; sin él, se recibe completo en el primer cierre.
+    - Con convención de mitad de año, cada flujo se recibe a mitad de su período.
+
+    El resultado se guarda en caché: las empresas con el mismo calendario lo comparten.
+    """
+    mes_cierre_fiscal = int(mes_cierre_fiscal)
+    if not 1 <= mes_cierre_fiscal <= 12:
+        raise ValueError(f"Mes de cierre fiscal inválido: {mes_cierre_fiscal} (se espera 1 a 12).")
+    if not fecha_valuacion:
+        return CalendarioFiscal(1.0, 1.0, bool(flujos_medio_año), bool(periodo_parcial))
+    try:
+        fecha = datetime.date.fromisoformat(str(fecha_valuacion)[:10])
+    except ValueError:
+        raise ValueError(f"Fecha de valuación inválida: '{fecha_valuacion}' (se espera AAAA-MM-DD).") from None
+
+    cierre = _fin_de_mes(fecha.year, mes_cierre_fiscal)
+    if cierre <= fecha:
+        cierre = _fin_de_mes(fecha.year + 1, mes_cierre_fiscal)
+    dias_hasta_cierre = (cierre - fecha).days
+    dias_año_fiscal = (cierre - _fin_de_mes(cierre.year - 1, mes_cierre_fiscal)).days
+    return CalendarioFiscal(
+        años_hasta_cierre=dias_hasta_cierre / DIAS_POR_AÑO,
+        factor_primer_flujo=dias_hasta_cierre / dias_año_fiscal if periodo_parcial else 1.0,
+        medio_año=bool(flujos_medio_año),
+        periodo_parcial=bool(periodo_parcial),
+    )
+
+def momento_primer_flujo(calendario):
+    """Años entre la valuación y el primer flujo (la mitad del período parcial si corresponde)."""
+    if calendario.medio_año:
+        return calendario.años_hasta_cierre / 2 if calendario.periodo_parcial else calendario.años_hasta_cierre - 0.5
+    return calendario.años_hasta_cierre
+
+@functools.lru_cache(maxsize=4096)
+def momentos_flujos(calendario, horizonte):
+    """
+    Fracciones de año de los `horizonte` flujos anuales y del valor terminal (último
+    elemento, al cierre del último año). Arreglo en caché y de solo lectura.
+    """
+    momentos = calendario.años_hasta_cierre + np.arange(horizonte + 1, dtype=np.float64)
+    momentos[horizonte] -= 1
+    if calendario.medio_año:
+        momentos[:horizonte] -= 0.5
+    if horizonte:
+        momentos[0] = momento_primer_flujo(calendario)
+    momentos.setflags(write=False)
+    return momentos
+
+def _calendarios_unicos(columnas):
+    """
+    Calendarios distintos de un lote y el índice de cada fila en esa lista (None si todas
+    las filas comparten calendario). Cada calendario único se calcula una sola vez.
+    """
+    valores = [columnas.get(campo, defecto) for campo, defecto in (
+        ('fecha_valuacion', ''), ('mes_cierre_fiscal', 12), ('flujos_medio_año', False), ('periodo_parcial', False),
+    )]
+    if all(np.ndim(v) == 0 for v in valores):
+        fecha, mes, medio_año, parcial = valores
+        fecha = '' if fecha is None or (isinstance(fecha, float) and np.isnan(fecha)) else str(fecha)
+        return [calendario_fiscal(fecha, int(mes), bool(medio_año), bool(parcial))], None
+
+    n_filas = np.broadcast_shapes(*(np.shape(v) for v in valores))
+    fechas, meses, medio_año, parcial = (np.broadcast_to(np.asarray(v), n_filas) for v in valores)
+    fechas = np.where(np.isin(fechas.astype(str), ('nan', 'NaT', 'None')), '', fechas.astype(str))
+    claves = np.rec.fromarrays([
+        fechas, np.nan_to_num(meses.astype(np.float64), nan=12).astype(np.int64), medio_año.astype(bool), parcial.astype(bool),
+    ])
+    unicas, inversa = np.unique(claves, return_inverse=True)
+    return [calendario_fiscal(str(f), int(m), bool(a), bool(p)) for f, m, a, p in unicas], inversa.ravel()
+
+def parametros_calendario(columnas):
+    """
+    Parámetros del calendario de cada fila para `ajustar_a_calendario`: desfase de los flujos
+    explícitos, momento y factor del primer flujo y desfase del valor terminal (escalares si
+    todas las filas comparten calendario).
+    """
+    calendarios, inversa = _calendarios_unicos(columnas)
+    tabla = np.array([
+        (c.años_hasta_cierre - 1 - 0.5 * c.medio_año, momento_primer_flujo(c), c.factor_primer_flujo, c.años_hasta_cierre - 1)
+        for c in calendarios
+    ])
+    return tuple(tabla[:, i][0] if inversa is None else tabla[:, i][inversa] for i in range(tabla.shape[1]))
+
+def matriz_momentos_flujos(columnas, horizonte):
+    """
+    Fracciones de año (n_filas, horizonte + 1) de un lote para `xnpv_vectorizado`: se arma
+    una fila por calendario único y se reparte a las empresas que lo comparten.
+    """
+    calendarios, inversa = _calendarios_unicos(columnas)
+    matriz = np.stack([momentos_flujos(c, horizonte) for c in calendarios])
+    return matriz if inversa is None else matriz[inversa]
+
+def xnpv_vectorizado(flujos, momentos, tasa):
+    """
+    Valor presente de flujos en fechas arbitrarias: sum(flujos / (1 + tasa)^momentos) sobre
+    el último eje. `momentos` (fracciones de año) se combina con `flujos` por broadcasting y
+    `tasa` (decimal) tiene la forma de los flujos sin el último eje.
+    """
+    log_descuento = np.log1p(np.asarray(tasa, dtype=np.float64))[..., np.newaxis]
+    return np.sum(np.asarray(flujos, dtype=np.float64) * np.exp(-np.asarray(momentos) * log_descuento), axis=-1)
+
+def ajustar_a_calendario(resultado, flujo_primer_año, tasa, acciones_circulacion, desfase_flujos, momento_primer, factor_primer, desfase_terminal):
+    """
+    Lleva un resultado de `dcf_vectorizado` (flujos en años enteros) al calendario dado por
+    `parametros_calendario`. Los flujos siguen siendo anuales, así que el XNPV equivale a
+    desplazar todos los flujos explícitos el mismo tiempo d y tratar aparte el primero:
+        VP = (1 + r)^-d (VP_enteros - F1 / (1 + r)) + c F1 (1 + r)^-t1
+    y a descontar los valores terminales desde `años_hasta_cierre + N - 1` en lugar de N.
+    """
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        log_descuento = np.log1p(tasa)
+        valor_presente_fcf = (
+            np.exp(-desfase_flujos * log_descuento) * (resultado.valor_presente_fcf - flujo_primer_año * np.exp(-log_descuento))
+            + factor_primer * flujo_primer_año * np.exp(-momento_primer * log_descuento)
+        )
+        ajuste_terminal = np.exp(-desfase_terminal * log_descuento)
+        valor_presente_valor_terminal = resultado.valor_presente_valor_terminal * ajuste_terminal
+        precio_dcf = (valor_presente_fcf + valor_presente_valor_terminal) / acciones_circulacion
+        precio_multiplo_terminal = resultado.precio_multiplo_terminal * ajuste_terminal
+    return ResultadoDCFVectorizado(
+        valido_dcf=resultado.valido_dcf,
+        valido_multiplo_terminal=resultado.valido_multiplo_terminal,
+        valor_presente_fcf=np.where(resultado.valido_dcf, valor_presente_fcf, 0.0),
+        fcf_final=resultado.fcf_final,
+        valor_terminal=resultado.valor_terminal,
+        valor_presente_valor_terminal=np.where(resultado.valido_dcf, valor_presente_valor_terminal, 0.0),
+        precio_dcf=np.where(resultado.valido_dcf, precio_dcf, 0.0),
+        valor_terminal_multiplo=resultado.valor_terminal_multiplo,
+        precio_multiplo_terminal=np.where(resultado.valido_multiplo_terminal, precio_multiplo_terminal, 0.0),
+    )
+
+def calendario_por_defecto(parametros):
+    """True si los parámetros de calendario equivalen a descontar en años enteros."""
+    desfase_flujos, momento_primer, factor_primer, desfase_terminal = (np.asarray(p) for p in parametros)
+    return bool(np.all(desfase_flujos == 0) and np.all(momento_primer == 1) and np.all(factor_primer == 1) and np.all(desfase_terminal == 0))
+
+# ===================== PROYECCIÓN OPERATIVA (REVENUE → MARGEN → FCF) =====================
+
+def tasas_crecimiento_anuales(tasa_crecimiento, tasa_crecimiento_perpetuo, años_proyeccion, años_transicion=0):
+    """
+    Tasa de crecimiento de cada año proyectado (en decimales): `años_proyeccion` años a la
+    tasa esperada y luego `años_transicion` años que convergen linealmente a la perpetua.
+    Con tasas por escenario (arreglos) el resultado tiene forma (años, escenarios).
+    """
+    tasa_crecimiento = np.asarray(tasa_crecimiento, dtype=np.float64)
+    k = np.arange(1, años_transicion + 1).reshape((-1,) + (1,) * tasa_crecimiento.ndim)
+    return np.concatenate([
+        np.broadcast_to(tasa_crecimiento, (años_proyeccion,) + tasa_crecimiento.shape),
+        tasa_crecimiento + (tasa_crecimiento_perpetuo - tasa_crecimiento) * k / (años_transicion + 1),
+    ])
+
+def flujo_inicial_y_per(net_income_estimado, per_esperado, tasa_reinversion, revenue_escenario=0.0, revenue_base=0.0):
+    """
+    Entradas de `dcf_vectorizado` equivalentes a `proyectar_flujos` (margen neto y tasa de
+    reinversión constantes): el FCF del año base del escenario y el P/E expresado sobre ese
+    FCF, para que el Múltiplo Terminal siga aplicándose al Net Income. Acepta escalares o
+    arreglos; sin revenue del escenario o del caso base, el Net Income no se escala.
+    """
+    net_income_estimado, per_esperado, tasa_reinversion, revenue_escenario, revenue_base = (
+        np.asarray(x, dtype=np.float64) for x in (net_income_estimado, per_esperado, tasa_reinversion, revenue_escenario, revenue_base)
+    )
+    con_revenue = (revenue_escenario > 0) & (revenue_base > 0)
+    escala = np.divide(revenue_escenario, revenue_base, out=np.ones(np.broadcast_shapes(revenue_escenario.shape, revenue_base.shape)), where=con_revenue)
+    fraccion_libre = 1 - tasa_reinversion / 100
+    per_sobre_fcf = np.divide(per_esperado, fraccion_libre, out=np.zeros(np.broadcast_shapes(per_esperado.shape, fraccion_libre.shape)), where=fraccion_libre > 0)
+    return net_income_estimado * escala * fraccion_libre, per_sobre_fcf
+
+def proyectar_flujos(data, escenarios=ESCENARIOS_PREDETERMINADOS):
+    """
+    Proyecta revenue, margen neto, Net Income, reinversión y FCF de todos los escenarios a la
+    vez, como matrices años × escenarios, en una sola pasada de NumPy.
+
+    El revenue del año base de cada escenario es su input (`CAMPOS_REVENUE_ESCENARIO`) y crece
+    con la trayectoria de crecimiento del escenario; el margen neto es el implícito en el caso
+    base (Net Income Estimado / Revenue Base). Sin revenue base, se proyecta directamente el
+    Net Income (margen 100%), como en el modelo original. El FCF es el Net Income menos la
+    reinversión (`tasa_reinversion` por ciento del Net Income).
+    """
+    nombres_escenarios = tuple(nombre for nombre, _, _ in escenarios)
+    factores_crecimiento = np.array([fc for _, fc, _ in escenarios], dtype=np.float64)
+    net_income_estimado = data['net_income_estimado']
+    revenue_base = data['revenue_base']
+    años_proyeccion = int(data['años_proyeccion_dcf'])
+    años_transicion = int(data['años_transicion_dcf'])
+    tasa_crecimiento = (data['tasa_crecimiento_esperada'] / 100) * factores_crecimiento
+
+    valido = (tasa_crecimiento >= 0) & all([
+        net_income_estimado > 0, años_proyeccion > 0, años_transicion >= 0, data['tasa_reinversion'] < 100,
+    ])
+    if revenue_base > 0:
+        margen_neto = net_income_estimado / revenue_base
+        revenue_inicial = np.array([data.get(CAMPOS_REVENUE_ESCENARIO.get(nombre, 'revenue_base'), 0.0) for nombre in nombres_escenarios], dtype=np.float64)
+        revenue_inicial = np.where(revenue_inicial > 0, revenue_inicial, revenue_base)
+    else:
+        margen_neto = 1.0
+        revenue_inicial = np.full(len(escenarios), float(net_income_estimado))
+
+    tasas_crecimiento = tasas_crecimiento_anuales(
+        tasa_crecimiento, data['tasa_crecimiento_perpetuo'] / 100, max(años_proyeccion, 0), max(años_transicion, 0)
+    )
+    revenue = revenue_inicial * np.cumprod(1 + tasas_crecimiento, axis=0)
+    margenes = np.full_like(revenue, margen_neto)
+    net_income = revenue * margenes
+    reinversion = net_income * (data['tasa_reinversion'] / 100)
+    return ProyeccionOperativa(
+        nombres_escenarios=nombres_escenarios,
+        valido=valido,
+        tasas_crecimiento=tasas_crecimiento,
+        revenue=revenue,
+        margen_neto=margenes,
+        net_income=net_income,
+        reinversion=reinversion,
+        fcf=net_income - reinversion,
+    )
+
+def descontar_flujos(proyeccion, wacc, tasa_crecimiento_perpetuo, acciones_circulacion, per_terminal=0.0,
+                     calendario=CalendarioFiscal()):
+    """
+    Descuenta las matrices de `proyectar_flujos` (un escenario por columna) con
+    `xnpv_vectorizado` en las fechas del `calendario` y calcula el valor terminal por
+    crecimiento perpetuo sobre el último FCF y por Múltiplo Terminal sobre el último Net
+    Income. `wacc` (decimal) puede ser un escalar o un arreglo por escenario.
+    Mismas reglas de validez que `dcf_vectorizado`.
+    """
+    fcf = proyeccion.fcf
+    n_escenarios = fcf.shape[1]
+    wacc, g_perpetuo, acciones, per_terminal = np.broadcast_arrays(
+        *(np.asarray(x, dtype=np.float64) for x in (wacc, tasa_crecimiento_perpetuo, acciones_circulacion, per_terminal)),
+        np.empty(n_escenarios),
+    )[:4]
+    if fcf.shape[0] == 0:
+        fcf = net_income = np.zeros((1, n_escenarios))
+    else:
+        net_income = proyeccion.net_income
+
+    valido_dcf = proyeccion.valido & (fcf[0] > 0) & (acciones > 0) & (wacc > 0)
+    valido_multiplo_terminal = valido_dcf & (per_terminal > 0)
+
+    momentos = momentos_flujos(calendario, fcf.shape[0])
+    flujos = fcf.T.copy() # (escenarios, años)
+    flujos[:, 0] *= calendario.factor_primer_flujo
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        valor_presente_fcf = xnpv_vectorizado(flujos, momentos[:-1], wacc)
+        descuento_terminal = np.exp(momentos[-1] * np.log1p(wacc))
+        fcf_final = fcf[-1]
+        valor_terminal = np.where(
+            wacc > g_perpetuo, fcf_final * (1 + g_perpetuo) / (wacc - g_perpetuo), 0.0
+        )
+        valor_presente_valor_terminal = valor_terminal / descuento_terminal
+        precio_dcf = (valor_presente_fcf + valor_presente_valor_terminal) / acciones
+
+        valor_terminal_multiplo = net_income[-1] * per_terminal
+        precio_multiplo_terminal = valor_terminal_multiplo / descuento_terminal / acciones
+
+    return ResultadoDCFVectorizado(
+        valido_dcf=valido_dcf,
+        valido_multiplo_terminal=valido_multiplo_terminal,
+        valor_presente_fcf=np.where(valido_dcf, valor_presente_fcf, 0.0),
+        fcf_final=np.where(valido_dcf, fcf_final, 0.0),
+        valor_terminal=np.where(valido_dcf, valor_terminal, 0.0),
+        valor_presente_valor_terminal=np.where(valido_dcf, valor_presente_valor_terminal, 0.0),
+        precio_dcf=np.where(valido_dcf, precio_dcf, 0.0),
+        valor_terminal_multiplo=np.where(valido_multiplo_terminal, valor_terminal_multiplo, 0.0),
+        precio_multiplo_terminal=np.where(valido_multiplo_terminal, precio_multiplo_terminal, 0.0),
+    )
+
+# ===================== DESCUENTO DE FLUJOS DE CAJA (DCF) =====================
+
+def valuar_dcf(data, nombre_escenario="Base", factor_crecimiento=1.0, factor_wacc=1.0):
+    """
+    Valuación por Descuento de Flujos de Caja con valor terminal de crecimiento perpetuo.
+    Ajusta la tasa de crecimiento y el WACC según los factores del escenario. Con
+    `años_transicion_dcf` > 0 es un DCF de tres etapas (crecimiento alto, transición y perpetuidad).
+    Los flujos salen de `proyectar_flujos`: el revenue del escenario a margen neto constante,
+    menos la reinversión.
+    """
+    net_income_estimado = data['net_income_estimado']
+    acciones_circulacion = data['acciones_circulacion']
+    wacc = (data['wacc'] / 100) * factor_wacc # Ajuste del WACC por escenario
+    tasa_crecimiento_esperada = (data['tasa_crecimiento_esperada'] / 100) * factor_crecimiento # Ajuste de tasa de crecimiento
+    años_proyeccion = int(data['años_proyeccion_dcf'])
+    años_transicion = int(data['años_transicion_dcf'])
+    tasa_crecimiento_perpetuo = (data['tasa_crecimiento_perpetuo'] / 100) # La tasa perpetua no se ajusta por escenario
+    tasa_reinversion = data['tasa_reinversion'] / 100
+
+    resultado = ResultadoDCF(
+        escenario=nombre_escenario,
+        valido=all([net_income_estimado > 0, acciones_circulacion > 0, wacc > 0, tasa_crecimiento_esperada >= 0, años_proyeccion > 0, años_transicion >= 0, tasa_reinversion < 1]),
+        años_proyeccion=años_proyeccion,
+        wacc=wacc,
+        tasa_crecimiento_esperada=tasa_crecimiento_esperada,
+        tasa_crecimiento_perpetuo=tasa_crecimiento_perpetuo,
+        net_income_estimado=net_income_estimado,
+        años_transicion=años_transicion,
+        horizonte=años_proyeccion + años_transicion,
+        tasa_reinversion=tasa_reinversion,
+    )
+    if not resultado.valido:
+        return resultado
+
+    # Fases 1 y 2: flujos del escenario (revenue → margen → reinversión) descontados al WACC
+    # en las fechas del calendario fiscal, todos los años a la vez.
+    proyeccion = proyectar_flujos(data, ((nombre_escenario, factor_crecimiento, factor_wacc),))
+    calendario = calendario_fiscal(data['fecha_valuacion'], data['mes_cierre_fiscal'], data['flujos_medio_año'], data['periodo_parcial'])
+    momentos = momentos_flujos(calendario, resultado.horizonte)
+    fcf_proyectados = proyeccion.fcf[:, 0].copy()
+    fcf_proyectados[0] *= calendario.factor_primer_flujo
+    factores_descuento = (1 + wacc) ** momentos[:-1]
+    valores_presentes_fcf = fcf_proyectados / factores_descuento
+    resultado.momentos_flujos = momentos[:-1].tolist()
+    resultado.tasas_crecimiento = proyeccion.tasas_crecimiento[:, 0].tolist()
+    resultado.revenue_proyectados = proyeccion.revenue[:, 0].tolist()
+    resultado.margenes_netos = proyeccion.margen_neto[:, 0].tolist()
+    resultado.net_income_proyectados = proyeccion.net_income[:, 0].tolist()
+    resultado.reinversiones = proyeccion.reinversion[:, 0].tolist()
+    resultado.fcf_proyectados = fcf_proyectados.tolist()
+    resultado.factores_descuento = factores_descuento.tolist()
+    resultado.valores_presentes_fcf = valores_presentes_fcf.tolist()
+    resultado.valor_presente_fcf = float(valores_presentes_fcf.sum())
+
+    # Fase 3: valor terminal por crecimiento perpetuo (Gordon Growth Model), al cierre del último año.
+    resultado.valor_terminal_calculable = wacc > tasa_crecimiento_perpetuo
+    if resultado.valor_terminal_calculable:
+        resultado.fcf_siguiente_periodo = float(proyeccion.fcf[-1, 0]) * (1 + tasa_crecimiento_perpetuo)
+        resultado.valor_terminal = resultado.fcf_siguiente_periodo / (wacc - tasa_crecimiento_perpetuo)
+
+    resultado.momento_valor_terminal = float(momentos[-1])
+    resultado.valor_presente_valor_terminal = resultado.valor_terminal / (1 + wacc) ** momentos[-1]
+    resultado.valor_empresa = resultado.valor_presente_fcf + resultado.valor_presente_valor_terminal
+    # Modelo simplificado: el Valor de la Equidad es igual al Valor de la Empresa (sin deuda neta ni efectivo).
+    resultado.valor_equidad = resultado.valor_empresa
+    resultado.precio_objetivo = resultado.valor_equidad / acciones_circulacion
+    return resultado
+
+# ===================== MÚLTIPLO TERMINAL (EXIT MULTIPLE) =====================
+
+def valuar_multiplo_terminal(data, nombre_escenario="Base", factor_crecimiento=1.0, factor_wacc=1.0):
+    """
+    Valuación por Múltiplo Terminal: aplica el PER esperado al Net Income proyectado del
+    escenario al final del período explícito (incluida la transición, si la hay) y lo
+    descuenta al presente.
+    """
+    net_income_estimado = data['net_income_estimado']
+    acciones_circulacion = data['acciones_circulacion']
+    wacc = (data['wacc'] / 100) * factor_wacc
+    tasa_crecimiento_esperada = (data['tasa_crecimiento_esperada'] / 100) * factor_crecimiento
+    años_proyeccion = int(data['años_proyeccion_dcf'])
+    años_transicion = int(data['años_transicion_dcf'])
+    per_terminal_esperado = data['per_esperado'] # Usamos el PER esperado como múltiplo terminal
+
+    resultado = ResultadoMultiploTerminal(
+        escenario=nombre_escenario,
+        valido=all([net_income_estimado > 0, acciones_circulacion > 0, wacc > 0, tasa_crecimiento_esperada >= 0, años_proyeccion > 0, años_transicion >= 0, data['tasa_reinversion'] < 100, per_terminal_esperado > 0]),
+        años_proyeccion=años_proyeccion,
+        wacc=wacc,
+        tasa_crecimiento_esperada=tasa_crecimiento_esperada,
+        per_terminal=per_terminal_esperado,
+        años_transicion=años_transicion,
+        horizonte=años_proyeccion + años_transicion,
+    )
+    if not resultado.valido:
+        return resultado
+
+    proyeccion = proyectar_flujos(data, ((nombre_escenario, factor_crecimiento, factor_wacc),))
+    calendario = calendario_fiscal(data['fecha_valuacion'], data['mes_cierre_fiscal'], data['flujos_medio_año'], data['periodo_parcial'])
+    resultado.momento_valor_terminal = float(momentos_flujos(calendario, resultado.horizonte)[-1])
+    resultado.net_income_proyectado_final = float(proyeccion.net_income[-1, 0])
+    resultado.valor_terminal = resultado.net_income_proyectado_final * per_terminal_esperado
+    resultado.valor_presente_valor_terminal = resultado.valor_terminal / ((1 + wacc)**resultado.momento_valor_terminal)
+    resultado.precio_objetivo = resultado.valor_presente_valor_terminal / acciones_circulacion
+    return resultado
+
+# ===================== SELECCIÓN DE BACKEND =====================
+
+# Backends disponibles para los kernels vectorizados. 'numba' (módulo `motor_acelerado`) es
+# opcional; si Numba no está instalado se usa NumPy automáticamente.
+BACKENDS = ('numpy', 'numba')
+
+# Por debajo de este número de elementos el costo de lanzar hilos no compensa y se usa NumPy.
+TAMAÑO_MINIMO_NUMBA = 10_000
+
+_backend_solicitado = os.environ.get('ANALIZADOR_BACKEND', 'auto')
+_backend_activo = None
+
+def seleccionar_backend(nombre='auto'):
+    """
+    Selecciona el backend de los kernels: 'numpy', 'numba' o 'auto' (Numba si está instalado).
+    Si se pide Numba y no está disponible se recurre a NumPy. Retorna el backend activo.
+    """
+    global _backend_activo
+    if nombre not in ('auto',) + BACKENDS:
+        raise ValueError(f"Backend desconocido: '{nombre}'. Opciones: auto, {', '.join(BACKENDS)}.")
+    _backend_activo = 'numpy'
+    if nombre in ('auto', 'numba'):
+        try:
+            import motor_acelerado
+            if motor_acelerado.NUMBA_DISPONIBLE:
+                _backend_activo = 'numba'
+        except ImportError:
+            pass
+    return _backend_activo
+
+def backend_activo():
+    """Backend en uso; se resuelve en la primera llamada según la variable ANALIZADOR_BACKEND."""
+    if _backend_activo is None:
+        seleccionar_backend(_backend_solicitado)
+    return _backend_activo
+
+def _usar_numba(tamaño):
+    return tamaño >= TAMAÑO_MINIMO_NUMBA and backend_activo() == 'numba'
+
+# ===================== KERNEL VECTORIZADO DCF / MÚLTIPLO TERMINAL =====================
+
+def dcf_vectorizado(fcf_inicial, wacc, tasa_crecimiento, tasa_crecimiento_perpetuo, años_proyeccion,
+                    acciones_circulacion, per_terminal=0.0, años_transicion=0.0, dtype=np.float64):
+    """
+    Valúa por DCF (crecimiento perpetuo) y por Múltiplo Terminal todas las combinaciones
+    de parámetros en una sola llamada de NumPy. Las tasas van en decimales y todos los
+    argumentos aceptan escalares o arreglos compatibles por broadcasting.
+
+    El DCF tiene tres etapas: `años_proyeccion` años de crecimiento alto, `años_transicion`
+    años en los que el crecimiento converge linealmente al perpetuo y el valor terminal al
+    final del horizonte total. Con `años_transicion=0` es el DCF clásico de dos etapas.
+
+    La suma de la Fase 1 usa la forma cerrada de la serie geométrica
+    sum_{i=1..N} q^i = q (q^N - 1) / (q - 1), con q = (1 + g) / (1 + wacc),
+    evaluada con expm1/log1p para conservar la precisión cuando q es cercano a 1.
+    La transición se proyecta con productos acumulados sobre un eje de años adicional
+    (solo si algún elemento tiene años de transición).
+    Replica las reglas de `valuar_dcf` y `valuar_multiplo_terminal`: los escenarios
+    inválidos valen 0.0 y el valor terminal es 0.0 si wacc <= crecimiento perpetuo.
+    Con `dtype=np.float32` todo el cálculo se hace en precisión simple (la mitad de memoria).
+    Con el backend Numba activo, los lotes grandes se calculan con `motor_acelerado`.
+    """
+    fcf_inicial, wacc, g, g_perpetuo, n, acciones, per_terminal, n_transicion = np.broadcast_arrays(
+        *(np.asarray(x, dtype=dtype) for x in
+          (fcf_inicial, wacc, tasa_crecimiento, tasa_crecimiento_perpetuo, años_proyeccion, acciones_circulacion,
+           per_terminal, años_transicion))
+    )
+    if _usar_numba(fcf_inicial.size):
+        import motor_acelerado
+        return motor_acelerado.dcf_numba(fcf_inicial, wacc, g, g_perpetuo, n, acciones, per_terminal, n_transicion)
+
+    n = np.trunc(n) # Mismo criterio que int(años_proyeccion_dcf)
+    n_transicion = np.trunc(n_transicion)
+
+    valido_dcf = (fcf_inicial > 0) & (acciones > 0) & (wacc > 0) & (g >= 0) & (n > 0) & (n_transicion >= 0)
+    valido_multiplo_terminal = valido_dcf & (per_terminal > 0)
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        log_crecimiento = np.log1p(g)
+        log_descuento = np.log1p(wacc)
+        log_q = log_crecimiento - log_descuento
+        # q * (q^N - 1) / (q - 1); el límite cuando q -> 1 es N.
+        suma_geometrica = np.where(
+            log_q == 0.0, n, np.exp(log_q) * np.expm1(n * log_q) / np.expm1(log_q)
+        )
+        valor_presente_fcf = fcf_inicial * suma_geometrica
+
+        fcf_final = fcf_inicial * np.exp(n * log_crecimiento)
+        factor_descuento_final = np.exp(n * log_descuento)
+
+        años_transicion_max = int(np.max(np.where(valido_dcf, n_transicion, 0), initial=0))
+        if años_transicion_max > 0:
+            # Transición: el año k crece a g + (g_perpetuo - g) k / (T + 1); los años k > T no aplican.
+            k = np.arange(1, años_transicion_max + 1, dtype=dtype)
+            en_transicion = k <= n_transicion[..., np.newaxis]
+            crecimiento_k = g[..., np.newaxis] + (g_perpetuo - g)[..., np.newaxis] * k / (n_transicion[..., np.newaxis] + 1)
+            crecimiento_acumulado = np.cumprod(np.where(en_transicion, 1 + crecimiento_k, 1.0), axis=-1)
+            descuento_acumulado = np.cumprod(np.where(en_transicion, 1 + wacc[..., np.newaxis], 1.0), axis=-1)
+            valor_presente_fcf = valor_presente_fcf + fcf_final / factor_descuento_final * np.sum(
+                np.where(en_transicion, crecimiento_acumulado / descuento_acumulado, 0.0), axis=-1
+            )
+            fcf_final = fcf_final * crecimiento_acumulado[..., -1]
+            factor_descuento_final = factor_descuento_final * descuento_acumulado[..., -1]
+
+        valor_terminal = np.where(
+            wacc > g_perpetuo, fcf_final * (1 + g_perpetuo) / (wacc - g_perpetuo), 0.0
+        )
+        valor_presente_valor_terminal = valor_terminal / factor_descuento_final
+        precio_dcf = (valor_presente_fcf + valor_presente_valor_terminal) / acciones
+
+        valor_terminal_multiplo = fcf_final * per_terminal
+        precio_multiplo_terminal = valor_terminal_multiplo / factor_descuento_final / acciones
+
+    return ResultadoDCFVectorizado(
+        valido_dcf=valido_dcf,
+        valido_multiplo_terminal=valido_multiplo_terminal,
+        valor_presente_fcf=np.where(valido_dcf, valor_presente_fcf, 0.0),
+        fcf_final=np.where(valido_dcf, fcf_final, 0.0),
+        valor_terminal=np.where(valido_dcf, valor_terminal, 0.0),
+        valor_presente_valor_terminal=np.where(valido_dcf, valor_presente_valor_terminal, 0.0),
+        precio_dcf=np.where(valido_dcf, precio_dcf, 0.0),
+        valor_terminal_multiplo=np.where(valido_multiplo_terminal, valor_terminal_multiplo, 0.0),
+        precio_multiplo_terminal=np.where(valido_multiplo_terminal, precio_multiplo_terminal, 0.0),
+    )
+
+def valuar_escenarios(data, factores_crecimiento, factores_wacc, nombres_escenarios=None):
+    """
+    Evalúa DCF y Múltiplo Terminal para un conjunto de escenarios definidos por factores
+    sobre la tasa de crecimiento y el WACC de `data`: proyecta las matrices años × escenarios
+    con `proyectar_flujos` y las descuenta en una sola pasada. `nombres_escenarios` elige el
+    revenue de cada escenario (sin nombres, todos usan el revenue base).
+    """
+    if nombres_escenarios is None:
+        nombres_escenarios = [''] * len(factores_crecimiento)
+    proyeccion = proyectar_flujos(data, tuple(zip(nombres_escenarios, factores_crecimiento, factores_wacc)))
+    return descontar_flujos(
+        proyeccion,
+        wacc=(data['wacc'] / 100) * np.asarray(factores_wacc, dtype=np.float64),
+        tasa_crecimiento_perpetuo=data['tasa_crecimiento_perpetuo'] / 100,
+        acciones_circulacion=data['acciones_circulacion'],
+        per_terminal=data['per_esperado'],
+        calendario=calendario_fiscal(data['fecha_valuacion'], data['mes_cierre_fiscal'], data['flujos_medio_año'], data['periodo_parcial']),
+    )
+
+def grilla_sensibilidad(data, waccs, tasas_crecimiento):
+    """
+    Evalúa DCF y Múltiplo Terminal sobre la grilla completa WACC × crecimiento en una
+    sola pasada vectorizada. `waccs` y `tasas_crecimiento` van en porcentaje (como en
+    `data`); los arreglos resultantes tienen forma (len(waccs), len(tasas_crecimiento)).
+    """
+    fcf_inicial, per_terminal = flujo_inicial_y_per(data['net_income_estimado'], data['per_esperado'], data['tasa_reinversion'])
+    wacc = np.asarray(waccs, dtype=np.float64)[:, np.newaxis] / 100
+    tasa_crecimiento = np.asarray(tasas_crecimiento, dtype=np.float64)[np.newaxis, :] / 100
+    resultado = dcf_vectorizado(
+        fcf_inicial=fcf_inicial,
+        wacc=wacc,
+        tasa_crecimiento=tasa_crecimiento,
+        tasa_crecimiento_perpetuo=data['tasa_crecimiento_perpetuo'] / 100,
+        años_proyeccion=data['años_proyeccion_dcf'],
+        acciones_circulacion=data['acciones_circulacion'],
+        per_terminal=per_terminal,
+        años_transicion=data['años_transicion_dcf'],
+    )
+    calendario = parametros_calendario(data)
+    if calendario_por_defecto(calendario):
+        return resultado
+    return ajustar_a_calendario(resultado, fcf_inicial * (1 + tasa_crecimiento), wacc, data['acciones_circulacion'], *calendario)
+
+# ===================== MODELO DE DESCUENTO DE DIVIDENDOS (DDM) =====================
+
+def ddm_vectorizado(dividendo_anual, tasa_descuento, tasa_crecimiento, tasa_crecimiento_perpetuo, años_proyeccion,
+                    años_transicion=0.0, calendario=None, dtype=np.float64):
+    """
+    Valúa la acción por descuento de dividendos en una sola llamada de NumPy, con las
+    mismas convenciones que `dcf_vectorizado` (tasas en decimales, broadcasting, backend).
+
+    - Gordon: D (1 + g_perpetuo) / (r - g_perpetuo), con el dividendo creciendo a la tasa
+      perpetua desde el primer año.
+    - Multietapa: el dividendo por acción recorre las mismas etapas que el flujo del DCF
+      (crecimiento alto, transición y perpetuidad), así que se calcula con el kernel del DCF
+      sobre una sola acción.
+
+    A diferencia del DCF, sin r > g_perpetuo el valor no está definido y el precio es 0.0.
+    `calendario` (parámetros de `parametros_calendario`) fecha los dividendos del multietapa.
+    """
+    multietapa = dcf_vectorizado(
+        dividendo_anual, tasa_descuento, tasa_crecimiento, tasa_crecimiento_perpetuo, años_proyeccion,
+        1.0, años_transicion=años_transicion, dtype=dtype,
+    )
+    if calendario is not None and not calendario_por_defecto(calendario):
+        multietapa = ajustar_a_calendario(
+            multietapa, np.asarray(dividendo_anual) * (1 + np.asarray(tasa_crecimiento)), np.asarray(tasa_descuento, dtype=dtype), 1.0, *calendario
+        )
+    dividendo_anual, tasa_descuento, g_perpetuo = np.broadcast_arrays(
+        *(np.asarray(x, dtype=dtype) for x in (dividendo_anual, tasa_descuento, tasa_crecimiento_perpetuo)),
+        multietapa.precio_dcf,
+    )[:3]
+    descuento_definido = tasa_descuento > g_perpetuo
+    valido_gordon = (dividendo_anual > 0) & (tasa_descuento > 0) & descuento_definido
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precio_gordon = dividendo_anual * (1 + g_perpetuo) / (tasa_descuento - g_perpetuo)
+    valido_multietapa = multietapa.valido_dcf & descuento_definido
+    return ResultadoDDMVectorizado(
+        valido_gordon=valido_gordon,
+        precio_gordon=np.where(valido_gordon, precio_gordon, 0.0),
+        valido_multietapa=valido_multietapa,
+        precio_multietapa=np.where(valido_multietapa, multietapa.precio_dcf, 0.0),
+    )
+
+def valuar_ddm_escenarios(data, factores_crecimiento, factores_wacc):
+    """
+    DDM de Gordon y multietapa para escenarios definidos por factores sobre el crecimiento
+    y la tasa de descuento (el WACC de `data`), en una sola llamada al kernel.
+    """
+    return ddm_vectorizado(
+        dividendo_anual=data['dividendos_anuales'],
+        tasa_descuento=(data['wacc'] / 100) * np.asarray(factores_wacc, dtype=np.float64),
+        tasa_crecimiento=(data['tasa_crecimiento_esperada'] / 100) * np.asarray(factores_crecimiento, dtype=np.float64),
+        tasa_crecimiento_perpetuo=data['tasa_crecimiento_perpetuo'] / 100,
+        años_proyeccion=data['años_proyeccion_dcf'],
+        años_transicion=data['años_transicion_dcf'],
+        calendario=parametros_calendario(data),
+    )
+
+def grilla_sensibilidad_ddm(data, waccs, tasas_crecimiento):
+    """DDM multietapa sobre la grilla WACC × crecimiento de `grilla_sensibilidad` (tasas en porcentaje)."""
+    return ddm_vectorizado(
+        dividendo_anual=data['dividendos_anuales'],
+        tasa_descuento=np.asarray(waccs, dtype=np.float64)[:, np.newaxis] / 100,
+        tasa_crecimiento=np.asarray(tasas_crecimiento, dtype=np.float64)[np.newaxis, :] / 100,
+        tasa_crecimiento_perpetuo=data['tasa_crecimiento_perpetuo'] / 100,
+        años_proyeccion=data['años_proyeccion_dcf'],
+        años_transicion=data['años_transicion_dcf'],
+        calendario=parametros_calendario(data),
+    ).precio_multietapa
+
+# ===================== ESCENARIOS DEFINIDOS POR EL USUARIO =====================
+
+def tabla_escenarios_predeterminada(data, escenarios=ESCENARIOS_PREDETERMINADOS, probabilidades=PROBABILIDADES_PREDETERMINADAS):
+    """
+    Tabla de escenarios (columna -> lista) equivalente a los escenarios por factores: el
+    crecimiento y el WACC de cada escenario son los de `data` multiplicados por sus factores.
+    """
+    return {
+        'nombre': [nombre for nombre, _, _ in escenarios],
+        'tasa_crecimiento_esperada': [data['tasa_crecimiento_esperada'] * fc for _, fc, _ in escenarios],
+        'wacc': [data['wacc'] * fw for _, _, fw in escenarios],
+        'tasa_crecimiento_perpetuo': [data['tasa_crecimiento_perpetuo']] * len(escenarios),
+        'per_esperado': [data['per_esperado']] * len(escenarios),
+        'probabilidad': list(probabilidades),
+    }
+
+def valuar_tabla_escenarios(data, tabla):
+    """
+    Valúa todos los escenarios de `tabla` (columna -> secuencia, ver COLUMNAS_TABLA_ESCENARIOS)
+    en una sola llamada al kernel, por lo que 50 escenarios cuestan casi lo mismo que 3.
+    El resto de los inputs (flujo inicial, acciones, horizonte) se toma de `data`; los
+    escenarios llamados como los predeterminados usan su revenue (`CAMPOS_REVENUE_ESCENARIO`).
+
+    Las probabilidades se normalizan entre los escenarios con precio válido de cada método;
+    si ninguna es positiva, los escenarios válidos pesan lo mismo.
+    """
+    def columna(nombre):
+        return np.nan_to_num(np.asarray(tabla[nombre], dtype=np.float64), nan=0.0)
+
+    nombres = tuple(n.strip() if isinstance(n, str) and n.strip() else f"Escenario {i + 1}" for i, n in enumerate(tabla['nombre']))
+    revenue_escenarios = [data.get(CAMPOS_REVENUE_ESCENARIO.get(nombre, 'revenue_base'), 0.0) for nombre in nombres]
+    fcf_inicial, per_terminal = flujo_inicial_y_per(
+        data['net_income_estimado'], columna('per_esperado'), data['tasa_reinversion'], revenue_escenarios, data['revenue_base']
+    )
+    resultado = dcf_vectorizado(
+        fcf_inicial=fcf_inicial,
+        wacc=columna('wacc') / 100,
+        tasa_crecimiento=columna('tasa_crecimiento_esperada') / 100,
+        tasa_crecimiento_perpetuo=columna('tasa_crecimiento_perpetuo') / 100,
+        años_proyeccion=data['años_proyeccion_dcf'],
+        acciones_circulacion=data['acciones_circulacion'],
+        per_terminal=per_terminal,
+        años_transicion=data['años_transicion_dcf'],
+    )
+    calendario = parametros_calendario(data)
+    if not calendario_por_defecto(calendario):
+        resultado = ajustar_a_calendario(
+            resultado, fcf_inicial * (1 + columna('tasa_crecimiento_esperada') / 100), columna('wacc') / 100,
+            data['acciones_circulacion'], *calendario
+        )
+    probabilidades = np.maximum(columna('probabilidad'), 0.0)
+
+    def ponderado(precios):
+        validos = precios > 0
+        pesos = np.where(validos, probabilidades, 0.0)
+        if pesos.sum() <= 0:
+            pesos = validos.astype(np.float64)
+        return float(pesos @ precios / pesos.sum()) if pesos.sum() > 0 else 0.0
+
+    total = probabilidades.sum()
+    return ResultadoTablaEscenarios(
+        nombres_escenarios=nombres,
+        probabilidades=probabilidades / total if total > 0 else np.full(len(nombres), 1.0 / max(len(nombres), 1)),
+        precio_dcf=resultado.precio_dcf,
+        precio_multiplo_terminal=resultado.precio_multiplo_terminal,
+        precio_dcf_ponderado=ponderado(resultado.precio_dcf),
+        precio_multiplo_terminal_ponderado=ponderado(resultado.precio_multiplo_terminal),
+    )
+
+# ===================== PRECIO JUSTO FINAL =====================
+
+def calcular_precio_justo(precio_dcf_base, precio_multiplo_terminal_base, precio_multiplos, precio_ddm_base=0.0):
+    """
+    Promedio simple de los métodos principales con resultado positivo
+    (DCF Base, Múltiplo Terminal Base, promedio por Múltiplos y, si se pasa, DDM Base).
+    Retorna 0.0 si ninguno es válido.
+    """
+    precios_para_promedio = [p for p in [precio_dcf_base, precio_multiplo_terminal_base, precio_multiplos, precio_ddm_base] if p > 0]
+    if precios_para_promedio:
+        return float(np.mean(precios_para_promedio))
+    return 0.0
+
+def calcular_precio_maximo(precio_justo_final, margen_seguridad_deseado):
+    """Aplica el margen de seguridad (en porcentaje) al precio justo final."""
+    return precio_justo_final * (1 - margen_seguridad_deseado / 100)
+
+def objetivos_multiplos(eps_proyectado, per_esperado, revenue_base, ps_esperado, equity_proyectado,
+                        pb_esperado, acciones_circulacion):
+    """
+    Precios objetivo P/E, P/S y P/B y su promedio sobre los positivos, elemento a elemento.
+    Mismas reglas que `valuar_multiplos`: un método sin datos válidos vale 0.0.
+    """
+    eps_proyectado, per_esperado, revenue_base, ps_esperado, equity_proyectado, pb_esperado, acciones = np.broadcast_arrays(
+        eps_proyectado, per_esperado, revenue_base, ps_esperado, equity_proyectado, pb_esperado, acciones_circulacion
+    )
+    if _usar_numba(eps_proyectado.size):
+        import motor_acelerado
+        return motor_acelerado.multiplos_numba(eps_proyectado, per_esperado, revenue_base, ps_esperado, equity_proyectado, pb_esperado, acciones)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precio_objetivo_pe = np.where((eps_proyectado > 0) & (per_esperado > 0), eps_proyectado * per_esperado, 0.0)
+        precio_objetivo_ps = np.where((acciones > 0) & (revenue_base > 0) & (ps_esperado > 0), revenue_base / acciones * ps_esperado, 0.0)
+        precio_objetivo_pb = np.where((equity_proyectado > 0) & (acciones > 0) & (pb_esperado > 0), equity_proyectado / acciones * pb_esperado, 0.0)
+    return precio_objetivo_pe, precio_objetivo_ps, precio_objetivo_pb, promedio_positivos(precio_objetivo_pe, precio_objetivo_ps, precio_objetivo_pb)
+
+def promedio_positivos(*precios):
+    """Promedio elemento a elemento de los precios positivos; 0.0 donde ninguno lo es."""
+    precios = np.stack(np.broadcast_arrays(*precios))
+    validos = precios > 0
+    cantidad = validos.sum(axis=0)
+    suma = np.where(validos, precios, 0.0).sum(axis=0)
+    return np.divide(suma, cantidad, out=np.zeros_like(suma), where=cantidad > 0).astype(precios.dtype, copy=False)
+
+def valuar_lote(columnas, escenarios=ESCENARIOS_PREDETERMINADOS, dtype=np.float64):
+    """
+    Versión vectorizada de `valuar_empresa` para muchas filas a la vez.
+    `columnas` mapea cada nombre de input de `datos_iniciales()` a un escalar o a un arreglo
+    de una dimensión (una fila por empresa o perturbación); los escalares se repiten en todas
+    las filas. Calcula múltiplos, DCF, Múltiplo Terminal y DDM para todos los escenarios, la
+    mezcla de precio justo final de la sección 4 (con el DDM Base en las filas que lo incluyen)
+    y el precio máximo a pagar, sin bucles por fila.
+    `dtype` controla la precisión de todo el cálculo (float64 por defecto).
+    """
+    def col(nombre):
+        return np.asarray(columnas[nombre], dtype=dtype)
+
+    precio_objetivo_pe, precio_objetivo_ps, precio_objetivo_pb, precio_obj_multiplos = objetivos_multiplos(
+        col('eps_proyectado'), col('per_esperado'), col('revenue_base'), col('ps_esperado'),
+        col('equity_proyectado'), col('pb_esperado'), col('acciones_circulacion'),
+    )
+
+    # Filas en el eje 0 y escenarios en el eje 1: una sola llamada al kernel para todo el lote.
+    nombres_escenarios = tuple(nombre for nombre, _, _ in escenarios)
+    factores_crecimiento = np.array([fc for _, fc, _ in escenarios], dtype=dtype)
+    factores_wacc = np.array([fw for _, _, fw in escenarios], dtype=dtype)
+    def por_fila(nombre):
+        return np.atleast_1d(col(nombre))[:, np.newaxis]
+
+    # Revenue de cada escenario en columnas: el flujo inicial equivale al de `proyectar_flujos`.
+    revenue_escenarios = np.stack(np.broadcast_arrays(
+        *(np.atleast_1d(col(CAMPOS_REVENUE_ESCENARIO.get(nombre, 'revenue_base'))) for nombre in nombres_escenarios)
+    ), axis=-1)
+    fcf_inicial, per_terminal = flujo_inicial_y_per(
+        por_fila('net_income_estimado'), por_fila('per_esperado'), por_fila('tasa_reinversion'), revenue_escenarios, por_fila('revenue_base')
+    )
+    wacc_escenarios = por_fila('wacc') / 100 * factores_wacc
+    crecimiento_escenarios = por_fila('tasa_crecimiento_esperada') / 100 * factores_crecimiento
+    resultado_escenarios = dcf_vectorizado(
+        fcf_inicial=fcf_inicial,
+        wacc=wacc_escenarios,
+        tasa_crecimiento=crecimiento_escenarios,
+        tasa_crecimiento_perpetuo=por_fila('tasa_crecimiento_perpetuo') / 100,
+        años_proyeccion=por_fila('años_proyeccion_dcf'),
+        acciones_circulacion=por_fila('acciones_circulacion'),
+        per_terminal=per_terminal,
+        años_transicion=por_fila('años_transicion_dcf'),
+        dtype=dtype,
+    )
+    # Descuento por fechas: los parámetros salen de un cálculo por calendario único del lote.
+    calendario = tuple(np.atleast_1d(p)[:, np.newaxis] for p in parametros_calendario(columnas))
+    if not calendario_por_defecto(calendario):
+        resultado_escenarios = ajustar_a_calendario(
+            resultado_escenarios, fcf_inicial * (1 + crecimiento_escenarios), wacc_escenarios, por_fila('acciones_circulacion'), *calendario
+        )
+    resultado_ddm = ddm_vectorizado(
+        dividendo_anual=por_fila('dividendos_anuales'),
+        tasa_descuento=wacc_escenarios,
+        tasa_crecimiento=crecimiento_escenarios,
+        tasa_crecimiento_perpetuo=por_fila('tasa_crecimiento_perpetuo') / 100,
+        años_proyeccion=por_fila('años_proyeccion_dcf'),
+        años_transicion=por_fila('años_transicion_dcf'),
+        calendario=calendario,
+        dtype=dtype,
+    )
+    n_filas = np.broadcast_shapes(*(np.shape(v) for v in columnas.values()), (1,))[0] if columnas else 1
+    forma_escenarios = (n_filas, len(escenarios))
+    precio_dcf = np.broadcast_to(resultado_escenarios.precio_dcf, forma_escenarios)
+    precio_multiplo_terminal = np.broadcast_to(resultado_escenarios.precio_multiplo_terminal, forma_escenarios)
+    precio_ddm = np.broadcast_to(resultado_ddm.precio_multietapa, forma_escenarios)
+
+    if 'Base' in nombres_escenarios:
+        indice_base = nombres_escenarios.index('Base')
+        precio_dcf_base, precio_multiplo_terminal_base = precio_dcf[:, indice_base], precio_multiplo_terminal[:, indice_base]
+        precio_ddm_base = np.where(np.asarray(columnas.get('incluir_ddm_precio_justo', False), dtype=bool), precio_ddm[:, indice_base], 0.0)
+    else:
+        precio_dcf_base = precio_multiplo_terminal_base = precio_ddm_base = np.zeros(n_filas, dtype=dtype)
+    precio_justo_final = promedio_positivos(precio_dcf_base, precio_multiplo_terminal_base, precio_obj_multiplos, precio_ddm_base)
+    precio_justo_final = np.broadcast_to(precio_justo_final, (n_filas,))
+
+    return ResultadoLote(
+        nombres_escenarios=nombres_escenarios,
+        precio_objetivo_pe=np.broadcast_to(precio_objetivo_pe, (n_filas,)),
+        precio_objetivo_ps=np.broadcast_to(precio_objetivo_ps, (n_filas,)),
+        precio_objetivo_pb=np.broadcast_to(precio_objetivo_pb, (n_filas,)),
+        precio_obj_multiplos=np.broadcast_to(precio_obj_multiplos, (n_filas,)),
+        precio_dcf=precio_dcf,
+        precio_multiplo_terminal=precio_multiplo_terminal,
+        precio_ddm_gordon=np.broadcast_to(resultado_ddm.precio_gordon, forma_escenarios),
+        precio_ddm=precio_ddm,
+        precio_justo_final=precio_justo_final,
+        precio_maximo_a_pagar=calcular_precio_maximo(precio_justo_final, col('margen_seguridad_deseado')),
+    )
+
+# ===================== ANÁLISIS DE SENSIBILIDAD (TORNADO) =====================
+
+def analisis_tornado(data, variacion_porcentual=10.0, campos=None):
+    """
+    Mide cuánto cambia el precio justo final al mover cada input hacia abajo y hacia arriba
+    en `variacion_porcentual` por ciento. Las 2×N perturbaciones (más el caso base) se
+    evalúan juntas como un solo lote de `valuar_lote`.
+    """
+    if campos is None:
+        campos = [
+            c for c, v in data.items()
+            if isinstance(v, (int, float)) and not isinstance(v, bool) and c not in CAMPOS_CALENDARIO
+        ]
+    n = len(campos)
+    variacion = variacion_porcentual / 100
+
+    # Fila 0: caso base; filas 2i+1 y 2i+2: campo i hacia abajo y hacia arriba.
+    # Las opciones booleanas (p. ej. incluir el DDM) y el calendario se mantienen fijos en todas las filas.
+    columnas = {}
+    for nombre, valor in data.items():
+        if nombre in CAMPOS_CALENDARIO:
+            columnas[nombre] = valor
+        elif isinstance(valor, (int, float)):
+            columnas[nombre] = np.full(2 * n + 1, float(valor))
+    for i, campo in enumerate(campos):
+        columnas[campo][2 * i + 1] *= (1 - variacion)
+        columnas[campo][2 * i + 2] *= (1 + variacion)
+
+    precios = valuar_lote(columnas).precio_justo_final
+    precios_bajos, precios_altos = precios[1::2], precios[2::2]
+    impacto = np.abs(precios_altos - precios_bajos)
+    orden = np.argsort(-impacto, kind='stable')
+
+    valores_base = np.array([float(data[c]) for c in campos])
+    return ResultadoTornado(
+        campos=[campos[i] for i in orden],
+        valores_base=valores_base[orden],
+        valores_bajos=valores_base[orden] * (1 - variacion),
+        valores_altos=valores_base[orden] * (1 + variacion),
+        precio_base=float(precios[0]),
+        precios_bajos=precios_bajos[orden],
+        precios_altos=precios_altos[orden],
+        impacto=impacto[orden],
+    )
+
+def valuar_empresa(data, escenarios=ESCENARIOS_PREDETERMINADOS):
+    """
+    Ejecuta la valuación completa de una empresa sin interfaz: múltiplos,
+    DCF y múltiplo terminal por escenario, precio justo final y precio máximo a pagar.
+    """
+    nombres_escenarios = tuple(nombre for nombre, _, _ in escenarios)
+    resultado_escenarios = valuar_escenarios(
+        data,
+        factores_crecimiento=[fc for _, fc, _ in escenarios],
+        factores_wacc=[fw for _, _, fw in escenarios],
+        nombres_escenarios=nombres_escenarios,
+    )
+    multiplos = valuar_multiplos(data)
+
+    resultado = ResultadoValuacion(
+        multiplos_calculados=calcular_multiplos(data),
+        multiplos=multiplos,
+        nombres_escenarios=nombres_escenarios,
+        escenarios=resultado_escenarios,
+        escenarios_ddm=valuar_ddm_escenarios(
+            data,
+            factores_crecimiento=[fc for _, fc, _ in escenarios],
+            factores_wacc=[fw for _, _, fw in escenarios],
+        ),
+    )
+    incluir_ddm = data['incluir_ddm_precio_justo'] and 'Base' in nombres_escenarios
+    resultado.precio_justo_final = calcular_precio_justo(
+        resultado.precio_dcf('Base') if 'Base' in nombres_escenarios else 0.0,
+        resultado.precio_multiplo_terminal('Base') if 'Base' in nombres_escenarios else 0.0,
+        multiplos.precio_promedio,
+        resultado.precio_ddm('Base') if incluir_ddm else 0.0,
+    )
+    resultado.precio_maximo_a_pagar = calcular_precio_maximo(resultado.precio_justo_final, data['margen_seguridad_deseado'])
+    return resultado
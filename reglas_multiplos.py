@@ -0,0 +1,161 @@
+"""
+Reglas de interpretación de los múltiplos proyectados.
+
+Las comparaciones de "Interpretación de Múltiplos" (P/E, P/S y P/B proyectados contra el
+esperado, ±10%) y de "Análisis de Tendencia" (contra el promedio de los tres años históricos,
+±20%) están declaradas en la tabla REGLAS. Cada regla se evalúa como comparaciones de columnas
+enteras sobre todas las empresas de un lote y produce una bandera categórica por empresa; los
+mensajes se arman solo para las filas que se muestran.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# Banderas de cada regla (códigos int8) y su nombre en las tablas.
+SIN_DATOS = 0
+POR_DEBAJO = 1
+EN_LINEA = 2
+POR_ENCIMA = 3
+CATEGORIAS = ("Sin datos", "Por debajo", "En línea", "Por encima")
+
+# Tipos de regla: contra el múltiplo esperado o contra el promedio histórico.
+TIPO_ESPERADO = 'esperado'
+TIPO_TENDENCIA = 'tendencia'
+
+@dataclass(slots=True, frozen=True)
+class Regla:
+    """
+    Una fila de la tabla de reglas: el múltiplo proyectado `multiplo` se compara con el
+    promedio de las columnas `referencia` y queda por debajo si es menor que
+    promedio × (1 - tolerancia), por encima si es mayor que promedio × (1 + tolerancia) y en
+    línea en el resto. Sin datos si alguna referencia no es positiva o, con
+    `exige_proyectado`, si el múltiplo proyectado no lo es.
+    """
+    nombre: str
+    tipo: str
+    multiplo: str
+    etiqueta: str
+    referencia: tuple
+    tolerancia: float
+    exige_proyectado: bool
+    mensaje_sin_datos: str
+    sufijos: tuple = ("", "", "") # Texto agregado al mensaje por debajo / en línea / por encima.
+
+REGLAS = (
+    Regla('per_vs_esperado', TIPO_ESPERADO, 'pe_proyectado', "PER", ('per_esperado',), 0.10, True,
+          "No se puede interpretar el PER proyectado debido a datos insuficientes (EPS proyectado o PER esperado es cero)."),
+    Regla('ps_vs_esperado', TIPO_ESPERADO, 'ps_proyectado', "P/S", ('ps_esperado',), 0.10, True,
+          "No se puede interpretar el P/S proyectado debido a datos insuficientes (Revenue por acción proyectado o P/S esperado es cero)."),
+    Regla('pb_vs_esperado', TIPO_ESPERADO, 'pb_proyectado', "P/B", ('pb_esperado',), 0.10, True,
+          "No se puede interpretar el P/B proyectado debido a datos insuficientes (Book Value por acción proyectado o P/B esperado es cero)."),
+    Regla('per_tendencia', TIPO_TENDENCIA, 'pe_proyectado', "PER", ('per_historico_1', 'per_historico_2', 'per_historico_3'), 0.20, False,
+          "No hay suficientes datos históricos de PER para un análisis de tendencia.",
+          (" Esto podría indicar una subvaluación o que el mercado tiene bajas expectativas.",
+           ", lo que sugiere una valuación consistente",
+           " Esto podría indicar una sobrevaluación o altas expectativas de crecimiento.")),
+    Regla('ps_tendencia', TIPO_TENDENCIA, 'ps_proyectado', "P/S", ('ps_historico_1', 'ps_historico_2', 'ps_historico_3'), 0.20, False,
+          "No hay suficientes datos históricos de P/S para un análisis de tendencia."),
+    Regla('pb_tendencia', TIPO_TENDENCIA, 'pb_proyectado', "P/B", ('pb_historico_1', 'pb_historico_2', 'pb_historico_3'), 0.20, False,
+          "No hay suficientes datos históricos de P/B para un análisis de tendencia."),
+)
+
+# Plantillas de los mensajes por tipo de regla y bandera.
+PLANTILLAS = {
+    TIPO_ESPERADO: {
+        POR_DEBAJO: "El {etiqueta} proyectado ({proyectado:,.2f}x) es significativamente menor que el {etiqueta} esperado ({referencia:,.2f}x), lo que sugiere que la acción podría estar **subvaluada** por {etiqueta}.{sufijo}",
+        EN_LINEA: "El {etiqueta} proyectado ({proyectado:,.2f}x) está en línea con el {etiqueta} esperado ({referencia:,.2f}x), indicando una valuación **neutral** por {etiqueta}.{sufijo}",
+        POR_ENCIMA: "El {etiqueta} proyectado ({proyectado:,.2f}x) es significativamente mayor que el {etiqueta} esperado ({referencia:,.2f}x), lo que sugiere que la acción podría estar **sobrevaluada** por {etiqueta}.{sufijo}",
+    },
+    TIPO_TENDENCIA: {
+        POR_DEBAJO: "El {etiqueta} proyectado ({proyectado:,.2f}x) está significativamente por debajo del promedio histórico ({referencia:,.2f}x).{sufijo}",
+        EN_LINEA: "El {etiqueta} proyectado ({proyectado:,.2f}x) está en línea con el promedio histórico ({referencia:,.2f}x){sufijo}.",
+        POR_ENCIMA: "El {etiqueta} proyectado ({proyectado:,.2f}x) está significativamente por encima del promedio histórico ({referencia:,.2f}x).{sufijo}",
+    },
+}
+
+# Nivel de alerta con que se muestra cada bandera ('info', 'success' o 'warning').
+NIVELES = {
+    TIPO_ESPERADO: {SIN_DATOS: 'info', POR_DEBAJO: 'info', EN_LINEA: 'info', POR_ENCIMA: 'info'},
+    TIPO_TENDENCIA: {SIN_DATOS: 'info', POR_DEBAJO: 'info', EN_LINEA: 'success', POR_ENCIMA: 'warning'},
+}
+
+# ===================== EVALUACIÓN VECTORIZADA =====================
+
+@dataclass(slots=True)
+class ResultadoReglas:
+    """Por cada regla: la bandera (int8), el múltiplo proyectado y la referencia de cada fila."""
+    reglas: tuple
+    banderas: dict
+    proyectados: dict
+    referencias: dict
+
+def multiplos_proyectados(columnas):
+    """
+    Versión vectorizada de los múltiplos proyectados de `calcular_multiplos`: P/E con el EPS
+    proyectado, P/S con el revenue base y P/B con el equity proyectado por acción (0.0 donde
+    el denominador no es positivo).
+    """
+    col = lambda nombre: np.asarray(columnas[nombre], dtype=np.float64)
+    precio, acciones = col('precio_actual'), col('acciones_circulacion')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        revenue_por_accion = np.where(acciones > 0, col('revenue_base') / acciones, 0.0)
+        book_value_por_accion = np.where(acciones > 0, col('equity_proyectado') / acciones, 0.0)
+        por_accion = {'pe_proyectado': col('eps_proyectado'), 'ps_proyectado': revenue_por_accion, 'pb_proyectado': book_value_por_accion}
+        return {nombre: np.where(base > 0, precio / base, 0.0) for nombre, base in por_accion.items()}
+
+def evaluar_reglas(columnas, reglas=REGLAS):
+    """
+    Evalúa la tabla de reglas sobre las columnas de un lote (escalares o arreglos de una fila
+    por empresa, como las de `valuar_lote`) con comparaciones de columnas enteras.
+    """
+    proyectados_lote = multiplos_proyectados(columnas)
+    banderas, proyectados, referencias = {}, {}, {}
+    for regla in reglas:
+        proyectado = proyectados_lote[regla.multiplo]
+        valores_referencia = [np.asarray(columnas[c], dtype=np.float64) for c in regla.referencia]
+        referencia = sum(valores_referencia[1:], valores_referencia[0]) / len(valores_referencia)
+        valido = np.logical_and.reduce([v > 0 for v in valores_referencia])
+        if regla.exige_proyectado:
+            valido = valido & (proyectado > 0)
+        proyectado, referencia, valido = np.broadcast_arrays(proyectado, referencia, valido)
+        banderas[regla.nombre] = np.select(
+            [~valido, proyectado < referencia * (1 - regla.tolerancia), proyectado > referencia * (1 + regla.tolerancia)],
+            [SIN_DATOS, POR_DEBAJO, POR_ENCIMA],
+            default=EN_LINEA,
+        ).astype(np.int8)
+        proyectados[regla.nombre] = proyectado
+        referencias[regla.nombre] = referencia
+    return ResultadoReglas(tuple(reglas), banderas, proyectados, referencias)
+
+def tabla_banderas(resultado):
+    """DataFrame con una columna categórica por regla (sin armar ningún texto)."""
+    return pd.DataFrame({
+        nombre: pd.Categorical.from_codes(np.atleast_1d(codigos), categories=list(CATEGORIAS))
+        for nombre, codigos in resultado.banderas.items()
+    })
+
+# ===================== MENSAJES =====================
+
+def mensaje(regla, bandera, proyectado, referencia):
+    """Texto de una regla para una sola fila."""
+    bandera = int(bandera)
+    if bandera == SIN_DATOS:
+        return regla.mensaje_sin_datos
+    return PLANTILLAS[regla.tipo][bandera].format(
+        etiqueta=regla.etiqueta, proyectado=float(proyectado), referencia=float(referencia), sufijo=regla.sufijos[bandera - 1]
+    )
+
+def mensajes_fila(resultado, fila=0, tipo=None):
+    """
+    Lista de (nivel, texto) de las reglas de una fila, opcionalmente solo las de un `tipo`.
+    Solo se formatean los textos de esa fila.
+    """
+    mensajes = []
+    for regla in resultado.reglas:
+        if tipo is not None and regla.tipo != tipo:
+            continue
+        bandera = np.atleast_1d(resultado.banderas[regla.nombre])[fila]
+        texto = mensaje(regla, bandera, np.atleast_1d(resultado.proyectados[regla.nombre])[fila], np.atleast_1d(resultado.referencias[regla.nombre])[fila])
+        mensajes.append((NIVELES[regla.tipo][int(bandera)], texto))
+    return mensajes
@@ -0,0 +1,226 @@
+"""
+Screener sobre los resultados de un universo valuado.
+
+Consultas como "margen de seguridad > 30%", "P/E proyectado menor que el P/E esperado" o "DCF
+pesimista mayor que el precio actual", ordenadas por potencial. Para que cada cambio de umbral
+responda en milisegundos aun con un millón de filas:
+
+- cada columna numérica tiene un índice ordenado (se arma una vez, la primera vez que se usa):
+  contar cuántas filas cumplen un umbral es una búsqueda binaria y, si son pocas, la máscara se
+  arma marcando solo esas posiciones;
+- las condiciones que no dependen de un umbral (una columna contra otra, una clasificación) se
+  guardan como máscaras booleanas y se reutilizan;
+- el top-K usa `np.argpartition` sobre las filas que pasan el filtro y ordena solo esas K.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from universo import COLUMNA_TICKER
+
+# Operadores de comparación admitidos en las condiciones.
+OPERADORES = ('>', '>=', '<', '<=', '==', '!=')
+
+# Columnas que el screener agrega a los resultados a partir de los inputs.
+COLUMNAS_DERIVADAS = ('potencial', 'per_proyectado', 'per_esperado')
+
+# Con una fracción de filas seleccionadas por debajo de esta, la máscara de un umbral se arma
+# desde el índice ordenado; por encima, comparar toda la columna es más rápido.
+FRACCION_DISPERSA = 0.05
+
+# Filas por defecto del top-K.
+K_PREDETERMINADO = 50
+
+# Columnas que el screener muestra por defecto.
+COLUMNAS_VISTA = (
+    COLUMNA_TICKER, 'precio_actual', 'precio_justo_final', 'precio_maximo_a_pagar', 'margen_seguridad', 'potencial',
+    'per_proyectado', 'per_esperado', 'precio_obj_dcf_pesimista', 'valuacion',
+)
+
+@dataclass(slots=True, frozen=True)
+class Condicion:
+    """
+    Filtro `columna operador valor`. `valor` es un número, un texto (para columnas como la
+    clasificación) o, con `contra_columna=True`, el nombre de otra columna.
+    """
+    columna: str
+    operador: str
+    valor: object
+    contra_columna: bool = False
+
+    def __post_init__(self):
+        if self.operador not in OPERADORES:
+            raise ValueError(f"Operador '{self.operador}' no admitido; usa uno de {', '.join(OPERADORES)}.")
+
+def _comparar(izquierda, operador, derecha):
+    if operador == '>':
+        return izquierda > derecha
+    if operador == '>=':
+        return izquierda >= derecha
+    if operador == '<':
+        return izquierda < derecha
+    if operador == '<=':
+        return izquierda <= derecha
+    if operador == '==':
+        return izquierda == derecha
+    return izquierda != derecha
+
+def columnas_screener(resultados, tabla_entrada=None):
+    """
+    Resultados de `universo.valuar_universo` más las columnas derivadas: potencial (precio
+    justo / precio actual - 1, en %) y, si se pasan los inputs, el P/E proyectado (precio /
+    EPS proyectado) y el P/E esperado. Los valores sin sentido (sin precio justo, EPS no
+    positivo) quedan en NaN para que no cumplan ningún filtro.
+    """
+    tabla = resultados.copy()
+    precio_actual = tabla['precio_actual'].to_numpy(dtype=np.float64)
+    precio_justo = tabla['precio_justo_final'].to_numpy(dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tabla['potencial'] = np.where((precio_justo > 0) & (precio_actual > 0), (precio_justo / precio_actual - 1) * 100, np.nan)
+        if tabla_entrada is not None:
+            eps = pd.to_numeric(tabla_entrada.get('eps_proyectado', pd.Series(np.nan, index=tabla_entrada.index)), errors='coerce').to_numpy(dtype=np.float64)
+            tabla['per_proyectado'] = np.where(eps > 0, precio_actual / eps, np.nan)
+            per_esperado = pd.to_numeric(tabla_entrada.get('per_esperado', pd.Series(np.nan, index=tabla_entrada.index)), errors='coerce').to_numpy(dtype=np.float64)
+            tabla['per_esperado'] = np.where(per_esperado > 0, per_esperado, np.nan)
+    return tabla
+
+class Screener:
+    """
+    Índices de una tabla de resultados para filtrar y rankear rápido. Las columnas numéricas se
+    guardan como arreglos float64 contiguos; los índices ordenados y las máscaras se arman a
+    demanda y quedan guardados mientras viva el screener.
+    """
+    __slots__ = ('tabla', 'n_filas', '_numericas', '_categoricas', '_indices', '_mascaras')
+
+    def __init__(self, tabla, columnas_indexadas=()):
+        self.tabla = tabla.reset_index(drop=True)
+        self.n_filas = len(self.tabla)
+        self._numericas = {
+            c: np.ascontiguousarray(self.tabla[c].to_numpy(dtype=np.float64))
+            for c in self.tabla.columns if pd.api.types.is_numeric_dtype(self.tabla[c]) and not pd.api.types.is_bool_dtype(self.tabla[c])
+        }
+        self._categoricas = {c: self.tabla[c] for c in self.tabla.columns if c not in self._numericas}
+        self._indices = {}
+        self._mascaras = {}
+        for columna in columnas_indexadas:
+            self.indice(columna)
+
+    @property
+    def columnas_numericas(self):
+        """Columnas sobre las que se puede filtrar por umbral y ordenar."""
+        return tuple(self._numericas)
+
+    def columna(self, nombre):
+        """Arreglo float64 de una columna numérica."""
+        try:
+            return self._numericas[nombre]
+        except KeyError:
+            raise ValueError(f"La columna '{nombre}' no es numérica o no existe en los resultados.") from None
+
+    def indice(self, nombre):
+        """
+        Índice ordenado de una columna: (posiciones de menor a mayor valor, valores ordenados),
+        sin los NaN, que nunca cumplen un umbral.
+        """
+        if nombre not in self._indices:
+            valores = self.columna(nombre)
+            orden = np.argsort(valores, kind='stable')
+            n_validos = self.n_filas - int(np.isnan(valores).sum())
+            orden = orden[:n_validos] # argsort deja los NaN al final.
+            self._indices[nombre] = (orden, valores[orden])
+        return self._indices[nombre]
+
+    def _posiciones_umbral(self, nombre, operador, valor):
+        """Posiciones que cumplen `columna operador valor` según el índice ordenado (sin '==' ni '!=')."""
+        orden, ordenados = self.indice(nombre)
+        if operador == '>':
+            return orden[np.searchsorted(ordenados, valor, side='right'):]
+        if operador == '>=':
+            return orden[np.searchsorted(ordenados, valor, side='left'):]
+        if operador == '<':
+            return orden[:np.searchsorted(ordenados, valor, side='left')]
+        return orden[:np.searchsorted(ordenados, valor, side='right')]
+
+    def contar(self, condicion):
+        """Cantidad de filas que cumplen una condición (por umbral: búsqueda binaria en el índice)."""
+        if condicion.contra_columna or condicion.operador in ('==', '!=') or condicion.columna not in self._numericas:
+            return int(self.mascara(condicion).sum())
+        return len(self._posiciones_umbral(condicion.columna, condicion.operador, float(condicion.valor)))
+
+    def mascara(self, condicion):
+        """Máscara booleana (una posición por fila) de las filas que cumplen `condicion`."""
+        if condicion.contra_columna or condicion.columna not in self._numericas:
+            clave = (condicion.columna, condicion.operador, condicion.valor, condicion.contra_columna)
+            if clave not in self._mascaras:
+                if condicion.contra_columna:
+                    derecha = self.columna(condicion.valor)
+                else:
+                    derecha = condicion.valor
+                if condicion.columna in self._numericas:
+                    izquierda = self.columna(condicion.columna)
+                elif condicion.columna in self._categoricas:
+                    izquierda = self._categoricas[condicion.columna].to_numpy()
+                else:
+                    raise ValueError(f"La columna '{condicion.columna}' no existe en los resultados.")
+                self._mascaras[clave] = np.asarray(_comparar(izquierda, condicion.operador, derecha), dtype=bool)
+            return self._mascaras[clave]
+
+        valor = float(condicion.valor)
+        if condicion.operador in ('==', '!='):
+            return _comparar(self.columna(condicion.columna), condicion.operador, valor)
+        posiciones = self._posiciones_umbral(condicion.columna, condicion.operador, valor)
+        if len(posiciones) > self.n_filas * FRACCION_DISPERSA:
+            return _comparar(self.columna(condicion.columna), condicion.operador, valor)
+        mascara = np.zeros(self.n_filas, dtype=bool)
+        mascara[posiciones] = True
+        return mascara
+
+    def filtrar(self, condiciones):
+        """Máscara de las filas que cumplen todas las condiciones (todas las filas si no hay ninguna)."""
+        mascara = np.ones(self.n_filas, dtype=bool)
+        for condicion in condiciones:
+            mascara &= self.mascara(condicion)
+        return mascara
+
+    def top_k(self, mascara, ordenar_por, k=K_PREDETERMINADO, descendente=True):
+        """
+        Posiciones de las `k` filas con mayor (o menor) `ordenar_por` entre las que marca
+        `mascara`, ya ordenadas. Usa `np.argpartition` y ordena solo las K elegidas; los NaN
+        quedan al final.
+        """
+        candidatos = np.flatnonzero(mascara)
+        valores = self.columna(ordenar_por)[candidatos]
+        claves = np.where(np.isnan(valores), np.inf, -valores if descendente else valores)
+        if k < len(candidatos):
+            elegidos = np.argpartition(claves, k - 1)[:k]
+        else:
+            elegidos = np.arange(len(candidatos))
+        return candidatos[elegidos[np.argsort(claves[elegidos], kind='stable')]]
+
+    def consultar(self, condiciones, ordenar_por, k=K_PREDETERMINADO, descendente=True, columnas=None):
+        """
+        Aplica los filtros y retorna (cantidad de filas que los cumplen, DataFrame de las K
+        mejores según `ordenar_por`). Solo se arma el DataFrame de esas K filas; su índice es
+        la posición de cada fila en los resultados.
+        """
+        mascara = self.filtrar(condiciones)
+        posiciones = self.top_k(mascara, ordenar_por, k, descendente)
+        tabla = self.tabla.iloc[posiciones] if columnas is None else self.tabla.iloc[posiciones][[c for c in columnas if c in self.tabla.columns]]
+        return int(mascara.sum()), tabla
+
+def screener_universo(resultados, tabla_entrada=None, cubo=None, escenario_cubo=None,
+                      columnas_indexadas=('margen_seguridad', 'potencial', 'precio_justo_final')):
+    """
+    Screener de los resultados de un universo, con las columnas derivadas de `columnas_screener`.
+    Con un cubo de resultados del mismo universo (`cubo_resultados`) se agregan los precios de
+    cada método en `escenario_cubo` como columnas `cubo_<método>`, leídos como cortes contiguos y
+    copiados, para que el screener no mantenga abierto el archivo del cubo.
+    """
+    tabla = columnas_screener(resultados, tabla_entrada)
+    if cubo is not None:
+        if len(cubo.tickers) != len(tabla):
+            raise ValueError(f"El cubo tiene {len(cubo.tickers):,} tickers y los resultados {len(tabla):,} filas.")
+        for metodo in cubo.metodos:
+            tabla[f'cubo_{metodo}'] = np.array(cubo.seccion(escenario_cubo, metodo))
+    return Screener(tabla, columnas_indexadas)
@@ -0,0 +1,605 @@
+"""
+Simulación Monte Carlo de la valuación.
+
+Muestrea los supuestos más inciertos (crecimiento, WACC, crecimiento perpetuo y múltiplo
+de salida) desde distribuciones elegidas por el usuario y valúa todas las simulaciones a la
+vez con el motor vectorizado de `motor_valuacion`, sin pasar por la interfaz de Streamlit.
+"""
+import sys
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from motor_valuacion import CAMPOS_CALENDARIO, datos_iniciales, valuar_lote
+
+# SciPy es opcional: si está instalado se usan sus secuencias de Sobol y su inversa normal
+# exacta; si no, se recurre a una secuencia de Halton y a una aproximación racional en NumPy.
+try:
+    from scipy.stats import qmc
+    from scipy.special import ndtri
+    SCIPY_DISPONIBLE = True
+except ImportError:
+    qmc = None
+    ndtri = None
+    SCIPY_DISPONIBLE = False
+
+# Inputs de `data_inputs` que pueden simularse (todos en las mismas unidades que la interfaz).
+VARIABLES_SIMULABLES = (
+    'tasa_crecimiento_esperada',
+    'wacc',
+    'tasa_crecimiento_perpetuo',
+    'per_esperado',
+    'dividendos_anuales',
+)
+
+TIPOS_DISTRIBUCION = ('fija', 'normal', 'triangular', 'uniforme')
+
+# La simulación valúa únicamente el escenario base; la incertidumbre la aportan las distribuciones.
+ESCENARIO_SIMULACION = (("Base", 1.0, 1.0),)
+
+PERCENTILES_REPORTADOS = (5, 10, 25, 50, 75, 90, 95)
+
+# Las muestras se sortean en tramos de este tamaño, cada uno con su semilla hija de
+# `SeedSequence(semilla)`: repartir una corrida en bloques que sean múltiplos del tramo (ver
+# `ejecucion_paralela.simular_en_paralelo`) no cambia ningún número sorteado.
+SIMULACIONES_POR_SEMILLA = 65_536
+
+
+@dataclass(slots=True)
+class Distribucion:
+    """
+    Distribución de un input simulado. Los parámetros dependen del tipo:
+    fija (valor,), normal (media, desviación), triangular (mínimo, moda, máximo)
+    y uniforme (mínimo, máximo).
+    """
+    tipo: str
+    parametros: tuple
+
+    def validar(self):
+        """Lanza ValueError si el tipo o los parámetros no son coherentes."""
+        cantidad_esperada = {'fija': 1, 'normal': 2, 'triangular': 3, 'uniforme': 2}
+        if self.tipo not in cantidad_esperada:
+            raise ValueError(f"Tipo de distribución desconocido: '{self.tipo}'.")
+        if len(self.parametros) != cantidad_esperada[self.tipo]:
+            raise ValueError(f"La distribución '{self.tipo}' requiere {cantidad_esperada[self.tipo]} parámetros.")
+        if self.tipo == 'normal' and self.parametros[1] < 0:
+            raise ValueError("La desviación estándar de una distribución normal no puede ser negativa.")
+        if self.tipo == 'triangular':
+            minimo, moda, maximo = self.parametros
+            if not (minimo <= moda <= maximo) or minimo == maximo:
+                raise ValueError("La distribución triangular requiere mínimo <= moda <= máximo y mínimo < máximo.")
+        if self.tipo == 'uniforme' and self.parametros[0] > self.parametros[1]:
+            raise ValueError("La distribución uniforme requiere mínimo <= máximo.")
+
+    def muestrear(self, rng, n, dtype=np.float64):
+        """Genera `n` muestras con el generador `rng` (numpy.random.Generator) en el `dtype` pedido."""
+        if self.tipo == 'fija':
+            return np.full(n, self.parametros[0], dtype=dtype)
+        if self.tipo == 'normal':
+            return rng.standard_normal(n, dtype=dtype) * self.parametros[1] + self.parametros[0]
+        if self.tipo == 'triangular':
+            return _triangular_inversa(rng.random(n, dtype=dtype), *self.parametros)
+        return self.parametros[0] + (self.parametros[1] - self.parametros[0]) * rng.random(n, dtype=dtype)
+
+    def ppf(self, u):
+        """Inversa de la función de distribución: transforma uniformes `u` en (0, 1) en muestras."""
+        if self.tipo == 'fija':
+            return np.full(u.shape, self.parametros[0], dtype=u.dtype)
+        if self.tipo == 'normal':
+            return self.parametros[0] + self.parametros[1] * _normal_inversa(u)
+        if self.tipo == 'triangular':
+            return _triangular_inversa(u, *self.parametros)
+        return self.parametros[0] + (self.parametros[1] - self.parametros[0]) * u
+
+
+def _normal_inversa(u):
+    """
+    Inversa de la normal estándar. Usa `scipy.special.ndtri` si está disponible; si no, la
+    aproximación racional de Acklam (error relativo < 1.2e-9), vectorizada por tramos.
+    """
+    if ndtri is not None:
+        return ndtri(u)
+    a = (-3.969683028665376e+01, 2.209460984245205e+02, -2.759285104469687e+02,
+         1.383577518672690e+02, -3.066479806614716e+01, 2.506628277459239e+00)
+    b = (-5.447609879822406e+01, 1.615858368580409e+02, -1.556989798598866e+02,
+         6.680131188771972e+01, -1.328068155288572e+01)
+    c = (-7.784894002430293e-03, -3.223964580411365e-01, -2.400758277161838e+00,
+         -2.549732539343734e+00, 4.374664141464968e+00, 2.938163982698783e+00)
+    d = (7.784695709041462e-03, 3.224671290700398e-01, 2.445134137142996e+00,
+         3.754408661907416e+00)
+    u = np.asarray(u, dtype=np.float64)
+    q = np.minimum(u, 1 - u)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Tramo central
+        r = (u - 0.5) ** 2
+        centro = ((((((a[0] * r + a[1]) * r + a[2]) * r + a[3]) * r + a[4]) * r + a[5]) * (u - 0.5)
+                  / (((((b[0] * r + b[1]) * r + b[2]) * r + b[3]) * r + b[4]) * r + 1))
+        # Colas (simétricas)
+        t = np.sqrt(-2 * np.log(q))
+        cola = ((((((c[0] * t + c[1]) * t + c[2]) * t + c[3]) * t + c[4]) * t + c[5])
+                / ((((d[0] * t + d[1]) * t + d[2]) * t + d[3]) * t + 1))
+        cola = np.where(u < 0.5, cola, -cola)
+    return np.where(q < 0.02425, cola, centro)
+
+
+def _triangular_inversa(u, minimo, moda, maximo):
+    """Inversa de la función de distribución triangular aplicada a uniformes `u` en [0, 1)."""
+    rango = maximo - minimo
+    corte = (moda - minimo) / rango
+    return np.where(
+        u < corte,
+        minimo + np.sqrt(u * rango * (moda - minimo)),
+        maximo - np.sqrt((1 - u) * rango * (maximo - moda)),
+    ).astype(u.dtype, copy=False)
+
+
+@dataclass(slots=True)
+class ResultadoMonteCarlo:
+    """Distribución simulada del precio justo final y sus estadísticos principales."""
+    n_simulaciones: int
+    n_validas: int
+    precio_justo_final: np.ndarray
+    precio_dcf: np.ndarray
+    precio_multiplo_terminal: np.ndarray
+    media: float
+    desviacion: float
+    percentiles: dict
+    probabilidad_subvaluada: float
+    histograma_conteos: np.ndarray
+    histograma_bordes: np.ndarray
+
+
+def distribucion_predeterminada(tipo, valor):
+    """Parámetros por defecto de cada tipo de distribución, centrados en el valor ingresado."""
+    if tipo == 'normal':
+        return Distribucion('normal', (valor, abs(valor) * 0.2))
+    if tipo == 'triangular':
+        return Distribucion('triangular', (valor * 0.7, valor, valor * 1.3 if valor != 0 else 1.0))
+    if tipo == 'uniforme':
+        return Distribucion('uniforme', (valor * 0.8, valor * 1.2))
+    return Distribucion('fija', (valor,))
+
+def muestrear_inputs(data, distribuciones, n_simulaciones, rng, dtype=np.float64):
+    """
+    Construye las columnas de inputs para `valuar_lote`: los campos con distribución se
+    reemplazan por `n_simulaciones` muestras y el resto (incluidas las opciones booleanas,
+    como incluir el DDM en el precio justo, y el calendario de descuento) se mantiene escalar.
+    """
+    columnas = {c: v for c, v in data.items() if isinstance(v, (int, float)) or c in CAMPOS_CALENDARIO}
+    for campo, distribucion in distribuciones.items():
+        if campo not in VARIABLES_SIMULABLES:
+            raise ValueError(f"El campo '{campo}' no se puede simular.")
+        distribucion.validar()
+        columnas[campo] = distribucion.muestrear(rng, n_simulaciones, dtype)
+    return columnas
+
+def semillas_simulacion(semilla, n_simulaciones):
+    """
+    Semillas hijas de cada tramo de SIMULACIONES_POR_SEMILLA simulaciones. `semilla` puede ser
+    un entero, None o una `SeedSequence` (que no se modifica: las hijas se derivan de su clave).
+    """
+    raiz = semilla if isinstance(semilla, np.random.SeedSequence) else np.random.SeedSequence(semilla)
+    n_tramos = max(-(-n_simulaciones // SIMULACIONES_POR_SEMILLA), 1)
+    return [np.random.SeedSequence(raiz.entropy, spawn_key=(*raiz.spawn_key, i)) for i in range(n_tramos)]
+
+def muestrear_por_tramos(data, distribuciones, n_simulaciones, semillas, dtype=np.float64):
+    """
+    Columnas como las de `muestrear_inputs` para `n_simulaciones`, sorteadas por tramos de
+    SIMULACIONES_POR_SEMILLA con una semilla de `semillas` cada uno y unidas en orden.
+    """
+    tramos = [
+        muestrear_inputs(data, distribuciones, min(SIMULACIONES_POR_SEMILLA, n_simulaciones - i * SIMULACIONES_POR_SEMILLA),
+                         np.random.default_rng(semilla), dtype)
+        for i, semilla in enumerate(semillas)
+    ]
+    if len(tramos) == 1:
+        return tramos[0]
+    return {campo: np.concatenate([t[campo] for t in tramos]) if np.ndim(valor) else valor for campo, valor in tramos[0].items()}
+
+def resumir_simulacion(precio_justo_final, precio_dcf, precio_multiplo_terminal, precio_actual, bins=100):
+    """Calcula media, desviación, percentiles, histograma y probabilidad de subvaluación."""
+    validos = precio_justo_final > 0
+    precios_validos = precio_justo_final[validos]
+    n_validas = int(precios_validos.size)
+    if n_validas == 0:
+        return ResultadoMonteCarlo(
+            n_simulaciones=int(precio_justo_final.size), n_validas=0,
+            precio_justo_final=precio_justo_final, precio_dcf=precio_dcf, precio_multiplo_terminal=precio_multiplo_terminal,
+            media=0.0, desviacion=0.0, percentiles={p: 0.0 for p in PERCENTILES_REPORTADOS},
+            probabilidad_subvaluada=0.0, histograma_conteos=np.zeros(0, dtype=np.int64), histograma_bordes=np.zeros(0),
+        )
+
+    valores_percentiles = np.percentile(precios_validos, PERCENTILES_REPORTADOS)
+    conteos, bordes = np.histogram(precios_validos, bins=bins)
+    return ResultadoMonteCarlo(
+        n_simulaciones=int(precio_justo_final.size),
+        n_validas=n_validas,
+        precio_justo_final=precio_justo_final,
+        precio_dcf=precio_dcf,
+        precio_multiplo_terminal=precio_multiplo_terminal,
+        media=float(precios_validos.mean()),
+        desviacion=float(precios_validos.std()),
+        percentiles=dict(zip(PERCENTILES_REPORTADOS, valores_percentiles.tolist())),
+        # Probabilidad de que el precio actual esté por debajo del precio justo simulado.
+        probabilidad_subvaluada=float(np.count_nonzero(precios_validos > precio_actual) / n_validas),
+        histograma_conteos=conteos,
+        histograma_bordes=bordes,
+    )
+
+def simular_valuacion(data, distribuciones, n_simulaciones=1_000_000, semilla=None):
+    """
+    Simulación Monte Carlo del precio justo final. `distribuciones` mapea campos de
+    VARIABLES_SIMULABLES a objetos `Distribucion`. Todas las simulaciones se valúan en una
+    sola llamada vectorizada a `valuar_lote`. Las simulaciones con supuestos inválidos
+    (por ejemplo, crecimiento negativo) siguen las mismas reglas que el análisis individual.
+    Las muestras se sortean por tramos (`muestrear_por_tramos`), como en
+    `ejecucion_paralela.simular_en_paralelo`, que con la misma semilla da el mismo resultado.
+    """
+    columnas = muestrear_por_tramos(data, distribuciones, n_simulaciones, semillas_simulacion(semilla, n_simulaciones))
+    lote = valuar_lote(columnas, escenarios=ESCENARIO_SIMULACION)
+    return resumir_simulacion(
+        np.ascontiguousarray(lote.precio_justo_final),
+        np.ascontiguousarray(lote.precio_dcf[:, 0]),
+        np.ascontiguousarray(lote.precio_multiplo_terminal[:, 0]),
+        data['precio_actual'],
+    )
+
+# ===================== SIMULACIÓN EN BLOQUES CON MEMORIA ACOTADA =====================
+
+@dataclass(slots=True)
+class EstadisticosEnLinea:
+    """Media y varianza acumuladas por bloques (algoritmo de Chan et al. para combinar momentos)."""
+    n: int = 0
+    media: float = 0.0
+    m2: float = 0.0
+
+    def actualizar(self, valores):
+        """Incorpora un bloque de valores sin guardarlos."""
+        n_bloque = int(valores.size)
+        if n_bloque == 0:
+            return
+        valores = valores.astype(np.float64, copy=False)
+        media_bloque = float(valores.mean())
+        m2_bloque = float(((valores - media_bloque) ** 2).sum())
+        n_total = self.n + n_bloque
+        delta = media_bloque - self.media
+        self.media += delta * n_bloque / n_total
+        self.m2 += m2_bloque + delta * delta * self.n * n_bloque / n_total
+        self.n = n_total
+
+    @property
+    def varianza(self):
+        return self.m2 / (self.n - 1) if self.n > 1 else 0.0
+
+    @property
+    def error_estandar(self):
+        """Error estándar de la media estimada."""
+        return float(np.sqrt(self.varianza / self.n)) if self.n > 0 else 0.0
+
+
+class TDigest:
+    """
+    Resumen de cuantiles en streaming (t-digest con fusión por bloques).
+    Mantiene unos pocos cientos de centroides (media, peso) con centroides más pequeños en
+    las colas, de modo que la memoria es constante sin importar cuántos valores se agreguen.
+    Cada bloque se fusiona de forma vectorizada: se ordena junto con los centroides actuales
+    y se agrupa según la función de escala k1(q) = δ/(2π)·asin(2q - 1).
+    """
+    __slots__ = ('compresion', 'medias', 'pesos', 'minimo', 'maximo')
+
+    def __init__(self, compresion=500):
+        self.compresion = compresion
+        self.medias = np.zeros(0)
+        self.pesos = np.zeros(0)
+        self.minimo = np.inf
+        self.maximo = -np.inf
+
+    @property
+    def n(self):
+        return float(self.pesos.sum())
+
+    def actualizar(self, valores):
+        """Fusiona un bloque de valores en el resumen."""
+        if valores.size == 0:
+            return
+        valores = valores.astype(np.float64, copy=False)
+        self.minimo = min(self.minimo, float(valores.min()))
+        self.maximo = max(self.maximo, float(valores.max()))
+
+        medias = np.concatenate([self.medias, valores])
+        pesos = np.concatenate([self.pesos, np.ones(valores.size)])
+        orden = np.argsort(medias, kind='stable')
+        medias, pesos = medias[orden], pesos[orden]
+
+        acumulado = np.cumsum(pesos)
+        total = acumulado[-1]
+        q_izquierda = (acumulado - pesos) / total
+        k = self.compresion / (2 * np.pi) * np.arcsin(2 * q_izquierda - 1)
+        grupos = np.floor(k - k[0]).astype(np.int64)
+        # Los grupos son contiguos porque k es monótona en q.
+        _, grupos = np.unique(grupos, return_inverse=True)
+
+        self.pesos = np.bincount(grupos, weights=pesos)
+        self.medias = np.bincount(grupos, weights=medias * pesos) / self.pesos
+
+    def cuantil(self, q):
+        """Estima los cuantiles `q` (escalar o arreglo en [0, 1])."""
+        q = np.clip(np.asarray(q, dtype=np.float64), 0.0, 1.0)
+        if self.pesos.size == 0:
+            return np.full(q.shape, np.nan)
+        centros = np.cumsum(self.pesos) - self.pesos / 2
+        posiciones = np.concatenate([[0.0], centros, [self.n]])
+        valores = np.concatenate([[self.minimo], self.medias, [self.maximo]])
+        return np.interp(q * self.n, posiciones, valores)
+
+    def incertidumbre_rango(self, q):
+        """
+        Incertidumbre (en fracción del total) que aporta el resumen en la posición `q`:
+        la mitad del peso del centroide que contiene ese rango.
+        """
+        q = np.clip(np.asarray(q, dtype=np.float64), 0.0, 1.0)
+        if self.pesos.size == 0:
+            return np.zeros(q.shape)
+        indices = np.searchsorted(np.cumsum(self.pesos), q * self.n, side='left')
+        indices = np.clip(indices, 0, self.pesos.size - 1)
+        return self.pesos[indices] / 2 / self.n
+
+
+@dataclass(slots=True)
+class EstimacionPercentil:
+    """Percentil estimado con su intervalo (error Monte Carlo al 95% + error del resumen)."""
+    percentil: float
+    valor: float
+    inferior: float
+    superior: float
+
+
+@dataclass(slots=True)
+class ResultadoMonteCarloEnBloques:
+    """Resumen de una simulación en bloques: nunca se guardan las muestras individuales."""
+    n_simulaciones: int
+    n_validas: int
+    tamaño_bloque: int
+    precio_justo_final: EstadisticosEnLinea
+    precio_maximo_a_pagar: EstadisticosEnLinea
+    percentiles_precio_justo: list
+    percentiles_precio_maximo: list
+    probabilidad_subvaluada: float
+
+
+def estimar_percentiles(digest, percentiles=PERCENTILES_REPORTADOS, z=1.96):
+    """
+    Percentiles del resumen con intervalo de error. El error Monte Carlo del cuantil se
+    acota sin suponer una distribución, desplazando el rango en ±z·sqrt(p(1-p)/n) (intervalo
+    por estadísticos de orden); a eso se suma la incertidumbre de rango del propio resumen.
+    """
+    n = digest.n
+    estimaciones = []
+    for percentil in percentiles:
+        p = percentil / 100
+        margen = z * np.sqrt(p * (1 - p) / n) + float(digest.incertidumbre_rango(p)) if n > 0 else 0.0
+        valor, inferior, superior = digest.cuantil([p, p - margen, p + margen])
+        estimaciones.append(EstimacionPercentil(percentil, float(valor), float(inferior), float(superior)))
+    return estimaciones
+
+def simular_valuacion_en_bloques(data, distribuciones, n_simulaciones, tamaño_bloque=250_000,
+                                 dtype=np.float64, semilla=None, compresion=500, progreso=None):
+    """
+    Simulación Monte Carlo con memoria acotada para corridas muy largas (10^8 simulaciones o más).
+    Procesa bloques de `tamaño_bloque` simulaciones (opcionalmente en float32) y solo conserva
+    media y varianza acumuladas y un t-digest por métrica, de modo que la memoria no depende
+    de `n_simulaciones`. `progreso`, si se indica, recibe la fracción completada tras cada bloque.
+    """
+    rng = np.random.default_rng(semilla)
+    estadisticos_justo, estadisticos_maximo = EstadisticosEnLinea(), EstadisticosEnLinea()
+    digest_justo, digest_maximo = TDigest(compresion), TDigest(compresion)
+    subvaluadas = 0
+
+    procesadas = 0
+    while procesadas < n_simulaciones:
+        n_bloque = min(tamaño_bloque, n_simulaciones - procesadas)
+        columnas = muestrear_inputs(data, distribuciones, n_bloque, rng, dtype)
+        lote = valuar_lote(columnas, escenarios=ESCENARIO_SIMULACION, dtype=dtype)
+
+        validos = lote.precio_justo_final > 0
+        precio_justo = lote.precio_justo_final[validos]
+        precio_maximo = lote.precio_maximo_a_pagar[validos]
+        estadisticos_justo.actualizar(precio_justo)
+        estadisticos_maximo.actualizar(precio_maximo)
+        digest_justo.actualizar(precio_justo)
+        digest_maximo.actualizar(precio_maximo)
+        subvaluadas += int(np.count_nonzero(precio_justo > data['precio_actual']))
+
+        procesadas += n_bloque
+        if progreso is not None:
+            progreso(procesadas / n_simulaciones)
+
+    n_validas = estadisticos_justo.n
+    return ResultadoMonteCarloEnBloques(
+        n_simulaciones=n_simulaciones,
+        n_validas=n_validas,
+        tamaño_bloque=tamaño_bloque,
+        precio_justo_final=estadisticos_justo,
+        precio_maximo_a_pagar=estadisticos_maximo,
+        percentiles_precio_justo=estimar_percentiles(digest_justo) if n_validas else [],
+        percentiles_precio_maximo=estimar_percentiles(digest_maximo) if n_validas else [],
+        probabilidad_subvaluada=subvaluadas / n_validas if n_validas else 0.0,
+    )
+
+# ===================== CUASI MONTE CARLO CON PARADA POR CONVERGENCIA =====================
+
+MUESTREADORES = ('sobol', 'halton', 'aleatorio')
+
+_PRIMOS = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37)
+
+
+def _halton(inicio, n, dimensiones, desplazamiento):
+    """
+    Puntos `inicio` a `inicio + n - 1` de la secuencia de Halton en `dimensiones` dimensiones,
+    aleatorizada con un desplazamiento de Cranley-Patterson (módulo 1). Vectorizado por punto.
+    """
+    indices = np.arange(inicio + 1, inicio + n + 1, dtype=np.int64)
+    puntos = np.empty((n, dimensiones))
+    for j in range(dimensiones):
+        base = _PRIMOS[j]
+        restantes = indices.copy()
+        fraccion = 1.0 / base
+        valor = np.zeros(n)
+        while restantes.any():
+            valor += fraccion * (restantes % base)
+            restantes //= base
+            fraccion /= base
+        puntos[:, j] = valor
+    return (puntos + desplazamiento) % 1.0
+
+
+class _Secuencia:
+    """Una réplica aleatorizada e independiente de la secuencia de puntos uniformes elegida."""
+    __slots__ = ('muestreador', 'dimensiones', 'rng', 'motor', 'desplazamiento', 'generados')
+
+    def __init__(self, muestreador, dimensiones, rng):
+        self.muestreador = muestreador
+        self.dimensiones = dimensiones
+        self.rng = rng
+        self.generados = 0
+        self.motor = None
+        self.desplazamiento = None
+        if muestreador == 'sobol' and dimensiones > 0:
+            self.motor = qmc.Sobol(d=dimensiones, scramble=True, seed=rng)
+        elif muestreador == 'halton':
+            self.desplazamiento = rng.random(dimensiones)
+
+    def siguientes(self, n):
+        """Siguientes `n` puntos en (0, 1)^d."""
+        if self.motor is not None:
+            puntos = self.motor.random(n)
+        elif self.desplazamiento is not None:
+            puntos = _halton(self.generados, n, self.dimensiones, self.desplazamiento)
+        else:
+            puntos = self.rng.random((n, self.dimensiones))
+        self.generados += n
+        # Evita 0 y 1 exactos, donde la inversa de la normal diverge.
+        return np.clip(puntos, 1e-12, 1 - 1e-12)
+
+
+@dataclass(slots=True)
+class ResultadoConvergencia:
+    """Resultado de la simulación con monitor de convergencia de la mediana."""
+    muestreador: str
+    replicas: int
+    n_evaluaciones: int
+    convergio: bool
+    mediana: float
+    error_estandar_mediana: float
+    percentiles: dict
+    probabilidad_subvaluada: float
+    historial: list = field(default_factory=list)
+
+
+def simular_hasta_convergencia(data, distribuciones, tolerancia=0.05, muestreador='sobol', replicas=8,
+                               n_inicial=256, n_maximo=1_048_576, semilla=None):
+    """
+    Simulación (cuasi) Monte Carlo que se detiene cuando el error estándar de la mediana del
+    precio justo final cae por debajo de `tolerancia` (en $).
+
+    Se usan `replicas` secuencias aleatorizadas independientes (Sobol con scrambling, Halton
+    desplazado o pseudoaleatorias) transformadas con las inversas de las distribuciones. El
+    error estándar se estima con la dispersión de la mediana entre réplicas, que es válida
+    también para QMC. Cada ronda duplica los puntos por réplica (potencias de 2, lo que
+    mantiene el balance de Sobol) hasta converger o alcanzar `n_maximo` evaluaciones en total.
+    """
+    if muestreador not in MUESTREADORES:
+        raise ValueError(f"Muestreador desconocido: '{muestreador}'.")
+    if muestreador == 'sobol' and not SCIPY_DISPONIBLE:
+        muestreador = 'halton'
+    if replicas < 2:
+        raise ValueError("Se necesitan al menos 2 réplicas para estimar el error estándar.")
+
+    for campo, distribucion in distribuciones.items():
+        if campo not in VARIABLES_SIMULABLES:
+            raise ValueError(f"El campo '{campo}' no se puede simular.")
+        distribucion.validar()
+    aleatorias = [c for c, d in distribuciones.items() if d.tipo != 'fija']
+    # Las opciones booleanas (como incluir el DDM en el precio justo) y el calendario de descuento
+    # se mantienen, igual que en `muestrear_inputs`: ambos muestreadores valúan el mismo modelo.
+    columnas_base = {c: v for c, v in data.items() if isinstance(v, (int, float)) or c in CAMPOS_CALENDARIO}
+    for campo, distribucion in distribuciones.items():
+        if distribucion.tipo == 'fija':
+            columnas_base[campo] = float(distribucion.parametros[0])
+
+    semillas = np.random.SeedSequence(semilla).spawn(replicas)
+    secuencias = [_Secuencia(muestreador, len(aleatorias), np.random.default_rng(s)) for s in semillas]
+    acumulados = [np.zeros(0) for _ in range(replicas)]
+
+    historial = []
+    nuevos = n_inicial
+    while True:
+        # Todas las réplicas de la ronda se valúan en una sola llamada al motor.
+        uniformes = np.concatenate([secuencia.siguientes(nuevos) for secuencia in secuencias])
+        columnas = dict(columnas_base)
+        for j, campo in enumerate(aleatorias):
+            columnas[campo] = distribuciones[campo].ppf(uniformes[:, j])
+        if not aleatorias:
+            columnas['precio_actual'] = np.full(uniformes.shape[0], float(data['precio_actual']))
+        precios = valuar_lote(columnas, escenarios=ESCENARIO_SIMULACION).precio_justo_final
+        for r, bloque in enumerate(np.split(np.asarray(precios), replicas)):
+            acumulados[r] = np.concatenate([acumulados[r], bloque[bloque > 0]])
+
+        medianas = np.array([np.median(a) if a.size else np.nan for a in acumulados])
+        n_evaluaciones = secuencias[0].generados * replicas
+        mediana = float(np.nanmean(medianas)) if np.isfinite(medianas).any() else 0.0
+        error_estandar = float(np.nanstd(medianas, ddof=1) / np.sqrt(replicas)) if np.isfinite(medianas).sum() > 1 else np.inf
+        historial.append((n_evaluaciones, mediana, error_estandar))
+
+        convergio = error_estandar < tolerancia
+        if convergio or n_evaluaciones * 2 > n_maximo:
+            break
+        nuevos = secuencias[0].generados # Duplicar los puntos por réplica
+
+    todos = np.concatenate(acumulados)
+    return ResultadoConvergencia(
+        muestreador=muestreador,
+        replicas=replicas,
+        n_evaluaciones=n_evaluaciones,
+        convergio=bool(convergio),
+        mediana=mediana,
+        error_estandar_mediana=error_estandar,
+        percentiles=dict(zip(PERCENTILES_REPORTADOS, np.percentile(todos, PERCENTILES_REPORTADOS).tolist())) if todos.size else {p: 0.0 for p in PERCENTILES_REPORTADOS},
+        probabilidad_subvaluada=float(np.count_nonzero(todos > data['precio_actual']) / todos.size) if todos.size else 0.0,
+        historial=historial,
+    )
+
+def verificar_paridad_muestreadores(n_simulaciones=200_000, semilla=0, rtol=0.01):
+    """
+    Simula el mismo caso con Monte Carlo (`simular_valuacion`) y con la convergencia QMC
+    (`simular_hasta_convergencia`) y compara las medianas del precio justo final. El caso usa
+    una fecha de valuación con cierre fiscal en junio, período parcial, mitad de año y el DDM
+    en el precio justo, para que cualquier input que uno de los dos muestreadores pierda se
+    note. Retorna (mediana MC, mediana QMC); lanza AssertionError si difieren más que `rtol`.
+    """
+    data = datos_iniciales()
+    data.update(
+        precio_actual=100.0, eps_actual=5.0, eps_proyectado=6.0, revenue_actual=1_000.0, revenue_pesimista=1_000.0,
+        revenue_base=1_100.0, revenue_optimista=1_200.0, net_income_estimado=120.0, acciones_circulacion=20.0,
+        book_value_per_share=30.0, equity_proyectado=700.0, wacc=9.0, tasa_crecimiento_esperada=8.0,
+        tasa_crecimiento_perpetuo=2.5, per_esperado=18.0, ps_esperado=3.0, pb_esperado=3.0, dividendos_anuales=2.0,
+        incluir_ddm_precio_justo=True, fecha_valuacion='2024-03-15', mes_cierre_fiscal=6, flujos_medio_año=True, periodo_parcial=True,
+    )
+    distribuciones = {
+        'wacc': distribucion_predeterminada('normal', data['wacc']),
+        'tasa_crecimiento_esperada': distribucion_predeterminada('normal', data['tasa_crecimiento_esperada']),
+    }
+    mediana_mc = simular_valuacion(data, distribuciones, n_simulaciones, semilla).percentiles[50]
+    mediana_qmc = simular_hasta_convergencia(data, distribuciones, semilla=semilla).mediana
+    np.testing.assert_allclose(mediana_qmc, mediana_mc, rtol=rtol, err_msg="La mediana QMC difiere de la de Monte Carlo.")
+    return mediana_mc, mediana_qmc
+
+
+if __name__ == '__main__':
+    try:
+        mediana_mc, mediana_qmc = verificar_paridad_muestreadores()
+    except AssertionError as e:
+        print(e)
+        sys.exit(1)
+    print(f"Mediana Monte Carlo: {mediana_mc:,.4f} · Mediana QMC: {mediana_qmc:,.4f}")
+    print("Monte Carlo y QMC valúan el mismo modelo.")
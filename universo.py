@@ -0,0 +1,348 @@
+"""
+Valuación de un universo de empresas desde un archivo.
+
+Lee un CSV, Parquet o Arrow IPC con una fila por ticker y las mismas columnas que `data_inputs`
+(`motor_valuacion.datos_iniciales`), completa los inputs que falten con sus valores por
+defecto y valúa todas las filas a la vez con `motor_valuacion.valuar_lote`: múltiplos, DCF y
+Múltiplo Terminal de cada escenario, DDM, precio justo final, precio máximo a pagar y margen
+de seguridad, como operaciones por columna. Antes se validan todas las filas
+(`validacion.ESQUEMA_LOTE`): las inválidas no se valúan y quedan como 'Entrada inválida'.
+
+Los archivos más grandes que la memoria se procesan por bloques de filas con
+`valuar_archivo_en_bloques`, que escribe los resultados a medida que valúa cada bloque.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from almacenamiento import (
+    FORMATO_ARROW, FORMATO_PARQUET, PARQUET_DISPONIBLE, abrir_tabla, formato_archivo, guardar_tabla_columnar, lotes_arrow,
+)
+from costo_capital import wacc_desde_datos
+from ejecucion_paralela import valuar_lote_paralelo
+from motor_valuacion import ESCENARIOS_PREDETERMINADOS, datos_iniciales, valuar_lote
+from reglas_multiplos import CATEGORIAS, SIN_DATOS, evaluar_reglas
+from validacion import ESQUEMA_LOTE, validar_tabla
+
+if PARQUET_DISPONIBLE:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+
+# Columna que identifica cada empresa (si el archivo no la trae, se numeran las filas).
+COLUMNA_TICKER = 'ticker'
+
+# Textos aceptados como verdadero en las columnas booleanas de un CSV.
+VALORES_VERDADEROS = ('true', 'verdadero', '1', 'si', 'sí', 'yes', 'x')
+
+# Clasificación de cada empresa, con los mismos criterios que las recomendaciones generales.
+SIN_VALUACION = "Sin valuación"
+SUBVALUADA = "Subvaluada"
+NEUTRAL = "Neutral"
+SOBREVALUADA = "Sobrevaluada"
+ENTRADA_INVALIDA = "Entrada inválida" # La fila no pasó la validación (`validacion.ESQUEMA_LOTE`) y no se valuó.
+
+# Columna de resultados que indica si la fila pasó la validación.
+COLUMNA_VALIDA = 'entrada_valida'
+
+# Orden de las clasificaciones en los resúmenes.
+CLASIFICACIONES = (SUBVALUADA, NEUTRAL, SOBREVALUADA, SIN_VALUACION, ENTRADA_INVALIDA)
+
+# Sobre este múltiplo del precio justo la acción se considera sobrevaluada.
+UMBRAL_SOBREVALUACION = 1.1
+
+# Filas por bloque en la lectura por bloques: acota la memoria sin importar el tamaño del archivo.
+FILAS_POR_BLOQUE = 100_000
+
+# ===================== LECTURA Y ESCRITURA DE ARCHIVOS =====================
+
+def _es_columnar(fuente):
+    """True si la ruta o el archivo abierto es un Parquet o un Arrow IPC (según su extensión)."""
+    return formato_archivo(fuente) in (FORMATO_PARQUET, FORMATO_ARROW)
+
+def leer_tabla(fuente, columnas=None):
+    """
+    Lee un CSV, un Parquet o un Arrow IPC (según la extensión de la ruta o del archivo abierto)
+    como DataFrame; con `columnas` se leen solo esas (ver `almacenamiento.abrir_tabla`).
+    """
+    if _es_columnar(fuente):
+        return abrir_tabla(fuente, columnas).to_pandas()
+    return pd.read_csv(fuente, usecols=columnas)
+
+def guardar_tabla(tabla, destino):
+    """Guarda un DataFrame como CSV, Parquet o Arrow IPC según la extensión de `destino`."""
+    if _es_columnar(destino):
+        guardar_tabla_columnar(tabla, destino)
+    else:
+        tabla.to_csv(destino, index=False)
+
+def leer_tabla_en_bloques(fuente, filas_por_bloque=FILAS_POR_BLOQUE):
+    """
+    Lee un CSV, un Parquet o un Arrow IPC de a `filas_por_bloque` filas y entrega cada bloque
+    como DataFrame, sin cargar nunca el archivo completo (los Parquet se leen por lotes de sus
+    row groups y los Arrow IPC se recorren mapeados en memoria).
+    """
+    formato = formato_archivo(fuente)
+    if formato == FORMATO_PARQUET:
+        if not PARQUET_DISPONIBLE:
+            raise ValueError("Leer archivos Parquet requiere PyArrow (pip install pyarrow).")
+        for lote in pq.ParquetFile(fuente).iter_batches(batch_size=filas_por_bloque):
+            yield lote.to_pandas()
+    elif formato == FORMATO_ARROW:
+        for lote in lotes_arrow(fuente, filas_por_bloque):
+            yield lote.to_pandas()
+    else:
+        with pd.read_csv(fuente, chunksize=filas_por_bloque) as lector:
+            yield from lector
+
+class EscritorTabla:
+    """
+    Escribe un DataFrame por partes en un CSV, un Parquet o un Arrow IPC (según la extensión
+    de `destino`): el CSV lleva el encabezado solo en la primera parte y los formatos columnares
+    agregan un row group o record batch por parte, con el esquema de la primera. Se usa como
+    context manager.
+    """
+    __slots__ = ('destino', 'formato', '_archivo', '_escritor', '_esquema', '_filas')
+
+    def __init__(self, destino):
+        self.destino = destino
+        self.formato = formato_archivo(destino)
+        if _es_columnar(destino) and not PARQUET_DISPONIBLE:
+            raise ValueError("Guardar archivos Parquet o Arrow requiere PyArrow (pip install pyarrow).")
+        self._archivo = None
+        self._escritor = None
+        self._esquema = None
+        self._filas = 0
+
+    def escribir(self, tabla):
+        """Agrega las filas de `tabla` al final del archivo."""
+        if _es_columnar(self.destino):
+            if self._escritor is None:
+                datos = pa.Table.from_pandas(tabla, preserve_index=False)
+                self._esquema = datos.schema
+                if self.formato == FORMATO_PARQUET:
+                    self._escritor = pq.ParquetWriter(self.destino, datos.schema)
+                else:
+                    self._archivo = pa.OSFile(str(self.destino), 'wb')
+                    self._escritor = ipc.new_file(self._archivo, datos.schema)
+            else:
+                datos = pa.Table.from_pandas(tabla, schema=self._esquema, preserve_index=False)
+            self._escritor.write_table(datos)
+        else:
+            primera = self._filas == 0
+            tabla.to_csv(self.destino, mode='w' if primera else 'a', header=primera, index=False)
+        self._filas += len(tabla)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if self._escritor is not None:
+            self._escritor.close()
+        if self._archivo is not None:
+            self._archivo.close()
+
+# ===================== COLUMNAS DE ENTRADA =====================
+
+def _booleana(serie):
+    """Columna booleana desde bool, números (distinto de 0) o textos como 'true' o 'sí'."""
+    if pd.api.types.is_bool_dtype(serie):
+        return serie.to_numpy(dtype=bool)
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.fillna(0).to_numpy(dtype=np.float64) != 0
+    return serie.astype(str).str.strip().str.lower().isin(VALORES_VERDADEROS).to_numpy()
+
+def columnas_desde_tabla(tabla):
+    """
+    Columnas para `valuar_lote` a partir de un DataFrame con una fila por empresa.
+
+    Cada input de `datos_iniciales()` se toma de la columna del mismo nombre; si la columna
+    no existe se usa el valor por defecto como escalar, y las celdas vacías o no numéricas
+    también toman el valor por defecto. Las columnas desconocidas se ignoran. En las filas con
+    `wacc_desde_capm` el WACC se arma por CAPM (`costo_capital.wacc_desde_datos`).
+    """
+    columnas = {}
+    for campo, defecto in datos_iniciales().items():
+        if campo not in tabla.columns:
+            columnas[campo] = defecto
+        elif isinstance(defecto, bool):
+            columnas[campo] = _booleana(tabla[campo])
+        elif isinstance(defecto, str):
+            columnas[campo] = tabla[campo].fillna(defecto).astype(str).to_numpy(dtype=object)
+        else:
+            valores = pd.to_numeric(tabla[campo], errors='coerce').to_numpy(dtype=np.float64)
+            columnas[campo] = np.where(np.isnan(valores), float(defecto), valores)
+    if np.any(columnas['wacc_desde_capm']):
+        columnas['wacc'] = wacc_desde_datos(columnas)
+    return columnas
+
+def tickers_de_tabla(tabla, primera_fila=0):
+    """
+    Identificador de cada fila: la columna `ticker` o el número de fila (contando desde
+    `primera_fila`, para que los bloques de un mismo archivo sigan la numeración).
+    """
+    if COLUMNA_TICKER in tabla.columns:
+        return tabla[COLUMNA_TICKER].astype(str).to_numpy(dtype=object)
+    return np.array([f"Fila {i + 1}" for i in range(primera_fila, primera_fila + len(tabla))], dtype=object)
+
+# ===================== VALUACIÓN DEL UNIVERSO =====================
+
+@dataclass(slots=True)
+class ResumenUniverso:
+    """Conteos de la valuación de un universo por clasificación."""
+    n_empresas: int
+    n_valuadas: int
+    conteo_clasificacion: dict
+
+def clasificar(precio_actual, precio_justo_final, precio_maximo_a_pagar):
+    """
+    Clasificación vectorizada de cada empresa: subvaluada si el precio actual está por debajo
+    del precio máximo a pagar, sobrevaluada si supera en más de un 10% al precio justo y
+    neutral en el resto; sin precio justo válido, 'Sin valuación'.
+    """
+    return np.select(
+        [
+            precio_justo_final <= 0,
+            (precio_actual < precio_maximo_a_pagar) & (precio_maximo_a_pagar > 0),
+            precio_actual > precio_justo_final * UMBRAL_SOBREVALUACION,
+        ],
+        [SIN_VALUACION, SUBVALUADA, SOBREVALUADA],
+        default=NEUTRAL,
+    ).astype(object)
+
+def valuar_columnas(tickers, columnas, escenarios=ESCENARIOS_PREDETERMINADOS, max_procesos=1, progreso=None):
+    """
+    Valúa las columnas de un universo con `valuar_lote` y arma la tabla de resultados: una
+    fila por empresa con los precios de cada método y escenario, el precio justo final, el
+    precio máximo a pagar, el margen de seguridad actual ((justo - actual) / justo, en
+    porcentaje; NaN sin precio justo), la clasificación y una columna categórica por cada
+    regla de interpretación de múltiplos (`reglas_multiplos.REGLAS`). Con `max_procesos` distinto de 1 el
+    lote se reparte entre procesos (`ejecucion_paralela.valuar_lote_paralelo`), con el mismo resultado.
+    """
+    n_filas = len(tickers)
+    if max_procesos == 1:
+        lote = valuar_lote(columnas, escenarios)
+    else:
+        lote = valuar_lote_paralelo(columnas, escenarios, max_procesos=max_procesos, progreso=progreso)
+    precio_actual = np.broadcast_to(np.asarray(columnas['precio_actual'], dtype=np.float64), (n_filas,))
+    precio_justo_final = np.broadcast_to(lote.precio_justo_final, (n_filas,))
+    precio_maximo_a_pagar = np.broadcast_to(lote.precio_maximo_a_pagar, (n_filas,))
+
+    resultados = {
+        COLUMNA_TICKER: tickers,
+        'precio_actual': precio_actual,
+        'precio_objetivo_pe': lote.precio_objetivo_pe,
+        'precio_objetivo_ps': lote.precio_objetivo_ps,
+        'precio_objetivo_pb': lote.precio_objetivo_pb,
+        'precio_obj_multiplos': lote.precio_obj_multiplos,
+    }
+    for metodo, precios in (('dcf', lote.precio_dcf), ('multiplo_terminal', lote.precio_multiplo_terminal), ('ddm', lote.precio_ddm)):
+        precios = np.broadcast_to(precios, (n_filas, len(lote.nombres_escenarios)))
+        for j, nombre in enumerate(lote.nombres_escenarios):
+            resultados[f'precio_obj_{metodo}_{nombre.lower()}'] = precios[:, j]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        margen_seguridad = np.where(precio_justo_final > 0, (precio_justo_final - precio_actual) / precio_justo_final * 100, np.nan)
+    resultados.update(
+        precio_justo_final=precio_justo_final,
+        precio_maximo_a_pagar=precio_maximo_a_pagar,
+        margen_seguridad=margen_seguridad,
+        valuacion=clasificar(precio_actual, precio_justo_final, precio_maximo_a_pagar),
+    )
+    tabla = pd.DataFrame({nombre: np.broadcast_to(valores, (n_filas,)) for nombre, valores in resultados.items()})
+    for nombre, codigos in evaluar_reglas(columnas).banderas.items():
+        tabla[nombre] = pd.Categorical.from_codes(np.broadcast_to(codigos, (n_filas,)), categories=list(CATEGORIAS))
+    return tabla
+
+def _completar_invalidas(resultados, tickers, posiciones, precio_actual):
+    """
+    Expande los resultados de las filas válidas (`posiciones`) a todas las filas: las inválidas
+    quedan sin precios, clasificadas como ENTRADA_INVALIDA y con las reglas en 'Sin datos'.
+    """
+    n_filas = len(tickers)
+    resultados = resultados.set_axis(posiciones).reindex(pd.RangeIndex(n_filas))
+    resultados[COLUMNA_TICKER] = tickers
+    resultados['precio_actual'] = np.broadcast_to(np.asarray(precio_actual, dtype=np.float64), (n_filas,))
+    resultados['valuacion'] = resultados['valuacion'].fillna(ENTRADA_INVALIDA)
+    for columna in resultados.columns:
+        if isinstance(resultados[columna].dtype, pd.CategoricalDtype):
+            resultados[columna] = resultados[columna].fillna(CATEGORIAS[SIN_DATOS])
+    return resultados
+
+def valuar_universo_validado(tabla, escenarios=ESCENARIOS_PREDETERMINADOS, max_procesos=1, progreso=None, primera_fila=0):
+    """
+    Valida un DataFrame con una fila por empresa (`validacion.validar_tabla` con ESQUEMA_LOTE)
+    y valúa solo las filas válidas: una fila con una fecha o un mes de cierre inválido, o una
+    proporción de deuda fuera de rango, se saltea en lugar de detener todo el lote. Retorna
+    (tabla de resultados con todas las filas y la columna `entrada_valida`, resultado de la validación).
+    """
+    validacion = validar_tabla(tabla, ESQUEMA_LOTE)
+    validas = validacion.filas_validas
+    tickers = tickers_de_tabla(tabla, primera_fila)
+    if validas.all():
+        resultados = valuar_columnas(tickers, columnas_desde_tabla(tabla), escenarios, max_procesos, progreso)
+    else:
+        posiciones = np.flatnonzero(validas)
+        # Sin filas válidas se valúan los valores por defecto (escalares) solo para tener las columnas.
+        columnas = columnas_desde_tabla(tabla.iloc[posiciones]) if len(posiciones) else datos_iniciales()
+        resultados = valuar_columnas(tickers[posiciones], columnas, escenarios, max_procesos, progreso)
+        resultados = _completar_invalidas(resultados, tickers, posiciones, validacion.columnas['precio_actual'])
+    resultados[COLUMNA_VALIDA] = validas
+    return resultados, validacion
+
+def valuar_universo(tabla, escenarios=ESCENARIOS_PREDETERMINADOS, max_procesos=1, progreso=None, primera_fila=0):
+    """Valúa un DataFrame con una fila por empresa (ver `valuar_universo_validado`) y retorna la tabla de resultados."""
+    return valuar_universo_validado(tabla, escenarios, max_procesos, progreso, primera_fila)[0]
+
+def valuar_archivo(fuente, destino=None, escenarios=ESCENARIOS_PREDETERMINADOS, max_procesos=1):
+    """Lee un universo desde un CSV, Parquet o Arrow IPC, lo valúa y, si se indica `destino`, guarda los resultados."""
+    resultados = valuar_universo(leer_tabla(fuente), escenarios, max_procesos)
+    if destino is not None:
+        guardar_tabla(resultados, destino)
+    return resultados
+
+def valuar_archivo_en_bloques(fuente, destino, escenarios=ESCENARIOS_PREDETERMINADOS, filas_por_bloque=FILAS_POR_BLOQUE,
+                              max_procesos=1, progreso=None):
+    """
+    Valúa un CSV, Parquet o Arrow IPC de cualquier tamaño leyéndolo de a `filas_por_bloque` filas: cada
+    bloque se valida y sus filas válidas pasan por `columnas_desde_tabla` y `valuar_lote`, y sus resultados se agregan a
+    `destino` (CSV, Parquet o Arrow IPC) antes de leer el siguiente, así que la memoria depende del tamaño
+    del bloque y no del archivo. Las filas resultantes son las mismas que con `valuar_archivo` (salvo redondeo).
+    `progreso`, si se indica, recibe la cantidad de filas valuadas tras cada bloque.
+    Retorna el resumen de todo el universo.
+    """
+    resumen = ResumenUniverso(n_empresas=0, n_valuadas=0, conteo_clasificacion=dict.fromkeys(CLASIFICACIONES, 0))
+    with EscritorTabla(destino) as escritor:
+        for bloque in leer_tabla_en_bloques(fuente, filas_por_bloque):
+            resultados = valuar_universo(bloque, escenarios, max_procesos, primera_fila=resumen.n_empresas)
+            escritor.escribir(resultados)
+            parcial = resumir_universo(resultados)
+            resumen.n_empresas += parcial.n_empresas
+            resumen.n_valuadas += parcial.n_valuadas
+            for clasificacion, cantidad in parcial.conteo_clasificacion.items():
+                resumen.conteo_clasificacion[clasificacion] += cantidad
+            if progreso is not None:
+                progreso(resumen.n_empresas)
+    return resumen
+
+def resumir_universo(resultados):
+    """Cuántas empresas se valuaron (con precio justo válido) y cuántas caen en cada clasificación."""
+    conteo = resultados['valuacion'].value_counts()
+    return ResumenUniverso(
+        n_empresas=len(resultados),
+        n_valuadas=int((~resultados['valuacion'].isin((SIN_VALUACION, ENTRADA_INVALIDA))).sum()),
+        conteo_clasificacion={c: int(conteo.get(c, 0)) for c in CLASIFICACIONES},
+    )
+
+
+if __name__ == '__main__':
+    import sys
+    if len(sys.argv) not in (3, 4):
+        print("Uso: python universo.py ENTRADA.(csv|parquet|arrow) SALIDA.(csv|parquet|arrow) [FILAS_POR_BLOQUE]")
+        sys.exit(1)
+    total = valuar_archivo_en_bloques(
+        sys.argv[1], sys.argv[2], filas_por_bloque=int(sys.argv[3]) if len(sys.argv) == 4 else FILAS_POR_BLOQUE,
+        progreso=lambda filas: print(f"{filas:,} filas valuadas", flush=True),
+    )
+    print(f"{total.n_empresas:,} empresas ({total.n_valuadas:,} con precio justo válido): "
+          + ", ".join(f"{c}: {n:,}" for c, n in total.conteo_clasificacion.items()))
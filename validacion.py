@@ -0,0 +1,285 @@
+"""
+Validación de inputs por esquema, para una empresa o para una tabla entera a la vez.
+
+Un esquema es una tupla de restricciones declarativas: rangos por campo (`RestriccionCampo`)
+y comparaciones entre campos de una misma fila (`RestriccionFilas`, como WACC mayor que el
+crecimiento perpetuo). Además, toda celda presente que no se pueda leer como número (o como
+fecha AAAA-MM-DD) es un error de tipo. Cada restricción se evalúa como una comparación de
+columnas enteras y el resultado es compacto: por fila, un entero de 64 bits con un bit por
+chequeo fallido. Los mensajes se arman solo para las filas que se muestran.
+"""
+import datetime
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from motor_valuacion import datos_iniciales
+
+# Severidad de una restricción: los errores invalidan la fila; las advertencias solo se informan.
+ERROR = 'error'
+ADVERTENCIA = 'advertencia'
+
+# Campos de texto que deben ser una fecha AAAA-MM-DD (o estar vacíos).
+CAMPOS_FECHA = ('fecha_valuacion',)
+
+# Horizonte máximo admitido en un lote: el ancho de las matrices de flujos es el máximo de las filas.
+MAXIMO_AÑOS_DCF = 100
+
+MENSAJE_POSITIVO = "Error: El campo '{etiqueta}' debe ser un valor positivo para realizar los cálculos. Por favor, corrígelo."
+MENSAJE_NO_NEGATIVO = "Error: El campo '{etiqueta}' no puede ser negativo. Por favor, corrígelo."
+MENSAJE_RANGO = "Error: El campo '{etiqueta}' debe estar entre {minimo:g} y {maximo:g}. Por favor, corrígelo."
+MENSAJE_TIPO = "Error: El campo '{etiqueta}' debe ser un valor numérico."
+MENSAJE_FECHA = "Error: El campo '{etiqueta}' debe ser una fecha con formato AAAA-MM-DD."
+
+def etiqueta_campo(campo):
+    """Nombre legible de un campo para los mensajes ('tasa_crecimiento_perpetuo' -> 'Tasa Crecimiento Perpetuo')."""
+    return campo.replace('_', ' ').title()
+
+@dataclass(slots=True, frozen=True)
+class RestriccionCampo:
+    """
+    Rango admitido de un campo numérico: `minimo` <= valor <= `maximo` (o valor > `minimo`
+    con `minimo_excluido`). `mensaje` admite {etiqueta}, {minimo} y {maximo}.
+    """
+    campo: str
+    minimo: float = -np.inf
+    maximo: float = np.inf
+    minimo_excluido: bool = False
+    mensaje: str = MENSAJE_RANGO
+    severidad: str = ERROR
+
+    @property
+    def nombre(self):
+        return self.campo
+
+    def falla(self, valores):
+        """True donde el valor está fuera del rango."""
+        dentro_minimo = valores > self.minimo if self.minimo_excluido else valores >= self.minimo
+        return ~(dentro_minimo & (valores <= self.maximo))
+
+@dataclass(slots=True, frozen=True)
+class RestriccionFilas:
+    """
+    `izquierda` debe ser mayor que `derecha` en cada fila. Con `solo_si_positivo` la
+    restricción aplica solo donde `izquierda` es positivo (si no, ya lo informa su rango).
+    """
+    nombre: str
+    izquierda: str
+    derecha: str
+    mensaje: str
+    severidad: str = ERROR
+    solo_si_positivo: bool = False
+
+    def falla(self, izquierda, derecha):
+        """True donde no se cumple izquierda > derecha."""
+        falla = ~(izquierda > derecha)
+        return falla & (izquierda > 0) if self.solo_si_positivo else falla
+
+def positivo(campo):
+    """Restricción de un campo estrictamente positivo."""
+    return RestriccionCampo(campo, 0.0, minimo_excluido=True, mensaje=MENSAJE_POSITIVO)
+
+def no_negativo(campo):
+    """Restricción de un campo que puede ser cero pero no negativo."""
+    return RestriccionCampo(campo, 0.0, mensaje=MENSAJE_NO_NEGATIVO)
+
+WACC_MAYOR_QUE_PERPETUO = RestriccionFilas(
+    'wacc_mayor_que_perpetuo', 'wacc', 'tasa_crecimiento_perpetuo',
+    "Advertencia: Para el cálculo del Valor Terminal por Crecimiento Perpetuo, el WACC debe ser mayor que la Tasa de Crecimiento Perpetuo. Los resultados del DCF podrían ser inexactos o cero.",
+    severidad=ADVERTENCIA, solo_si_positivo=True,
+)
+
+# Esquema del análisis de una empresa: los campos que los cálculos dividen deben ser positivos.
+ESQUEMA_ANALISIS = (
+    *(positivo(c) for c in (
+        'precio_actual', 'eps_actual', 'eps_proyectado', 'revenue_actual',
+        'net_income_estimado', 'acciones_circulacion', 'book_value_per_share',
+        'equity_proyectado', 'wacc', 'per_esperado', 'ps_esperado', 'pb_esperado',
+    )),
+    *(no_negativo(c) for c in (
+        'revenue_pesimista', 'revenue_base', 'revenue_optimista',
+        'dividendos_anuales', 'tasa_crecimiento_esperada', 'margen_seguridad_deseado',
+        'per_historico_1', 'per_historico_2', 'per_historico_3',
+        'ps_historico_1', 'ps_historico_2', 'ps_historico_3',
+        'pb_historico_1', 'pb_historico_2', 'pb_historico_3',
+    )),
+    WACC_MAYOR_QUE_PERPETUO,
+)
+
+# Esquema de un lote (universo): solo lo que impide valuar la fila o haría fallar todo el lote.
+# Los inputs en cero se aceptan (el método que los necesita da 0 y no entra al precio justo).
+ESQUEMA_LOTE = (
+    positivo('precio_actual'),
+    positivo('acciones_circulacion'),
+    *(no_negativo(c) for c in (
+        'revenue_actual', 'revenue_pesimista', 'revenue_base', 'revenue_optimista', 'dividendos_anuales',
+        'per_esperado', 'ps_esperado', 'pb_esperado',
+        'per_historico_1', 'per_historico_2', 'per_historico_3',
+        'ps_historico_1', 'ps_historico_2', 'ps_historico_3',
+        'pb_historico_1', 'pb_historico_2', 'pb_historico_3',
+    )),
+    RestriccionCampo('margen_seguridad_deseado', 0.0, 100.0),
+    RestriccionCampo('proporcion_deuda', 0.0, 100.0),
+    RestriccionCampo('mes_cierre_fiscal', 1.0, 12.0),
+    RestriccionCampo('años_proyeccion_dcf', 1.0, MAXIMO_AÑOS_DCF),
+    RestriccionCampo('años_transicion_dcf', 0.0, MAXIMO_AÑOS_DCF),
+    WACC_MAYOR_QUE_PERPETUO,
+)
+
+# ===================== VALIDACIÓN VECTORIZADA =====================
+
+@dataclass(slots=True)
+class ResultadoValidacion:
+    """
+    Resultado de validar n filas. `chequeos` nombra cada bit: los campos validados y luego las
+    restricciones entre campos. `errores`, `advertencias` y `tipo_invalido` son un uint64 por
+    fila con el bit de cada chequeo que falló. `columnas` guarda los valores ya convertidos
+    (las celdas inválidas o vacías con su valor por defecto) para armar los mensajes.
+    """
+    esquema: tuple
+    chequeos: tuple
+    errores: np.ndarray
+    advertencias: np.ndarray
+    tipo_invalido: np.ndarray
+    columnas: dict
+
+    @property
+    def n_filas(self):
+        return len(self.errores)
+
+    @property
+    def filas_validas(self):
+        """True en las filas sin errores (las advertencias no invalidan)."""
+        return self.errores == 0
+
+    def bit(self, chequeo):
+        """Máscara uint64 del bit de un chequeo."""
+        return np.uint64(1) << np.uint64(self.chequeos.index(chequeo))
+
+    def mascara(self, advertencias=False):
+        """Máscara booleana (filas, chequeos) de errores (o de advertencias)."""
+        codigos = self.advertencias if advertencias else self.errores
+        return ((codigos[:, np.newaxis] >> np.arange(len(self.chequeos), dtype=np.uint64)) & np.uint64(1)).astype(bool)
+
+def _chequeos(esquema, campos):
+    """Campos (en el orden de `datos_iniciales`) y restricciones entre campos que tienen un bit."""
+    return tuple(campos) + tuple(r.nombre for r in esquema if isinstance(r, RestriccionFilas))
+
+def _numero(serie, defecto):
+    """(valores float64 con el defecto en celdas vacías o inválidas, máscara de tipo inválido)."""
+    valores = pd.to_numeric(serie, errors='coerce').to_numpy(dtype=np.float64)
+    presentes = serie.notna().to_numpy()
+    if serie.dtype == object or pd.api.types.is_string_dtype(serie):
+        presentes = presentes & serie.astype(str).str.strip().ne('').to_numpy()
+    invalido = presentes & ~np.isfinite(valores)
+    return np.where(np.isfinite(valores), valores, float(defecto)), invalido
+
+def _fecha(serie):
+    """(textos de fecha, máscara de fechas no vacías que no son AAAA-MM-DD válidas)."""
+    textos = serie.fillna('').astype(str).str.strip()
+    textos = textos.mask(textos.isin(('nan', 'NaT', 'None')), '').to_numpy(dtype=object)
+    # Las fechas distintas son pocas: se valida cada una una vez, con el mismo criterio que `calendario_fiscal`.
+    unicas, inversa = np.unique(textos, return_inverse=True)
+    return textos, np.array([bool(t) and not _es_fecha(t) for t in unicas], dtype=bool)[inversa.ravel()]
+
+def _es_fecha(texto):
+    try:
+        datetime.date.fromisoformat(texto[:10])
+    except ValueError:
+        return False
+    return True
+
+def validar_tabla(tabla, esquema=ESQUEMA_LOTE):
+    """
+    Valida un DataFrame con una fila por empresa (mismas columnas que `datos_iniciales`). Las
+    columnas que falten y las celdas vacías toman su valor por defecto, como en
+    `universo.columnas_desde_tabla`; las celdas que no son un número (o una fecha) son error
+    de tipo. Las restricciones de `esquema` se evalúan sobre los valores convertidos.
+    """
+    n_filas = len(tabla)
+    defectos = datos_iniciales()
+    campos = [c for c, v in defectos.items() if not isinstance(v, bool)]
+    chequeos = _chequeos(esquema, campos)
+    if len(chequeos) > 64:
+        raise ValueError(f"El esquema tiene {len(chequeos)} chequeos; el máximo es 64.")
+    bits = {nombre: np.uint64(1) << np.uint64(i) for i, nombre in enumerate(chequeos)}
+    errores = np.zeros(n_filas, dtype=np.uint64)
+    advertencias = np.zeros(n_filas, dtype=np.uint64)
+    tipo_invalido = np.zeros(n_filas, dtype=np.uint64)
+
+    columnas = {}
+    for campo in campos:
+        if campo not in tabla.columns:
+            columnas[campo] = defectos[campo]
+            continue
+        if campo in CAMPOS_FECHA:
+            columnas[campo], invalido = _fecha(tabla[campo])
+        else:
+            columnas[campo], invalido = _numero(tabla[campo], defectos[campo])
+        tipo_invalido |= np.where(invalido, bits[campo], np.uint64(0))
+
+    for restriccion in esquema:
+        if isinstance(restriccion, RestriccionFilas):
+            falla = restriccion.falla(
+                np.asarray(columnas[restriccion.izquierda], dtype=np.float64), np.asarray(columnas[restriccion.derecha], dtype=np.float64)
+            )
+        else:
+            falla = restriccion.falla(np.asarray(columnas[restriccion.campo], dtype=np.float64))
+        destino = advertencias if restriccion.severidad == ADVERTENCIA else errores
+        destino |= np.where(np.broadcast_to(falla, (n_filas,)), bits[restriccion.nombre], np.uint64(0))
+    errores |= tipo_invalido
+    return ResultadoValidacion(tuple(esquema), chequeos, errores, advertencias, tipo_invalido, columnas)
+
+def validar_datos(data, esquema=ESQUEMA_ANALISIS):
+    """Valida un solo juego de inputs (`data_inputs`) como una tabla de una fila."""
+    return validar_tabla(pd.DataFrame([{campo: data[campo] for campo in data if campo in datos_iniciales()}]), esquema)
+
+# ===================== MENSAJES Y RESUMEN =====================
+
+def mensajes_fila(resultado, fila=0):
+    """
+    Lista de (nivel, texto) de una fila: primero los errores de tipo, después las
+    restricciones que fallaron en el orden del esquema. Solo se arman los textos de esa fila.
+    """
+    mensajes = []
+    for i, chequeo in enumerate(resultado.chequeos):
+        if resultado.tipo_invalido[fila] >> np.uint64(i) & np.uint64(1):
+            plantilla = MENSAJE_FECHA if chequeo in CAMPOS_FECHA else MENSAJE_TIPO
+            mensajes.append(('error', plantilla.format(etiqueta=etiqueta_campo(chequeo))))
+    for restriccion in resultado.esquema:
+        bit = resultado.bit(restriccion.nombre)
+        if isinstance(restriccion, RestriccionCampo) and resultado.tipo_invalido[fila] & bit:
+            continue
+        codigos = resultado.advertencias if restriccion.severidad == ADVERTENCIA else resultado.errores
+        if codigos[fila] & bit:
+            nivel = 'warning' if restriccion.severidad == ADVERTENCIA else 'error'
+            if isinstance(restriccion, RestriccionFilas):
+                mensajes.append((nivel, restriccion.mensaje))
+            else:
+                mensajes.append((nivel, restriccion.mensaje.format(
+                    etiqueta=etiqueta_campo(restriccion.campo), minimo=restriccion.minimo, maximo=restriccion.maximo,
+                )))
+    return mensajes
+
+def resumen_validacion(resultado):
+    """
+    Una fila por chequeo con algún problema: cantidad de filas con error, con error de tipo,
+    con advertencia y la primera fila afectada (contando desde 1).
+    """
+    filas = []
+    for i, chequeo in enumerate(resultado.chequeos):
+        bit = np.uint64(1) << np.uint64(i)
+        con_error = (resultado.errores & bit) != 0
+        con_advertencia = (resultado.advertencias & bit) != 0
+        n_errores, n_advertencias = int(np.count_nonzero(con_error)), int(np.count_nonzero(con_advertencia))
+        if n_errores or n_advertencias:
+            afectadas = con_error | con_advertencia
+            filas.append({
+                'chequeo': chequeo,
+                'errores': n_errores,
+                'errores_tipo': int(np.count_nonzero((resultado.tipo_invalido & bit) != 0)),
+                'advertencias': n_advertencias,
+                'primera_fila': int(np.argmax(afectadas)) + 1,
+            })
+    return pd.DataFrame(filas, columns=['chequeo', 'errores', 'errores_tipo', 'advertencias', 'primera_fila'])
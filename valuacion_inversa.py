@@ -0,0 +1,268 @@
+"""
+Valuación inversa: qué supuestos descuenta el precio de mercado.
+
+En lugar de calcular un precio a partir de los supuestos, resuelve el supuesto que hace que
+el precio del motor (`motor_valuacion.dcf_vectorizado`, llevado al calendario de descuento de
+cada fila) sea igual a `precio_actual`. Todas las funciones reciben columnas como `valuar_lote`
+(escalares o arreglos de una dimensión), así que resuelven una empresa o miles a la vez con el
+mismo código.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from motor_valuacion import ajustar_a_calendario, calendario_por_defecto, dcf_vectorizado, flujo_inicial_y_per, parametros_calendario
+
+# Estado de cada fila resuelta.
+SOLUCION_ENCONTRADA = 0
+DATOS_INVALIDOS = 1
+BAJO_EL_RANGO = 2 # El precio actual exige un valor menor que el mínimo buscado.
+SOBRE_EL_RANGO = 3 # El precio actual exige un valor mayor que el máximo buscado.
+SIN_CONVERGENCIA = 4
+
+DESCRIPCION_ESTADOS = {
+    SOLUCION_ENCONTRADA: "Solución encontrada",
+    DATOS_INVALIDOS: "Datos insuficientes o inválidos",
+    BAJO_EL_RANGO: "Por debajo del rango admitido",
+    SOBRE_EL_RANGO: "Por encima del rango admitido",
+    SIN_CONVERGENCIA: "El método no convergió",
+}
+
+# ===================== RESOLUCIÓN VECTORIZADA DE RAÍCES =====================
+
+def resolver_raiz_acotada(funcion, bajo, alto, creciente=True, tolerancia=1e-10, max_iteraciones=100):
+    """
+    Resuelve funcion(x, filas) = 0 para muchas filas a la vez con Newton acotado.
+
+    `funcion` recibe los candidatos `x` y los índices `filas` a los que corresponden, y
+    retorna el residuo de esas filas; así cada iteración solo evalúa las filas que siguen sin
+    converger. `bajo` y `alto` deben encerrar la raíz (residuos de signo opuesto) y `creciente`
+    indica si el residuo sube o baja con x. La derivada se aproxima por diferencias finitas; si
+    el paso de Newton sale del intervalo o el último paso no redujo el residuo a la mitad, se
+    bisecta (como en Brent), de modo que nunca converge más lento que la bisección.
+
+    Retorna (raiz, estado): la raíz es NaN en las filas sin solución y `estado` indica el
+    motivo (BAJO_EL_RANGO si la raíz quedaría por debajo de `bajo`, SOBRE_EL_RANGO si quedaría
+    por encima de `alto`).
+    """
+    bajo, alto = (np.array(x, dtype=np.float64) for x in np.broadcast_arrays(bajo, alto))
+    bajo, alto = np.atleast_1d(bajo), np.atleast_1d(alto)
+    todas = np.arange(bajo.size)
+    f_bajo = funcion(bajo, todas)
+    f_alto = funcion(alto, todas)
+
+    raiz = np.full(bajo.size, np.nan)
+    estado = np.full(bajo.size, SIN_CONVERGENCIA, dtype=np.int8)
+    sin_cambio = np.sign(f_bajo) * np.sign(f_alto) > 0
+    estado[sin_cambio & ((f_bajo > 0) == creciente)] = BAJO_EL_RANGO
+    estado[sin_cambio & ((f_bajo > 0) != creciente)] = SOBRE_EL_RANGO
+    estado[np.isnan(f_bajo) | np.isnan(f_alto)] = DATOS_INVALIDOS
+    for extremo, f_extremo in ((bajo, f_bajo), (alto, f_alto)):
+        exacta = (f_extremo == 0) & (estado == SIN_CONVERGENCIA)
+        raiz[exacta], estado[exacta] = extremo[exacta], SOLUCION_ENCONTRADA
+
+    activas = np.flatnonzero(estado == SIN_CONVERGENCIA)
+    a, b, fa, fb = bajo[activas], alto[activas], f_bajo[activas], f_alto[activas]
+    x = a - fa * (b - a) / (fb - fa) # Primer candidato por interpolación lineal.
+    f_anterior = np.full(activas.size, np.inf)
+    for _ in range(max_iteraciones):
+        if activas.size == 0:
+            break
+        fx = funcion(x, activas)
+        paso = 1e-7 * (1.0 + np.abs(x))
+        x_derivada = np.where(x + paso < b, x + paso, x - paso)
+        derivada = (funcion(x_derivada, activas) - fx) / (x_derivada - x)
+
+        # Se conserva el extremo cuyo residuo tiene signo opuesto al del candidato.
+        mismo_signo = np.sign(fx) == np.sign(fa)
+        a, fa = np.where(mismo_signo, x, a), np.where(mismo_signo, fx, fa)
+        b, fb = np.where(mismo_signo, b, x), np.where(mismo_signo, fb, fx)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            newton = x - fx / derivada
+        tolerancia_x = tolerancia * (1.0 + np.abs(x))
+        # Un paso de Newton menor que la tolerancia ya es convergencia, aunque caiga sobre un extremo.
+        listo = (fx == 0) | (np.abs(newton - x) <= tolerancia_x) | (np.abs(b - a) <= tolerancia_x)
+        fuera = ~np.isfinite(newton) | (newton <= np.minimum(a, b)) | (newton >= np.maximum(a, b))
+        lento = np.abs(fx) > 0.5 * f_anterior
+        x_nuevo = np.where(fuera | lento, (a + b) / 2, newton)
+
+        raiz[activas[listo]] = np.where((fx[listo] == 0) | fuera[listo], x[listo], newton[listo])
+        estado[activas[listo]] = SOLUCION_ENCONTRADA
+        seguir = ~listo
+        activas, x, a, b, fa, fb = activas[seguir], x_nuevo[seguir], a[seguir], b[seguir], fa[seguir], fb[seguir]
+        f_anterior = np.abs(fx[seguir])
+
+    return raiz, estado
+
+# ===================== COLUMNAS DE ENTRADA =====================
+
+def _columnas(columnas, nombres):
+    """Columnas pedidas como arreglos float64 de una dimensión con el mismo número de filas."""
+    arreglos = [np.asarray(columnas[nombre], dtype=np.float64) for nombre in nombres]
+    n_filas = np.broadcast_shapes(*(a.shape for a in arreglos), (1,))[0]
+    return [np.broadcast_to(a, (n_filas,)) for a in arreglos]
+
+def _calendario(columnas, n_filas):
+    """Parámetros de `parametros_calendario` por fila, o None si todas descuentan en años enteros."""
+    parametros = parametros_calendario(columnas)
+    if calendario_por_defecto(parametros):
+        return None
+    return tuple(np.broadcast_to(np.asarray(p, dtype=np.float64), (n_filas,)) for p in parametros)
+
+def _dcf_fechado(calendario, filas, fcf, wacc, tasa_crecimiento, tasa_crecimiento_perpetuo, años, acciones,
+                 per_terminal=0.0, años_transicion=0.0):
+    """`dcf_vectorizado` de las `filas` indicadas, llevado a su calendario de descuento."""
+    resultado = dcf_vectorizado(fcf, wacc, tasa_crecimiento, tasa_crecimiento_perpetuo, años, acciones, per_terminal, años_transicion)
+    if calendario is None:
+        return resultado
+    return ajustar_a_calendario(
+        resultado, fcf * (1 + tasa_crecimiento), wacc, acciones, *(p[filas] for p in calendario)
+    )
+
+# ===================== DCF INVERSO: CRECIMIENTO Y P/E TERMINAL IMPLÍCITOS =====================
+
+@dataclass(slots=True)
+class ResultadoCrecimientoImplicito:
+    """Supuestos que descuenta el precio actual; tasas en porcentaje y NaN donde no hay solución."""
+    tasa_crecimiento_dcf: np.ndarray
+    estado_dcf: np.ndarray
+    tasa_crecimiento_multiplo_terminal: np.ndarray
+    estado_multiplo_terminal: np.ndarray
+    per_terminal: np.ndarray
+    estado_per_terminal: np.ndarray
+
+def crecimiento_implicito(columnas, crecimiento_maximo=1000.0, tolerancia=1e-10):
+    """
+    DCF inverso del escenario Base.
+
+    - Crecimiento implícito DCF y por Múltiplo Terminal: la `tasa_crecimiento_esperada` con
+      la que el precio de cada método iguala a `precio_actual`, buscada en
+      [0%, `crecimiento_maximo`%] con `resolver_raiz_acotada`. Se resuelve sobre el logaritmo
+      del precio, casi lineal en log(1 + g), para que Newton converja en pocas iteraciones aun
+      con horizontes largos. La transición hacia el crecimiento perpetuo parte de cada candidato.
+    - P/E terminal implícito: el precio por Múltiplo Terminal es proporcional al P/E, así que
+      basta con dividir el precio actual por el precio que da un P/E de 1.
+
+    Un crecimiento implícito negativo se informa como BAJO_EL_RANGO: el motor, como
+    `valuar_dcf`, no valúa escenarios con crecimiento negativo.
+    """
+    precio, net_income, wacc, g, g_perpetuo, años, transicion, acciones, per, reinversion = _columnas(columnas, (
+        'precio_actual', 'net_income_estimado', 'wacc', 'tasa_crecimiento_esperada', 'tasa_crecimiento_perpetuo',
+        'años_proyeccion_dcf', 'años_transicion_dcf', 'acciones_circulacion', 'per_esperado', 'tasa_reinversion',
+    ))
+    fcf, per = flujo_inicial_y_per(net_income, per, reinversion)
+    _, per_unitario = flujo_inicial_y_per(net_income, 1.0, reinversion)
+    wacc, g, g_perpetuo = wacc / 100, g / 100, g_perpetuo / 100
+    años, transicion = np.trunc(años), np.trunc(transicion)
+    validas = (precio > 0) & (fcf > 0) & (acciones > 0) & (wacc > 0) & (años > 0) & (transicion >= 0)
+    calendario = _calendario(columnas, precio.size)
+
+    def resolver_crecimiento(validas, campo_precio):
+        """Newton acotado sobre las filas válidas para el precio del método indicado."""
+        filas_validas = np.flatnonzero(validas)
+        def residuo(tasa, filas):
+            f = filas_validas[filas]
+            resultado = _dcf_fechado(calendario, f, fcf[f], wacc[f], tasa, g_perpetuo[f], años[f], acciones[f], per[f], transicion[f])
+            return np.log(getattr(resultado, campo_precio) / precio[f])
+
+        tasa = np.full(precio.size, np.nan)
+        estado = np.full(precio.size, DATOS_INVALIDOS, dtype=np.int8)
+        if filas_validas.size:
+            tasa[validas], estado[validas] = resolver_raiz_acotada(
+                residuo, 0.0, np.full(filas_validas.size, crecimiento_maximo / 100), tolerancia=tolerancia
+            )
+        return tasa * 100, estado
+
+    tasa_dcf, estado_dcf = resolver_crecimiento(validas, 'precio_dcf')
+    tasa_multiplo_terminal, estado_multiplo_terminal = resolver_crecimiento(validas & (per > 0), 'precio_multiplo_terminal')
+
+    # P/E terminal implícito: precio actual / precio por Múltiplo Terminal con P/E = 1.
+    precio_por_unidad_per = _dcf_fechado(
+        calendario, slice(None), fcf, wacc, g, g_perpetuo, años, acciones, per_unitario, transicion
+    ).precio_multiplo_terminal
+    validas_per = validas & (precio_por_unidad_per > 0)
+    estado_per_terminal = np.where(validas_per, SOLUCION_ENCONTRADA, DATOS_INVALIDOS).astype(np.int8)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        per_terminal = np.where(validas_per, precio / precio_por_unidad_per, np.nan)
+
+    return ResultadoCrecimientoImplicito(
+        tasa_crecimiento_dcf=tasa_dcf,
+        estado_dcf=estado_dcf,
+        tasa_crecimiento_multiplo_terminal=tasa_multiplo_terminal,
+        estado_multiplo_terminal=estado_multiplo_terminal,
+        per_terminal=per_terminal,
+        estado_per_terminal=estado_per_terminal,
+    )
+
+# ===================== TASA DE DESCUENTO IMPLÍCITA (TIR) =====================
+
+@dataclass(slots=True)
+class ResultadoTasaImplicita:
+    """Rentabilidad anual implícita de comprar a `precio_actual`, en porcentaje; NaN donde no hay solución."""
+    tasa_descuento_dcf: np.ndarray
+    estado_dcf: np.ndarray
+    tasa_descuento_multiplo_terminal: np.ndarray
+    estado_multiplo_terminal: np.ndarray
+
+def tasa_descuento_implicita(columnas, tasa_maxima=1000.0, tolerancia=1e-10):
+    """
+    TIR del escenario Base: la tasa de descuento con la que el precio por DCF (o por Múltiplo
+    Terminal) iguala a `precio_actual`, es decir, la rentabilidad esperada de pagar hoy ese precio.
+
+    - DCF: el precio cae de forma monótona con la tasa y tiende a infinito cuando esta se
+      acerca al crecimiento perpetuo, así que la raíz se busca con `resolver_raiz_acotada`
+      solo por encima de max(crecimiento perpetuo, 0). Con wacc <= crecimiento perpetuo el
+      valor terminal no está definido (el motor lo toma como 0.0) y esa zona se excluye.
+      Si el precio actual supera al DCF con la tasa mínima, o queda por debajo con
+      `tasa_maxima`, no hay cambio de signo y la fila se marca BAJO_EL_RANGO o SOBRE_EL_RANGO.
+    - Múltiplo Terminal: el flujo final no depende de la tasa, así que
+      FCF_N · P/E / (1 + r)^T / acciones = precio se despeja en forma cerrada, con T el
+      momento del valor terminal: el horizonte total (crecimiento alto más transición) más el
+      desfase del calendario de descuento.
+    """
+    precio, net_income, g, g_perpetuo, años, transicion, acciones, per, reinversion = _columnas(columnas, (
+        'precio_actual', 'net_income_estimado', 'tasa_crecimiento_esperada', 'tasa_crecimiento_perpetuo',
+        'años_proyeccion_dcf', 'años_transicion_dcf', 'acciones_circulacion', 'per_esperado', 'tasa_reinversion',
+    ))
+    fcf, per = flujo_inicial_y_per(net_income, per, reinversion)
+    g, g_perpetuo = g / 100, g_perpetuo / 100
+    años, transicion = np.trunc(años), np.trunc(transicion)
+    validas = (precio > 0) & (fcf > 0) & (acciones > 0) & (g >= 0) & (años > 0) & (transicion >= 0)
+    calendario = _calendario(columnas, precio.size)
+
+    # DCF: residuo log(precio DCF / precio actual), decreciente en la tasa de descuento. Se busca
+    # sobre s = log(tasa - mínimo): el polo del valor terminal en la tasa mínima queda lineal en s.
+    filas_validas = np.flatnonzero(validas)
+    minimo = np.maximum(g_perpetuo[validas], 0.0)
+    def residuo(s, filas):
+        f = filas_validas[filas]
+        tasa = minimo[filas] + np.exp(s)
+        resultado = _dcf_fechado(calendario, f, fcf[f], tasa, g[f], g_perpetuo[f], años[f], acciones[f], años_transicion=transicion[f])
+        return np.log(resultado.precio_dcf / precio[f])
+
+    tasa_dcf = np.full(precio.size, np.nan)
+    estado_dcf = np.full(precio.size, DATOS_INVALIDOS, dtype=np.int8)
+    if filas_validas.size:
+        bajo = np.log(1e-6 * (1.0 + minimo))
+        alto = np.log(np.maximum(tasa_maxima / 100 - minimo, 2e-6 * (1.0 + minimo)))
+        s, estado_dcf[validas] = resolver_raiz_acotada(residuo, bajo, alto, creciente=False, tolerancia=tolerancia)
+        tasa_dcf[validas] = minimo + np.exp(s)
+
+    # Múltiplo Terminal en forma cerrada (el WACC usado para obtener el flujo final es irrelevante).
+    fcf_final = dcf_vectorizado(fcf, 0.1, g, g_perpetuo, años, acciones, años_transicion=transicion).fcf_final
+    momento_terminal = años + transicion + (0.0 if calendario is None else calendario[3])
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        tasa_multiplo_terminal = np.expm1(np.log(fcf_final * per / (precio * acciones)) / momento_terminal)
+
+    validas_mt = validas & (per > 0)
+    estado_multiplo_terminal = np.where(validas_mt, SOLUCION_ENCONTRADA, DATOS_INVALIDOS).astype(np.int8)
+    estado_multiplo_terminal[validas_mt & (tasa_multiplo_terminal <= 0)] = BAJO_EL_RANGO
+    estado_multiplo_terminal[validas_mt & (tasa_multiplo_terminal > tasa_maxima / 100)] = SOBRE_EL_RANGO
+
+    return ResultadoTasaImplicita(
+        tasa_descuento_dcf=tasa_dcf * 100,
+        estado_dcf=estado_dcf,
+        tasa_descuento_multiplo_terminal=np.where(estado_multiplo_terminal == SOLUCION_ENCONTRADA, tasa_multiplo_terminal * 100, np.nan),
+        estado_multiplo_terminal=estado_multiplo_terminal,
+    )